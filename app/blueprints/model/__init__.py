@@ -6,3 +6,11 @@ from flask import Blueprint
 model_bp = Blueprint('model', __name__)
 
 from app.blueprints.model import routes
+
+
+@model_bp.record_once
+def _configure_fraud_detector(state):
+    """Áp dụng app config cho fraud_detector singleton và các cache khi đăng ký blueprint"""
+    from app.blueprints.model.fraud_detector import fraud_detector
+    fraud_detector.configure(state.app.config)
+    routes.configure_caches(state.app.config)
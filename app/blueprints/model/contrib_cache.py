@@ -0,0 +1,76 @@
+"""
+Contribution Cache - Cache TreeSHAP contributions theo "chữ ký lớp split" của input
+
+TreeSHAP của XGBoost duyệt cả hai nhánh ở mọi node; kết quả chỉ phụ thuộc vào việc input
+đi trái hay phải tại TỪNG node của TỪNG cây. Với mỗi feature, các threshold split chia
+trục giá trị thành các lớp (như ScoreIndex) → vector lớp của các feature xác định hướng
+đi tại mọi node, nên hai input cùng vector lớp có contributions + bias giống hệt nhau.
+
+Vector này mịn hơn vector leaf (pred_leaf) một chút: hai input cùng leaf nhưng khác hướng
+ở node ngoài đường đi có thể có SHAP khác nhau, nên khóa theo leaf không đảm bảo chính xác.
+Hai giao dịch chỉ chênh vài nghìn VND vẫn thường cùng lớp → dùng chung entry.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib
+import threading
+import numpy as np
+
+from app.blueprints.model.score_index import extract_split_thresholds
+
+
+class ContributionCache:
+    """
+    LRU cache {chữ ký lớp split → contributions (n_features + 1, cột cuối là bias)}
+
+    Args:
+        booster: xgboost Booster dùng để tính contributions
+        n_features: số cột đầu vào classifier
+        max_items: số entry tối đa
+    """
+
+    def __init__(self, booster, n_features: int, max_items: int = 4096):
+        self.max_items = int(max_items)
+        self._thresholds = extract_split_thresholds(booster, n_features)
+        # Chỉ feature thực sự được split mới ảnh hưởng contributions
+        self._split_features = [i for i, thr in enumerate(self._thresholds) if len(thr)]
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, features: np.ndarray) -> bytes:
+        """Chữ ký 16 byte từ vector lớp split (float32 như XGBoost) của một dòng"""
+        row = np.asarray(features, dtype=np.float32).reshape(-1)
+        classes = np.empty(len(self._split_features), dtype=np.int32)
+        for k, i in enumerate(self._split_features):
+            # NaN đi theo nhánh default → lớp riêng (-1)
+            classes[k] = -1 if np.isnan(row[i]) else np.searchsorted(self._thresholds[i], row[i], side='right')
+        return hashlib.blake2b(classes.tobytes(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            contribs = self._items.get(key)
+            if contribs is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return contribs
+
+    def put(self, key: bytes, contribs: np.ndarray):
+        with self._lock:
+            self._items[key] = contribs
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'max_items': self.max_items,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else None
+        }
@@ -0,0 +1,125 @@
+"""
+Explanation Jobs - Sinh giải thích AI ở background để /predict-fraud trả về ngay
+
+Job chạy trong ThreadPoolExecutor, bên trong app context của Flask (OpenAIService đọc
+current_app.config). Trạng thái job giữ trong process theo explanation_id, hết hạn sau
+`ttl_seconds`; kết quả đồng thời được ghi vào cache giải thích (dùng chung giữa các
+worker nếu backend là sqlite/redis) để worker khác vẫn trả được kết quả.
+
+Job chỉ trả kết quả qua giá trị trả về của fn (không ghi vào dữ liệu của request đã tạo nó:
+request có thể đang serialize response trên thread khác).
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+import threading
+import time
+
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_ERROR = 'error'
+
+
+class ExplanationJobs:
+    """
+    Executor + bảng trạng thái job giải thích
+
+    Args:
+        max_workers: số thread gọi LLM đồng thời
+        ttl_seconds: thời gian giữ trạng thái job sau khi tạo
+        max_jobs: số job tối đa giữ trong bảng (bỏ job cũ nhất khi vượt)
+    """
+
+    def __init__(self, max_workers: int = 4, ttl_seconds: float = 600, max_jobs: int = 10000):
+        self.max_workers = int(max_workers)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_jobs = int(max_jobs)
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Tạo lazily trong process phục vụ request (thread không sống sót qua fork)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='ai-explanation'
+            )
+        return self._executor
+
+    def submit(self, app, job_id: str, fn: Callable[[], Tuple[str, str, Optional[str]]]) -> Dict:
+        """
+        Chạy fn() trong background (trong app context của `app`)
+
+        fn trả về (giải thích, engine đã sinh giải thích, lý do fallback hoặc None)
+
+        Job cùng job_id đang chờ/chạy hoặc đã xong (còn hạn) được dùng lại, không gọi LLM lần nữa.
+
+        Returns:
+            Bản sao trạng thái job
+        """
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            job = self._jobs.get(job_id)
+            if job is not None and job['status'] != JOB_ERROR:
+                return dict(job)
+
+            job = {
+                'explanation_id': job_id,
+                'status': JOB_PENDING,
+                'ai_explanation': None,
+                'explanation_engine': None,
+                'fallback_reason': None,
+                'error': None,
+                'created_at': now,
+                'finished_at': None
+            }
+            self._jobs[job_id] = job
+            self._jobs.move_to_end(job_id)
+            snapshot = dict(job)
+
+        self._get_executor().submit(self._run, app, job, fn)
+        return snapshot
+
+    def _run(self, app, job: Dict, fn: Callable[[], Tuple[str, str, Optional[str]]]):
+        with self._lock:
+            job['status'] = JOB_RUNNING
+        try:
+            with app.app_context():
+                explanation, engine, fallback_reason = fn()
+        except Exception as e:
+            app.logger.error(f"[EXPLANATION-JOB] {job['explanation_id']} failed: {e}")
+            update = {'error': str(e), 'status': JOB_ERROR}
+        else:
+            update = {
+                'ai_explanation': explanation,
+                'explanation_engine': engine,
+                'fallback_reason': fallback_reason,
+                'status': JOB_DONE
+            }
+        with self._lock:
+            job.update(update, finished_at=time.time())
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Bản sao trạng thái job, hoặc None nếu không có / đã hết hạn"""
+        with self._lock:
+            self._prune(time.time())
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _prune(self, now: float):
+        # _jobs theo thứ tự tạo → job hết hạn luôn nằm đầu
+        while self._jobs:
+            job_id, job = next(iter(self._jobs.items()))
+            if len(self._jobs) <= self.max_jobs and now - job['created_at'] <= self.ttl_seconds:
+                break
+            self._jobs.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {JOB_PENDING: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_ERROR: 0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+        return {'max_workers': self.max_workers, 'jobs': counts}
@@ -0,0 +1,175 @@
+"""
+Explanation Templates - Sinh giải thích tiếng Việt từ contributions của model, không gọi LLM
+
+Dùng cùng dữ liệu mà prompt LLM nhận (prediction, block input đã format, model_top_factors
+từ explain_features) và cùng bố cục trả lời (short: tóm tắt + 2 lý do + 2 khuyến nghị;
+full: tóm tắt + ≥3 nguyên nhân + 2-4 khuyến nghị). Kết quả tất định, render trong vài chục
+micro giây → dùng khi chọn explanation_engine=template hoặc làm fallback khi LLM chậm/lỗi.
+"""
+from typing import Dict, List, Optional
+
+
+# Nhãn hiển thị theo field input (factor 'amt' của model ứng với amt_vnd)
+FIELD_LABELS = {
+    'amt_vnd': 'Số tiền',
+    'gender': 'Giới tính',
+    'category': 'Loại giao dịch',
+    'transaction_hour': 'Giờ giao dịch',
+    'transaction_day': 'Ngày trong tuần',
+    'age': 'Tuổi chủ thẻ',
+    'city_pop': 'Dân số tỉnh/thành'
+}
+
+WEEKDAYS_VI = ['Thứ 2', 'Thứ 3', 'Thứ 4', 'Thứ 5', 'Thứ 6', 'Thứ 7', 'Chủ nhật']
+
+RISK_LEVELS_VI = {
+    'very_low': 'RẤT THẤP',
+    'low': 'THẤP',
+    'medium': 'TRUNG BÌNH',
+    'high': 'CAO',
+    'very_high': 'RẤT CAO'
+}
+
+# Khuyến nghị gắn với field đang làm tăng rủi ro (ưu tiên trước khuyến nghị chung)
+FIELD_RECOMMENDATIONS = {
+    'amt_vnd': 'Xác minh lại số tiền với chủ thẻ qua kênh chính thức trước khi xử lý.',
+    'transaction_hour': 'Kiểm tra kỹ giao dịch diễn ra vào khung giờ bất thường.',
+    'category': 'Đối chiếu loại giao dịch với thói quen chi tiêu thường ngày của chủ thẻ.',
+    'city_pop': 'Kiểm tra địa điểm giao dịch có khớp với nơi chủ thẻ thường giao dịch không.'
+}
+
+NO_FACTORS_REASON = '- Không có đóng góp theo từng trường từ mô hình; kết quả dựa trên tổ hợp các trường input.'
+
+GENERAL_RECOMMENDATIONS = [
+    'Liên hệ chủ thẻ để xác nhận giao dịch; tạm giữ nếu không xác nhận được.',
+    'Không cung cấp mã OTP, mật khẩu hay thông tin thẻ cho bất kỳ ai.',
+    'Theo dõi các giao dịch tiếp theo của thẻ trong 24 giờ tới.'
+]
+
+
+def _format_value(field: str, input_data: Dict, raw_value=None) -> Optional[str]:
+    """Giá trị field dạng người đọc (ưu tiên block input, sau đó raw_value của factor)"""
+    value = input_data.get(field, raw_value)
+    if value is None:
+        return None
+    try:
+        if field == 'amt_vnd':
+            return f"{float(value):,.0f} VND".replace(',', '.')
+        if field == 'transaction_hour':
+            return f"{int(value)}h"
+        if field == 'transaction_day':
+            return WEEKDAYS_VI[int(value)]
+        if field == 'age':
+            return f"{int(value)} tuổi"
+        if field == 'city_pop':
+            city = input_data.get('city')
+            population = f"{int(value):,}".replace(',', '.') + ' người'
+            return f"{city} ({population})" if city else population
+    except (TypeError, ValueError, IndexError):
+        pass
+    return str(value)
+
+
+def _factor_lines(factors: List[Dict], input_data: Dict) -> List[Dict]:
+    """Chuẩn hóa model_top_factors về field input (bỏ feature dẫn xuất / transaction_month)"""
+    lines = []
+    seen = set()
+    for factor in factors or []:
+        if not isinstance(factor, dict):
+            continue
+        field = str(factor.get('feature', '')).strip()
+        if field == 'amt':
+            field = 'amt_vnd'
+        if field not in FIELD_LABELS or field in seen:
+            continue
+        try:
+            contribution = float(factor.get('contribution'))
+        except (TypeError, ValueError):
+            continue
+        seen.add(field)
+        lines.append({
+            'field': field,
+            'label': FIELD_LABELS[field],
+            'value': _format_value(field, input_data, factor.get('raw_value')),
+            'contribution': contribution
+        })
+    lines.sort(key=lambda line: abs(line['contribution']), reverse=True)
+    return lines
+
+
+def _reason(line: Dict, with_number: bool) -> str:
+    text = f"- {line['label']}"
+    if line['value'] is not None:
+        text += f": {line['value']}"
+    effect = 'làm tăng rủi ro gian lận' if line['contribution'] > 0 else 'làm giảm rủi ro gian lận'
+    if with_number:
+        return f"{text} ({effect}, đóng góp {line['contribution']:+.2f})."
+    return f"{text} ({effect})."
+
+
+def _recommendations(risk_lines: List[Dict], count: int) -> List[str]:
+    picked = [FIELD_RECOMMENDATIONS[line['field']] for line in risk_lines if line['field'] in FIELD_RECOMMENDATIONS]
+    for rec in GENERAL_RECOMMENDATIONS:
+        if rec not in picked:
+            picked.append(rec)
+    return [f"- {rec}" for rec in picked[:count]]
+
+
+def render_explanation(prediction: Dict, input_data: Dict, top_factors: List[Dict],
+                       explanation_detail: str = 'full') -> str:
+    """
+    Giải thích kết quả dự đoán bằng template (cùng bố cục với prompt LLM)
+
+    Args:
+        prediction: block 'prediction' của /predict-fraud (is_fraud, fraud_probability, risk_level)
+        input_data: block 'input' của /predict-fraud (_format_input)
+        top_factors: top_factors từ FraudDetectorService.explain_features
+        explanation_detail: short | full
+
+    Returns:
+        str: Giải thích nhiều dòng
+    """
+    detail = (explanation_detail or 'full').strip().lower()
+    if detail not in ('short', 'full'):
+        detail = 'full'
+
+    try:
+        probability = float(prediction.get('fraud_probability', 0))
+    except (TypeError, ValueError):
+        probability = 0.0
+    risk = RISK_LEVELS_VI.get(prediction.get('risk_level'), str(prediction.get('risk_level') or '').upper())
+    input_data = input_data or {}
+
+    if not prediction.get('is_fraud'):
+        return (
+            f"Giao dịch không có dấu hiệu gian lận (xác suất gian lận {probability:.1%}, "
+            f"mức rủi ro {risk}). Không cần phân tích sâu."
+        )
+
+    lines = _factor_lines(top_factors, input_data)
+    risk_lines = [line for line in lines if line['contribution'] > 0]
+    amount = _format_value('amt_vnd', input_data)
+
+    summary = f"Giao dịch có dấu hiệu GIAN LẬN với xác suất {probability:.1%} (mức rủi ro {risk})."
+    if detail == 'full' and risk_lines:
+        top = ', '.join(line['label'].lower() for line in risk_lines[:2])
+        summary += f" Mô hình đánh giá rủi ro chủ yếu dựa trên {top}."
+
+    if detail == 'short':
+        reasons = [_reason(line, with_number=(i == 0)) for i, line in enumerate((risk_lines or lines)[:2])]
+        if not reasons:
+            reasons = [f"- Số tiền: {amount}."] if amount else [NO_FACTORS_REASON]
+        parts = [summary, 'Lý do chính:'] + reasons + ['Khuyến nghị:'] + _recommendations(risk_lines[:2], 2)
+        return '\n'.join(parts)
+
+    # full: nguyên nhân làm tăng rủi ro trước, sau đó các yếu tố làm giảm (ít nhất 3 dòng nếu có)
+    ordered = risk_lines + [line for line in lines if line['contribution'] <= 0]
+    reasons = [_reason(line, with_number=True) for line in ordered[:max(3, len(risk_lines))]]
+    if not reasons:
+        reasons = [NO_FACTORS_REASON]
+    n_recommendations = 4 if prediction.get('risk_level') in ('high', 'very_high') else 3
+    parts = (
+        ['Tóm tắt:', summary, '', 'Nguyên nhân chính:'] + reasons +
+        ['', 'Khuyến nghị:'] + _recommendations(risk_lines, n_recommendations)
+    )
+    return '\n'.join(parts)
@@ -7,14 +7,21 @@ import numpy as np
 import joblib
 import warnings
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Tuple
 from dataclasses import dataclass
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.preprocessing import LabelEncoder
 import os
+import threading
 import xgboost as xgb
 import re
 
+from app.blueprints.model.inference_plan import InferencePlan
+from app.blueprints.model.score_index import ScoreIndex, booster_fingerprint
+from app.blueprints.model.micro_batcher import MicroBatcher
+from app.blueprints.model.contrib_cache import ContributionCache
+from app.utils.singleflight import SingleFlight
+
 warnings.filterwarnings("ignore")
 
 
@@ -62,17 +69,18 @@ class DateFeatureExtractor(BaseEstimator, TransformerMixin):
         return self
     
     def transform(self, X):
-        X = X.copy()
+        # Shallow copy: chỉ gán/xóa cột, không ghi vào dữ liệu của frame đầu vào
+        X = X.copy(deep=False)
         
         # Convert datetime
-        X['trans_date_trans_time'] = pd.to_datetime(X['trans_date_trans_time'])
-        X['dob'] = pd.to_datetime(X['dob'])
+        trans_time = pd.to_datetime(X['trans_date_trans_time'])
+        dob = pd.to_datetime(X['dob'])
         
         # Extract features
-        X['transaction_hour'] = X['trans_date_trans_time'].dt.hour
-        X['transaction_day'] = X['trans_date_trans_time'].dt.dayofweek
-        X['transaction_month'] = X['trans_date_trans_time'].dt.month
-        X['age'] = (X['trans_date_trans_time'] - X['dob']).dt.days // 365
+        X['transaction_hour'] = trans_time.dt.hour
+        X['transaction_day'] = trans_time.dt.dayofweek
+        X['transaction_month'] = trans_time.dt.month
+        X['age'] = (trans_time - dob).dt.days // 365
         
         # Drop original datetime columns
         X.drop(['trans_date_trans_time', 'dob', 'unix_time'], axis=1, inplace=True, errors='ignore')
@@ -103,19 +111,22 @@ class CategoricalEncoder(BaseEstimator, TransformerMixin):
         return self
     
     def transform(self, X):
-        X = X.copy()
+        X = X.copy(deep=False)
         
         # Transform using fitted encoders
         for col, le in self.label_encoders.items():
             if col in X.columns:
+                classes = np.asarray(le.classes_, dtype=object)
+                
                 # Fill missing values with first class
-                X[col] = X[col].fillna(le.classes_[0])
+                values = X[col].fillna(classes[0]).astype(str).to_numpy(dtype=object)
+                
+                # classes_ đã sort → binary search (giống le.transform), không quét tuyến tính từng giá trị
+                codes = np.searchsorted(classes, values)
+                known = classes[np.minimum(codes, len(classes) - 1)] == values
                 
                 # Handle unseen categories - use first class as default
-                X[col] = X[col].astype(str).apply(
-                    lambda x: x if x in le.classes_ else le.classes_[0]
-                )
-                X[col] = le.transform(X[col])
+                X[col] = np.where(known, codes, 0)
         
         return X
 
@@ -137,11 +148,11 @@ class MissingValueHandler(BaseEstimator, TransformerMixin):
         return self
     
     def transform(self, X):
-        X = X.copy()
+        X = X.copy(deep=False)
         
-        # Fill numeric missing values
+        # Fill numeric missing values (chỉ các cột thực sự có NaN)
         for col, fill_val in self.fill_values.items():
-            if col in X.columns:
+            if col in X.columns and X[col].isna().any():
                 X[col] = X[col].fillna(fill_val)
         
         return X
@@ -166,8 +177,21 @@ class FeatureSelector(BaseEstimator, TransformerMixin):
         if isinstance(X, pd.DataFrame):
             return X[self.selected_features_]
         else:
-            df = pd.DataFrame(X, columns=self.feature_names_)
-            return df[self.selected_features_].values
+            # Chọn cột theo chỉ số, không dựng lại DataFrame
+            return np.asarray(X)[:, self._selected_positions()]
+    
+    def _selected_positions(self):
+        # Tính một lần (lazily, kể cả object unpickle từ model cũ); tính lại nếu danh sách cột bị gán lại
+        cached = getattr(self, '_positions_cache', None)
+        if cached is None or cached[0] is not self.feature_names_ or cached[1] is not self.selected_features_:
+            if self.feature_names_ is None:
+                positions = list(self.selected_features_)
+            else:
+                position = {name: i for i, name in enumerate(self.feature_names_)}
+                positions = [position[name] for name in self.selected_features_]
+            cached = (self.feature_names_, self.selected_features_, np.asarray(positions, dtype=np.intp))
+            self._positions_cache = cached
+        return cached[2]
 
 
 # ============================================================================
@@ -198,6 +222,9 @@ GENDER_VN_TO_EN = {
 
 VND_TO_USD_RATE = 25000
 
+# Ngày không tồn tại khi suy ra datetime (vd. DOB 29/02 của năm không nhuận) - chung cho đường 1 dòng và batch
+INVALID_DATE_ERROR = "Invalid transaction date or date of birth"
+
 # Province population lookup (Vietnam - 63 provinces & cities)
 PROVINCE_POPULATION = {
     'ha noi': 8054000, 'hanoi': 8054000, 'ho chi minh': 8993000, 'hcm': 9000000,
@@ -235,6 +262,15 @@ class FraudDetectorService:
     
     _instance = None
     _model = None
+    _plan = None
+    _score_index = None
+    _feature_columns = None
+    _feature_names = None
+
+    # Engine chấm điểm sau preprocessing:
+    # - 'sklearn': XGBClassifier.predict_proba (mặc định)
+    # - 'booster': Booster.inplace_predict trên ndarray float32 liền bộ nhớ (không qua wrapper/DMatrix)
+    ENGINES = ('sklearn', 'booster')
     
     def __new__(cls):
         if cls._instance is None:
@@ -242,9 +278,6 @@ class FraudDetectorService:
         return cls._instance
     
     def __init__(self):
-        if self._model is None:
-            self.load_model()
-        
         # Default values cho các fields KHÔNG required
         self.default_values = {
             'merchant': 'fraud_Kirlin and Sons',
@@ -259,6 +292,62 @@ class FraudDetectorService:
             'merch_long': -95.3698,
             'transaction_month': 6  # Default month
         }
+        self.engine = 'sklearn'
+        self._score_index_stats = {'hits': 0, 'fallbacks': 0}
+        # score_features chạy đồng thời trên thread request + thread micro-batcher
+        self._score_index_stats_lock = threading.Lock()
+        self.batcher = None
+        self.contrib_cache = None
+        # Gộp các lần tính TreeSHAP đồng thời cho cùng chữ ký lớp split
+        self.contrib_flight = SingleFlight()
+
+        if self._model is None:
+            self.load_model()
+
+    def configure(self, config):
+        """
+        Áp dụng cấu hình app (gọi một lần khi đăng ký model blueprint)
+
+        Args:
+            config: Flask app.config (hoặc dict) - đọc FRAUD_ENGINE, FRAUD_SCORE_INDEX_*,
+                FRAUD_MICRO_BATCH_*, FRAUD_CONTRIB_CACHE_SIZE
+        """
+        self.set_engine(config.get('FRAUD_ENGINE', 'sklearn'))
+
+        # Mỗi create_app() gọi lại configure: dừng thread nền của batcher cũ trước khi thay
+        if self.batcher is not None:
+            self.batcher.shutdown()
+        if config.get('FRAUD_MICRO_BATCH_ENABLED', False):
+            self.batcher = MicroBatcher(
+                lambda transactions: self.predict_batch(transactions, return_features=True),
+                max_batch_size=config.get('FRAUD_MICRO_BATCH_MAX_SIZE', 32),
+                max_wait_ms=config.get('FRAUD_MICRO_BATCH_MAX_WAIT_MS', 2.0)
+            )
+        else:
+            self.batcher = None
+
+        contrib_cache_size = config.get('FRAUD_CONTRIB_CACHE_SIZE', 4096)
+        if contrib_cache_size > 0:
+            self.contrib_cache = ContributionCache(
+                self._booster, self._booster.num_features(), max_items=contrib_cache_size
+            )
+        else:
+            self.contrib_cache = None
+
+        index_path = config.get('FRAUD_SCORE_INDEX_PATH', '')
+        if index_path:
+            self.load_score_index(
+                index_path,
+                build=config.get('FRAUD_SCORE_INDEX_BUILD', False),
+                max_combos=config.get('FRAUD_SCORE_INDEX_MAX_COMBOS', 5_000_000)
+            )
+
+    def set_engine(self, engine: str):
+        """Chọn engine chấm điểm ('sklearn' hoặc 'booster')"""
+        engine = (engine or 'sklearn').strip().lower()
+        if engine not in self.ENGINES:
+            raise ValueError(f"Invalid FRAUD_ENGINE '{engine}'. Must be one of: {', '.join(self.ENGINES)}")
+        self.engine = engine
     
     def load_model(self):
         """Load model từ file"""
@@ -293,7 +382,245 @@ class FraudDetectorService:
         print(f"Loading fraud detection model from {model_path}...")
         self._model = joblib.load(model_path)
         print("✅ Model loaded successfully!")
+
+        # Raw Booster + iteration_range giống XGBClassifier.predict_proba (tôn trọng best_iteration)
+        clf = self._model.named_steps['classifier']
+        self._booster = clf.get_booster()
+        try:
+            self._iteration_range = (0, int(clf.best_iteration) + 1)
+        except AttributeError:
+            self._iteration_range = (0, 0)
+
+        self._feature_names = self.resolve_feature_names()
+        self._plan = self.compile_inference_plan()
+
+    def _template_dataframe(self) -> pd.DataFrame:
+        """Một dòng input mẫu (cung cấp giá trị các cột hằng số khi biên dịch)"""
+        template, _ = self.prepare_input_dataframe(
+            100000, 'Nam', 'khác', 12, 0, 30, 'ha noi', PROVINCE_POPULATION['ha noi']
+        )
+        return template
+
+    def resolve_feature_names(self):
+        """
+        Tên các cột đầu vào classifier, tính MỘT lần lúc load model
+        (explain_features không phải dịch tên bằng regex cho mỗi request)
+        """
+        try:
+            raw_frame, features = self.transform_features(self._template_dataframe())
+            return self._feature_names_for(features.shape[1], [str(c) for c in raw_frame.columns])
+        except Exception as e:
+            print(f"⚠️  Feature names not resolved at load (resolved per request): {e}")
+            return None
+
+    def _feature_names_for(self, n_features: int, base_feature_names: List[str] = None) -> List[str]:
+        """Tên feature cho ma trận đầu vào classifier có n_features cột"""
+        selector = self._model.named_steps['feature_selector']
+        feature_names = None
+
+        def _translate_feature_tokens(tokens, base_names):
+            if not tokens or not base_names:
+                return tokens
+            translated = []
+            for tok in tokens:
+                tok_str = str(tok)
+                m = re.match(r'^feature_(\d+)$', tok_str)
+                if m:
+                    idx = int(m.group(1))
+                    if 0 <= idx < len(base_names):
+                        translated.append(base_names[idx])
+                        continue
+                translated.append(tok_str)
+            return translated
+
+        # Prefer names from selector (training-time feature selection)
+        selected = getattr(selector, 'selected_features_', None)
+        if isinstance(selected, (list, tuple)) and len(selected) == n_features:
+            selected_list = [str(s) for s in selected]
+            # Many trained pipelines store placeholder names feature_0..feature_n
+            feature_names = _translate_feature_tokens(selected_list, base_feature_names)
+
+        # If selector didn't select, use the pre-scaler DataFrame column names
+        if feature_names is None and base_feature_names is not None:
+            if n_features == len(base_feature_names):
+                feature_names = list(base_feature_names)
+
+        # If selector output was a DataFrame, its columns are authoritative
+        if self._feature_columns and len(self._feature_columns) == n_features:
+            feature_names = list(self._feature_columns)
+
+        if not feature_names:
+            feature_names = [f'feature_{i}' for i in range(int(n_features))]
+        return feature_names
+
+    def compile_inference_plan(self):
+        """
+        Biên dịch InferencePlan từ pipeline vừa load và kiểm tra parity với pipeline sklearn.
+        Trả về None (dùng lại đường pandas/sklearn) nếu không biên dịch được hoặc lệch kết quả.
+        """
+        try:
+            plan = InferencePlan.compile(self._model, self._template_dataframe())
+        except Exception as e:
+            print(f"⚠️  Inference plan disabled (compile failed): {e}")
+            return None
+
+        mismatches = self.verify_inference_plan(plan)
+        if mismatches:
+            print(f"⚠️  Inference plan disabled: {mismatches} probe rows differ from sklearn pipeline")
+            return None
+
+        print("✅ Inference plan compiled (constant-folded, pandas-free)")
+        return plan
+
+    def verify_inference_plan(self, plan, n_probes: int = 256, seed: int = 0, n_single: int = 32) -> int:
+        """
+        Parity check: so sánh plan với pipeline sklearn đầy đủ trên các input ngẫu nhiên
+        (mọi category/giới tính/giờ/tháng/tuổi + category lạ + city_pop tùy ý)
+
+        Kiểm tra cả hai đường dùng plan: batch (normalize_batch, datetime pandas) trên n_probes dòng
+        và 1 dòng (preprocess_one, datetime thuần) trên n_single dòng đầu.
+
+        Returns:
+            Số dòng có features (float32, như XGBoost nhận) hoặc xác suất khác nhau
+        """
+        rng = np.random.default_rng(seed)
+        categories = list(CATEGORY_VN_TO_EN.keys()) + ['không rõ']
+        transactions = [
+            {
+                'amt': float(rng.choice([rng.uniform(1000, 5e8), 25000, 1e6])),
+                'gender': str(rng.choice(['Nam', 'Nữ'])),
+                'category': str(rng.choice(categories)),
+                'transaction_hour': int(rng.integers(0, 24)),
+                'transaction_day': int(rng.integers(0, 7)),
+                'age': int(rng.integers(18, 101)),
+                'city': str(rng.choice(list(PROVINCE_POPULATION.keys()))),
+                'city_pop': int(rng.integers(1000, 10_000_000)) if rng.random() < 0.3 else None,
+                'transaction_month': int(rng.integers(1, 13)) if rng.random() < 0.7 else None
+            }
+            for _ in range(n_probes)
+        ]
+
+        # Cùng một `now` cho cả hai phía (tuổi suy ra từ ngày hiện tại)
+        now = datetime.now()
+        columns, _, _ = self.normalize_batch(transactions, now=now)
+        expected = self.score_frame(self._batch_dataframe(columns))
+        try:
+            actual = self.score_features(plan.transform(self._batch_model_inputs(columns)))
+        except Exception as e:
+            print(f"⚠️  Inference plan scoring failed: {e}")
+            return n_probes
+        mismatches = self._count_mismatches(expected, actual)
+
+        # Đường 1 dòng của /predict-fraud (preprocess_one: normalize_input → model_inputs, datetime thuần)
+        # so với prepare_input_dataframe + pipeline sklearn
+        for transaction in transactions[:n_single]:
+            args = self._positional_args(transaction)
+            X, converted = self.prepare_input_dataframe(*args, now=now)
+            expected = self.score_frame(X)
+            try:
+                actual = self.score_features(plan.transform(self.model_inputs(converted, now)))
+            except Exception as e:
+                print(f"⚠️  Inference plan single-row scoring failed: {e}")
+                return mismatches + n_single
+            mismatches += self._count_mismatches(expected, actual)
+        return mismatches
+
+    @staticmethod
+    def _count_mismatches(expected: Dict, actual: Dict) -> int:
+        """Số dòng có features (float32, như XGBoost nhận) hoặc xác suất fraud khác nhau"""
+        feature_diff = np.any(
+            expected['features'].astype(np.float32) != actual['features'].astype(np.float32), axis=1
+        )
+        proba_diff = expected['probabilities'][:, 1] != actual['probabilities'][:, 1]
+        return int(np.count_nonzero(feature_diff | proba_diff))
+
+    def _positional_args(self, transaction: Dict) -> Tuple:
+        """Tham số của prepare_input_dataframe từ dict giao dịch (city_pop tự lookup như preprocess_one)"""
+        city_pop = transaction.get('city_pop')
+        if city_pop is None:
+            city_pop = self.lookup_city_population(transaction['city'])
+        return (
+            transaction['amt'], transaction['gender'], transaction['category'],
+            transaction['transaction_hour'], transaction['transaction_day'], transaction['age'],
+            transaction['city'], city_pop, transaction.get('transaction_month')
+        )
     
+    def score_index_values(self) -> Dict[int, np.ndarray]:
+        """
+        Các giá trị (đã scale, theo vị trí cột đầu vào classifier) mà mỗi feature rời rạc
+        có thể nhận từ input mobile app - dùng để liệt kê tổ hợp khi build ScoreIndex
+        """
+        # age suy ra từ datetime có thể lệch ±1 so với tuổi đã clip 18-100
+        reachable = {
+            'category': sorted(set(CATEGORY_VN_TO_EN.values()) | {'misc_pos'}),
+            'gender': sorted(set(GENDER_VN_TO_EN.values())),
+            'transaction_hour': list(range(24)),
+            'transaction_day': list(range(7)),
+            'transaction_month': list(range(1, 13)),
+            'age': list(range(16, 103)),
+            'city_pop': sorted(set(PROVINCE_POPULATION.values()) | {1000000})
+        }
+        return {
+            out_pos: self._plan._scale(base_idx, self._plan._raw_column(name, reachable[name]))
+            for out_pos, base_idx, name in self._plan.variable_slots
+            if name in reachable
+        }
+
+    def build_score_index(self, max_combos: int = 5_000_000) -> ScoreIndex:
+        """Build ScoreIndex cho model hiện tại (cần inference plan để biết hằng số và scaling)"""
+        if self._plan is None:
+            raise RuntimeError("Score index requires the compiled inference plan")
+        amt_position = self._plan.selected_names.index('amt')
+        return ScoreIndex.build(
+            self._booster, self._iteration_range,
+            base_row=self._plan.constant_row,
+            amt_position=amt_position,
+            discrete_values=self.score_index_values(),
+            max_combos=max_combos
+        )
+
+    def load_score_index(self, path: str, build: bool = False, max_combos: int = 5_000_000):
+        """
+        Load ScoreIndex từ file .npz (build + lưu nếu chưa có và build=True).
+        Index build từ model khác (fingerprint lệch) bị bỏ qua.
+        """
+        index = None
+        if os.path.exists(path):
+            try:
+                index = ScoreIndex.load(path)
+            except Exception as e:
+                print(f"⚠️  Score index not loaded ({path}): {e}")
+            else:
+                if index.fingerprint != booster_fingerprint(self._booster, self._iteration_range):
+                    print(f"⚠️  Score index {path} was built for a different model - ignored")
+                    index = None
+
+        if index is None and build:
+            try:
+                index = self.build_score_index(max_combos=max_combos)
+                index.save(path)
+            except Exception as e:
+                print(f"⚠️  Score index build failed: {e}")
+                index = None
+
+        self._score_index = index
+        if index is not None:
+            report = index.memory_report()
+            print(f"✅ Score index loaded: {report['n_combos']:,} combos, {report['total_mb']} MB")
+
+    def score_index_stats(self) -> Dict:
+        """Số lần tra index trúng / phải fallback về engine"""
+        with self._score_index_stats_lock:
+            hits = self._score_index_stats['hits']
+            fallbacks = self._score_index_stats['fallbacks']
+        total = hits + fallbacks
+        return {
+            'enabled': self._score_index is not None,
+            'hits': hits,
+            'fallbacks': fallbacks,
+            'hit_rate': round(hits / total, 4) if total else None
+        }
+
     def convert_vnd_to_usd(self, vnd_amount: float) -> float:
         """Convert VND sang USD"""
         return vnd_amount / VND_TO_USD_RATE
@@ -362,7 +689,8 @@ class FraudDetectorService:
     def prepare_input_dataframe(self, amt_vnd: float, gender_vn: str, 
                                 category_vn: str, transaction_hour: int,
                                 transaction_day: int, age: int, city: str,
-                                city_pop: int, transaction_month: int = None) -> pd.DataFrame:
+                                city_pop: int, transaction_month: int = None,
+                                now: datetime = None) -> pd.DataFrame:
         """
         Chuẩn bị DataFrame input cho model (theo logic predict.py)
         
@@ -376,10 +704,30 @@ class FraudDetectorService:
             city: Thành phố/Tỉnh VN (REQUIRED)
             city_pop: Dân số tỉnh/thành (REQUIRED - app đã lookup)
             transaction_month: Tháng 1-12 (OPTIONAL, default=6)
+            now: thời điểm tham chiếu (mặc định datetime.now())
             
         Returns:
             Tuple (DataFrame, converted_info)
         """
+        converted_info = self.normalize_input(
+            amt_vnd, gender_vn, category_vn, transaction_hour,
+            transaction_day, age, city, city_pop, transaction_month
+        )
+        transaction_date, dob = self.transaction_datetimes(converted_info, now)
+        df = pd.DataFrame([self._input_row(converted_info, transaction_date, dob)])
+        
+        return df, converted_info
+
+    def normalize_input(self, amt_vnd: float, gender_vn: str,
+                        category_vn: str, transaction_hour: int,
+                        transaction_day: int, age: int, city: str,
+                        city_pop: int, transaction_month: int = None) -> Dict:
+        """
+        Validate + convert + normalize input (phần chung của prepare_input_dataframe và inference plan)
+        
+        Returns:
+            Dict converted_info
+        """
         # Validate amount
         if amt_vnd <= 0:
             raise ValueError("Amount must be positive")
@@ -403,65 +751,174 @@ class FraudDetectorService:
         else:
             transaction_month = self.normalize_month(transaction_month)
         
-        # Tạo datetime
-        now = datetime.now()
+        return {
+            'amt_vnd': amt_vnd,
+            'amt_usd': amt_usd,
+            'gender_vn': gender_vn,
+            'gender_en': gender_en,
+            'category_vn': category_vn,
+            'category_en': category_en,
+            'transaction_hour': transaction_hour,
+            'transaction_day': transaction_day,
+            'transaction_month': transaction_month,
+            'age': age,
+            'city': city,
+            'city_pop': city_pop
+        }
+
+    def transaction_datetimes(self, converted: Dict, now: datetime = None) -> Tuple[datetime, datetime]:
+        """
+        Tạo (trans_date_trans_time, dob) từ input đã normalize
+        
+        Raises:
+            ValueError: ngày không tồn tại (vd. hôm nay 29/02 và năm sinh không nhuận) -
+                cùng thông báo lỗi dòng của normalize_batch
+        """
+        now = now or datetime.now()
         transaction_date = now.replace(
-            hour=transaction_hour,
+            hour=converted['transaction_hour'],
             minute=0,
             second=0,
             microsecond=0,
             day=1,
-            month=transaction_month
+            month=converted['transaction_month']
         )
         
         # Tính DOB từ age
-        dob = datetime(now.year - age, now.month, now.day)
-        
-        # Tạo DataFrame với TẤT CẢ features theo đúng thứ tự training
-        data = {
+        try:
+            dob = datetime(now.year - converted['age'], now.month, now.day)
+        except ValueError:
+            raise ValueError(INVALID_DATE_ERROR)
+        return transaction_date, dob
+
+    def _input_row(self, converted: Dict, transaction_date, dob) -> Dict:
+        """Một dòng input với TẤT CẢ features theo đúng thứ tự training"""
+        return {
             'cc_num': 1234567890123456,
             'merchant': self.default_values['merchant'],
-            'category': category_en,
-            'amt': amt_usd,
+            'category': converted['category_en'],
+            'amt': converted['amt_usd'],
             'first': 'John',
             'last': 'Doe',
-            'gender': gender_en,
+            'gender': converted['gender_en'],
             'street': self.default_values['street'],
             'city': self.default_values['city'],
             'state': self.default_values['state'],
             'zip': self.default_values['zip'],
             'lat': self.default_values['lat'],
             'long': self.default_values['long'],
-            'city_pop': city_pop,
+            'city_pop': converted['city_pop'],
             'job': self.default_values['job'],
             'merch_lat': self.default_values['merch_lat'],
             'merch_long': self.default_values['merch_long'],
             'trans_date_trans_time': transaction_date,
             'dob': dob
         }
+
+    def model_inputs(self, converted: Dict, now: datetime = None) -> Dict:
+        """
+        Input cho InferencePlan: các cột phụ thuộc người dùng ở không gian model,
+        datetime được suy ra đúng như DateFeatureExtractor (không qua pandas)
+        """
+        transaction_date, dob = self.transaction_datetimes(converted, now)
+        return {
+            'category': converted['category_en'],
+            'amt': converted['amt_usd'],
+            'gender': converted['gender_en'],
+            'city_pop': converted['city_pop'],
+            'transaction_hour': transaction_date.hour,
+            'transaction_day': transaction_date.weekday(),
+            'transaction_month': transaction_date.month,
+            'age': (transaction_date - dob).days // 365
+        }
+
+    def transform_features(self, X: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        Chạy các bước preprocessing của pipeline (date_features → ... → feature_selector) MỘT lần
         
-        df = pd.DataFrame([data])
+        Returns:
+            Tuple (raw_frame, features)
+            - raw_frame: DataFrame ngay trước bước scaler (giá trị đã encode, chưa scale)
+            - features: ndarray đầu vào của classifier (sau scaler + feature_selector)
+        """
+        raw_frame = None
+        for name, step in self._model.steps[:-1]:
+            if name == 'scaler':
+                raw_frame = X
+            X = step.transform(X)
+
+        if isinstance(X, pd.DataFrame):
+            # Tên cột output của feature_selector là nguồn tên feature chính xác nhất
+            self._feature_columns = [str(c) for c in X.columns]
+            return raw_frame, X.values
+        return raw_frame, np.asarray(X)
+
+    def classify(self, fraud_proba: np.ndarray) -> np.ndarray:
+        """
+        Suy ra class (0/1) từ xác suất fraud theo đúng threshold của model
+        - Pipeline wrapper có `threshold` (FraudDetectionPipeline): fraud khi proba >= threshold
+        - XGBClassifier.predict mặc định: fraud khi proba > 0.5
+        """
+        threshold = getattr(self._model, 'threshold', None)
+        if threshold is None:
+            return (fraud_proba > 0.5).astype(int)
+        return (fraud_proba >= threshold).astype(int)
+
+    def score_frame(self, X: pd.DataFrame) -> Dict:
+        """
+        Chấm điểm DataFrame input (1 hoặc N dòng) với MỘT lần chạy pipeline
         
-        converted_info = {
-            'amt_vnd': amt_vnd,
-            'amt_usd': amt_usd,
-            'gender_vn': gender_vn,
-            'gender_en': gender_en,
-            'category_vn': category_vn,
-            'category_en': category_en,
-            'transaction_hour': transaction_hour,
-            'transaction_day': transaction_day,
-            'transaction_month': transaction_month,
-            'age': age,
-            'city': city,
-            'city_pop': city_pop
+        Returns:
+            Dict gồm:
+            - probabilities: ndarray (N, 2) [safe, fraud]
+            - prediction: ndarray (N,) class 0/1
+            - features: ndarray đầu vào classifier (dùng lại cho explain_features)
+            - raw_frame: DataFrame trước scaler (giá trị thô cho giải thích)
+        """
+        raw_frame, features = self.transform_features(X)
+        scored = self.score_features(features)
+        scored['raw_frame'] = raw_frame
+        return scored
+
+    def score_features(self, features: np.ndarray) -> Dict:
+        """
+        Chấm điểm ma trận đã preprocess (đầu vào classifier)
+        Có ScoreIndex: tra bảng trước, dòng nào miss mới chấm bằng engine đang chọn
+        """
+        if self._score_index is not None:
+            fraud_proba, hit = self._score_index.lookup(features)
+            n_hits = int(np.count_nonzero(hit))
+            with self._score_index_stats_lock:
+                self._score_index_stats['hits'] += n_hits
+                self._score_index_stats['fallbacks'] += len(hit) - n_hits
+            if n_hits < len(hit):
+                fraud_proba[~hit] = self._engine_probabilities(features[~hit])[:, 1]
+            probabilities = np.column_stack((1.0 - fraud_proba, fraud_proba))
+        else:
+            probabilities = self._engine_probabilities(features)
+
+        return {
+            'probabilities': probabilities,
+            'prediction': self.classify(probabilities[:, 1]),
+            'features': features
         }
-        
-        return df, converted_info
-    
+
+    def _engine_probabilities(self, features: np.ndarray) -> np.ndarray:
+        """Xác suất (N, 2) [safe, fraud] từ engine đang chọn"""
+        if self.engine == 'booster':
+            fraud_proba = self._booster.inplace_predict(
+                np.ascontiguousarray(features, dtype=np.float32),
+                iteration_range=self._iteration_range,
+                validate_features=False
+            )
+            fraud_proba = np.asarray(fraud_proba).reshape(-1)
+            return np.column_stack((1.0 - fraud_proba, fraud_proba))
+        return self._model.named_steps['classifier'].predict_proba(features)
+
     def predict(self, amt: float, gender: str, category: str, 
                 transaction_hour: int, transaction_day: int, age: int,
-                city: str, city_pop: int = None, transaction_month: int = None) -> Dict:
+                city: str, city_pop: int = None, transaction_month: int = None,
+                return_features: bool = False) -> Dict:
         """
         Dự đoán fraud cho giao dịch (theo logic predict.py)
         
@@ -475,23 +932,21 @@ class FraudDetectorService:
             city: Thành phố/Tỉnh VN (REQUIRED)
             city_pop: Dân số tỉnh/thành (OPTIONAL - nếu không có, tự lookup từ city)
             transaction_month: Tháng 1-12 (OPTIONAL)
+            return_features: Nếu True, kèm 'features' (dòng đã preprocess) và 'raw_features'
+                (giá trị trước scaler) để explain_features dùng lại, không chạy lại pipeline
             
         Returns:
             Dict chứa kết quả dự đoán
         """
-        # Nếu không có city_pop, tự lookup từ city
-        if city_pop is None:
-            city_pop = self.lookup_city_population(city)
-        
-        # Prepare input
-        X, converted = self.prepare_input_dataframe(
-            amt, gender, category, transaction_hour, 
-            transaction_day, age, city, city_pop, transaction_month
+        converted, features, raw_features = self.preprocess_one(
+            amt, gender, category, transaction_hour, transaction_day, age,
+            city, city_pop, transaction_month, with_raw=return_features
         )
-        
-        # Predict
-        prediction = self._model.predict(X)[0]
-        proba = self._model.predict_proba(X)[0]
+        # Một lần chạy pipeline cho cả class và xác suất
+        scored = self.score_features(features)
+
+        prediction = scored['prediction'][0]
+        proba = scored['probabilities'][0]
         
         result = {
             'is_fraud': bool(prediction),
@@ -500,9 +955,303 @@ class FraudDetectorService:
             'prediction': int(prediction),
             'input_converted': converted
         }
+
+        if return_features:
+            result['features'] = features[0]
+            result['raw_features'] = raw_features
         
         return result
 
+    def score_and_explain(self, amt: float, gender: str, category: str,
+                          transaction_hour: int, transaction_day: int, age: int,
+                          city: str, city_pop: int = None, transaction_month: int = None,
+                          top_k: int = 6, explain_fraud_only: bool = False) -> Dict:
+        """
+        Dự đoán + giải thích (TreeSHAP) với MỘT lần preprocessing
+        
+        Args:
+            (như predict())
+            top_k: Số factor trả về
+            explain_fraud_only: Nếu True, chỉ tính contributions khi giao dịch bị đánh giá fraud
+            
+        Returns:
+            Dict kết quả giống predict(return_features=True), kèm 'explanation'
+            ({top_factors, bias, note} như explain_features, hoặc None nếu bỏ qua)
+        """
+        result = self.predict(
+            amt, gender, category, transaction_hour, transaction_day, age,
+            city, city_pop, transaction_month, return_features=True
+        )
+        if explain_fraud_only and not result['is_fraud']:
+            result['explanation'] = None
+        else:
+            result['explanation'] = self.explain_features(
+                result['features'], result['raw_features'], top_k=top_k
+            )
+        return result
+
+    def preprocess_one(self, amt: float, gender: str, category: str,
+                       transaction_hour: int, transaction_day: int, age: int,
+                       city: str, city_pop: int = None, transaction_month: int = None,
+                       with_raw: bool = True) -> Tuple[Dict, np.ndarray, Dict]:
+        """
+        Preprocess MỘT giao dịch thành dòng đầu vào classifier
+        
+        Returns:
+            Tuple (converted_info, features (1, n_features), raw_features)
+            - raw_features: giá trị trước scaler {feature: value} (None nếu with_raw=False)
+        """
+        # Nếu không có city_pop, tự lookup từ city
+        if city_pop is None:
+            city_pop = self.lookup_city_population(city)
+        
+        if self._plan is not None:
+            # Inference plan: dựng thẳng dòng đầu vào classifier, không qua pandas
+            converted = self.normalize_input(
+                amt, gender, category, transaction_hour,
+                transaction_day, age, city, city_pop, transaction_month
+            )
+            inputs = self.model_inputs(converted)
+            features = self._plan.transform(inputs)
+            raw_features = self._plan.raw_row(inputs) if with_raw else None
+        else:
+            X, converted = self.prepare_input_dataframe(
+                amt, gender, category, transaction_hour, 
+                transaction_day, age, city, city_pop, transaction_month
+            )
+            raw_frame, features = self.transform_features(X)
+            raw_features = self._raw_row(raw_frame, 0) if with_raw else None
+
+        return converted, features, raw_features
+
+    @staticmethod
+    def _raw_row(raw_frame, position: int) -> Dict:
+        """Lấy giá trị trước scaler của một dòng dưới dạng dict {feature: value}"""
+        try:
+            if isinstance(raw_frame, pd.DataFrame) and len(raw_frame.index) > position:
+                return raw_frame.iloc[position].to_dict()
+        except Exception:
+            pass
+        return {}
+
+    def prepare_batch_dataframe(self, transactions: List[Dict]) -> Tuple[pd.DataFrame, List[Dict], Dict[int, str]]:
+        """
+        Chuẩn bị DataFrame N dòng cho nhiều giao dịch (vectorized theo cột,
+        cùng logic với prepare_input_dataframe)
+        
+        Args:
+            transactions: List dict, mỗi dict có các key giống tham số của predict()
+                (amt, gender, category, transaction_hour, transaction_day, age, city,
+                city_pop optional, transaction_month optional)
+            
+        Returns:
+            Tuple (DataFrame, converted_infos, row_errors)
+            - DataFrame chỉ gồm các dòng hợp lệ, index = vị trí trong transactions
+            - converted_infos: converted_info theo thứ tự các dòng của DataFrame
+            - row_errors: {vị trí: thông báo lỗi} cho các dòng không hợp lệ
+        """
+        columns, converted_infos, row_errors = self.normalize_batch(transactions)
+        return self._batch_dataframe(columns), converted_infos, row_errors
+
+    def _batch_dataframe(self, columns: Dict) -> pd.DataFrame:
+        """DataFrame N dòng với TẤT CẢ features theo đúng thứ tự training"""
+        data = {
+            'cc_num': 1234567890123456,
+            'merchant': self.default_values['merchant'],
+            'category': columns['category'],
+            'amt': columns['amt'],
+            'first': 'John',
+            'last': 'Doe',
+            'gender': columns['gender'],
+            'street': self.default_values['street'],
+            'city': self.default_values['city'],
+            'state': self.default_values['state'],
+            'zip': self.default_values['zip'],
+            'lat': self.default_values['lat'],
+            'long': self.default_values['long'],
+            'city_pop': columns['city_pop'],
+            'job': self.default_values['job'],
+            'merch_lat': self.default_values['merch_lat'],
+            'merch_long': self.default_values['merch_long'],
+            'trans_date_trans_time': columns['trans_date_trans_time'],
+            'dob': columns['dob']
+        }
+        return pd.DataFrame(data, index=columns['index'])
+
+    def normalize_batch(self, transactions: List[Dict], now: datetime = None) -> Tuple[Dict, List[Dict], Dict[int, str]]:
+        """
+        Validate + convert + normalize nhiều giao dịch theo cột (phần chung của
+        prepare_batch_dataframe và inference plan)
+        
+        Args:
+            now: thời điểm tham chiếu (mặc định datetime.now())
+        
+        Returns:
+            Tuple (columns, converted_infos, row_errors)
+            - columns: {'index', 'category', 'amt', 'gender', 'city_pop',
+              'trans_date_trans_time', 'dob'} cho các dòng hợp lệ (đã ở không gian model)
+            - converted_infos, row_errors: như prepare_batch_dataframe
+        """
+        def column(key):
+            return pd.Series([t.get(key) for t in transactions], dtype=object)
+
+        def text_column(key):
+            return column(key).fillna('').astype(str).str.lower().str.strip()
+
+        row_errors = {}
+
+        def flag(mask, message):
+            for pos in np.flatnonzero(mask.to_numpy()):
+                row_errors.setdefault(int(pos), message)
+
+        amt_vnd = pd.to_numeric(column('amt'), errors='coerce')
+        flag(~(amt_vnd > 0), "Amount must be positive")
+
+        cities = column('city').fillna('').astype(str)
+        city_pop = pd.to_numeric(column('city_pop'), errors='coerce')
+        city_pop = city_pop.fillna(
+            cities.str.lower().str.strip().map(PROVINCE_POPULATION).fillna(1000000)
+        )
+        flag(~(city_pop > 0), "City population must be positive")
+
+        numeric = {}
+        for key in ('transaction_hour', 'transaction_day', 'age'):
+            numeric[key] = pd.to_numeric(column(key), errors='coerce')
+            flag(numeric[key].isna(), f"Invalid {key}")
+        transaction_month = pd.to_numeric(column('transaction_month'), errors='coerce')
+
+        valid = np.ones(len(transactions), dtype=bool)
+        valid[list(row_errors)] = False
+
+        transaction_hour = numeric['transaction_hour'][valid].astype(int).clip(0, 23)
+        transaction_day = numeric['transaction_day'][valid].astype(int).clip(0, 6)
+        age = numeric['age'][valid].astype(int).clip(18, 100)
+        transaction_month = transaction_month[valid].fillna(
+            self.default_values['transaction_month']
+        ).astype(int).clip(1, 12)
+
+        # Tạo datetime (cùng quy tắc với prepare_input_dataframe)
+        now = now or datetime.now()
+        transaction_date = pd.to_datetime(pd.DataFrame({
+            'year': now.year, 'month': transaction_month, 'day': 1, 'hour': transaction_hour
+        }), errors='coerce')
+        dob = pd.to_datetime(pd.DataFrame({
+            'year': now.year - age, 'month': now.month, 'day': now.day
+        }), errors='coerce')
+
+        bad_dates = (transaction_date.isna() | dob.isna()).to_numpy()
+        if bad_dates.any():
+            for pos in transaction_date.index[bad_dates]:
+                row_errors[int(pos)] = INVALID_DATE_ERROR
+            valid[transaction_date.index[bad_dates]] = False
+
+        index = np.flatnonzero(valid)
+        amt_usd = self.convert_vnd_to_usd(amt_vnd[index])
+        gender_vn = column('gender')[index].fillna('').astype(str)
+        gender_en = text_column('gender')[index].map(GENDER_VN_TO_EN).fillna('M')
+        category_vn = column('category')[index].fillna('').astype(str)
+        category_en = text_column('category')[index].map(CATEGORY_VN_TO_EN).fillna('misc_pos')
+        city_pop = city_pop[index].astype(np.int64)
+
+        converted_infos = [
+            {
+                'amt_vnd': float(row[0]),
+                'amt_usd': float(row[1]),
+                'gender_vn': row[2],
+                'gender_en': row[3],
+                'category_vn': row[4],
+                'category_en': row[5],
+                'transaction_hour': int(row[6]),
+                'transaction_day': int(row[7]),
+                'transaction_month': int(row[8]),
+                'age': int(row[9]),
+                'city': row[10],
+                'city_pop': int(row[11])
+            }
+            for row in zip(
+                amt_vnd[index], amt_usd, gender_vn, gender_en, category_vn, category_en,
+                transaction_hour[index], transaction_day[index], transaction_month[index],
+                age[index], cities[index], city_pop
+            )
+        ]
+
+        columns = {
+            'index': index,
+            'category': category_en,
+            'amt': amt_usd,
+            'gender': gender_en,
+            'city_pop': city_pop,
+            'trans_date_trans_time': transaction_date[index],
+            'dob': dob[index]
+        }
+
+        return columns, converted_infos, row_errors
+
+    def _batch_model_inputs(self, columns: Dict) -> Dict:
+        """Input cho InferencePlan từ normalize_batch (datetime suy ra giống DateFeatureExtractor)"""
+        transaction_date = columns['trans_date_trans_time']
+        return {
+            'category': columns['category'].to_numpy(),
+            'amt': columns['amt'].to_numpy(dtype=np.float64),
+            'gender': columns['gender'].to_numpy(),
+            'city_pop': columns['city_pop'].to_numpy(dtype=np.float64),
+            'transaction_hour': transaction_date.dt.hour.to_numpy(),
+            'transaction_day': transaction_date.dt.dayofweek.to_numpy(),
+            'transaction_month': transaction_date.dt.month.to_numpy(),
+            'age': ((transaction_date - columns['dob']).dt.days // 365).to_numpy()
+        }
+
+    def predict_batch(self, transactions: List[Dict], return_features: bool = False) -> List[Dict]:
+        """
+        Dự đoán fraud cho nhiều giao dịch trong MỘT lần chạy pipeline
+        
+        Args:
+            transactions: List dict (cùng các key như tham số của predict())
+            return_features: Nếu True, mỗi kết quả kèm 'features'/'raw_features' như predict()
+            
+        Returns:
+            List cùng độ dài và thứ tự với transactions. Mỗi phần tử là dict kết quả
+            giống predict(), hoặc {'error': ...} nếu dòng đó không hợp lệ.
+        """
+        if not transactions:
+            return []
+
+        columns, converted_infos, row_errors = self.normalize_batch(transactions)
+
+        results = [{'error': row_errors[i]} if i in row_errors else None
+                   for i in range(len(transactions))]
+        positions = columns['index']
+        if len(positions) == 0:
+            return results
+
+        raw_rows = None
+        if self._plan is not None:
+            inputs = self._batch_model_inputs(columns)
+            scored = self.score_features(self._plan.transform(inputs))
+            if return_features:
+                raw_rows = self._plan.raw_rows(inputs)
+        else:
+            scored = self.score_frame(self._batch_dataframe(columns))
+
+        for row, (pos, prediction, proba, converted) in enumerate(zip(
+            positions, scored['prediction'], scored['probabilities'], converted_infos
+        )):
+            results[pos] = {
+                'is_fraud': bool(prediction),
+                'fraud_probability': float(proba[1]),
+                'safe_probability': float(proba[0]),
+                'prediction': int(prediction),
+                'input_converted': converted
+            }
+            if return_features:
+                results[pos]['features'] = scored['features'][row]
+                if raw_rows is not None:
+                    results[pos]['raw_features'] = raw_rows[row]
+                else:
+                    results[pos]['raw_features'] = self._raw_row(scored['raw_frame'], row)
+
+        return results
+
     def explain_contributions(self, amt: float, gender: str, category: str,
                               transaction_hour: int, transaction_day: int, age: int,
                               city: str, city_pop: int = None, transaction_month: int = None,
@@ -514,79 +1263,55 @@ class FraudDetectorService:
         - This reflects model behavior more faithfully than hand-written if/else rules.
         - Contributions are on the model's internal feature space after preprocessing.
         """
-        if city_pop is None:
-            city_pop = self.lookup_city_population(city)
-
-        X, converted = self.prepare_input_dataframe(
-            amt, gender, category, transaction_hour,
-            transaction_day, age, city, city_pop, transaction_month
+        converted, features, raw_features = self.preprocess_one(
+            amt, gender, category, transaction_hour, transaction_day, age,
+            city, city_pop, transaction_month
         )
 
-        pipeline = self._model
-        # Manually run deterministic preprocessing steps up to feature_selector
-        X1 = pipeline.named_steps['date_features'].transform(X)
-        X2 = pipeline.named_steps['missing_handler'].transform(X1)
-        X3 = pipeline.named_steps['categorical_encoder'].transform(X2)
-
-        base_feature_names = list(X3.columns) if isinstance(X3, pd.DataFrame) else None
-        raw_row = {}
-        try:
-            if isinstance(X3, pd.DataFrame) and len(X3.index) > 0:
-                raw_row = X3.iloc[0].to_dict()
-        except Exception:
-            raw_row = {}
-
-        X4 = pipeline.named_steps['scaler'].transform(X3)
-        X5 = pipeline.named_steps['feature_selector'].transform(X4)
-
-        selector = pipeline.named_steps['feature_selector']
-        feature_names = None
-
-        def _translate_feature_tokens(tokens, base_names):
-            if not tokens or not base_names:
-                return tokens
-            translated = []
-            for tok in tokens:
-                tok_str = str(tok)
-                m = re.match(r'^feature_(\d+)$', tok_str)
-                if m:
-                    idx = int(m.group(1))
-                    if 0 <= idx < len(base_names):
-                        translated.append(base_names[idx])
-                        continue
-                translated.append(tok_str)
-            return translated
-
-        # Prefer names from selector (training-time feature selection)
-        selected = getattr(selector, 'selected_features_', None)
-        if isinstance(selected, (list, tuple)) and len(selected) == getattr(X5, 'shape', [0, 0])[1]:
-            selected_list = [str(s) for s in selected]
-            # Many trained pipelines store placeholder names feature_0..feature_n
-            feature_names = _translate_feature_tokens(selected_list, base_feature_names)
+        explained = self.explain_features(features[0], raw_features, top_k=top_k)
+        explained['input_converted'] = converted
+        return explained
 
-        # If selector didn't select, use the pre-scaler DataFrame column names
-        if feature_names is None and base_feature_names is not None:
-            try:
-                if getattr(X5, 'shape', [0, 0])[1] == len(base_feature_names):
-                    feature_names = list(base_feature_names)
-            except Exception:
-                pass
+    def explain_features(self, features: np.ndarray, raw_features: Dict, top_k: int = 6) -> Dict:
+        """Tính contributions (TreeSHAP) cho MỘT dòng đã preprocess sẵn
 
-        # If output is a DataFrame, its columns are authoritative
-        if isinstance(X5, pd.DataFrame):
-            feature_names = list(X5.columns)
+        Args:
+            features: Dòng đầu vào classifier (từ predict(return_features=True) hoặc score_frame)
+            raw_features: Giá trị trước scaler {feature: value} của cùng dòng
+            top_k: Số factor trả về
+        """
+        X5_values = np.asarray(features).reshape(1, -1)
+        raw_row = raw_features or {}
 
-        if not feature_names:
-            feature_names = [f'feature_{i}' for i in range(int(X5.shape[1]))]
+        # Tên feature đã resolve lúc load; chỉ tính lại nếu số cột không khớp
+        feature_names = self._feature_names
+        if feature_names is None or len(feature_names) != X5_values.shape[1]:
+            feature_names = self._feature_names_for(X5_values.shape[1], list(raw_row.keys()) or None)
 
-        clf = pipeline.named_steps['classifier']
-        booster = clf.get_booster()
+        # Input cùng chữ ký lớp split → contributions + bias giống hệt nhau
+        def compute_contribs():
+            # Cột đã đúng thứ tự training, bỏ qua kiểm tra tên feature của DMatrix
+            dmat = xgb.DMatrix(np.ascontiguousarray(X5_values, dtype=np.float32))
+            contribs = self._booster.predict(
+                dmat, pred_contribs=True,
+                iteration_range=self._iteration_range,
+                validate_features=False
+            )
+            # contribs shape: (n_samples, n_features + 1), last column is bias
+            return contribs[0]
 
-        X5_values = X5.values if isinstance(X5, pd.DataFrame) else X5
-        dmat = xgb.DMatrix(X5_values, feature_names=list(feature_names))
-        contribs = booster.predict(dmat, pred_contribs=True)
-        # contribs shape: (n_samples, n_features + 1), last column is bias
-        row = contribs[0]
+        if self.contrib_cache is not None:
+            cache_key = self.contrib_cache.key(X5_values[0])
+            row = self.contrib_cache.get(cache_key)
+            if row is None:
+                def compute_and_store():
+                    computed = compute_contribs()
+                    self.contrib_cache.put(cache_key, computed)
+                    return computed
+                # Request đồng thời cùng chữ ký → một lần TreeSHAP
+                row = self.contrib_flight.do(cache_key, compute_and_store)
+        else:
+            row = compute_contribs()
         bias = float(row[-1])
         row = row[:-1]
 
@@ -632,8 +1357,7 @@ class FraudDetectorService:
         return {
             'top_factors': top_items,
             'bias': bias,
-            'note': 'Computed via XGBoost pred_contribs (TreeSHAP-like) on the trained model',
-            'input_converted': converted
+            'note': 'Computed via XGBoost pred_contribs (TreeSHAP-like) on the trained model'
         }
 
 
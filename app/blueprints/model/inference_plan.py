@@ -0,0 +1,173 @@
+"""
+Compiled Inference Plan - Chạy phần preprocessing của pipeline bằng NumPy thuần
+
+Pipeline đã pickle (date_features → missing_handler → categorical_encoder → scaler →
+feature_selector) được "biên dịch" MỘT lần lúc load model:
+- 21 cột sau DateFeatureExtractor: 13 cột là hằng số (cc_num, merchant, first, last,
+  street, city US, state, zip, lat, long, job, merch_lat, merch_long) → encode + scale sẵn
+- 8 cột phụ thuộc input người dùng → chỉ còn tra mapping LabelEncoder + 1 phép affine
+- feature_selector → danh sách chỉ số cột
+
+Kết quả: dòng đầu vào classifier được dựng trực tiếp, không tạo DataFrame,
+không gọi pd.to_datetime.
+"""
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+
+# Các cột (sau DateFeatureExtractor) phụ thuộc input của người dùng; các cột còn lại là hằng số
+VARIABLE_FEATURES = (
+    'category', 'amt', 'gender', 'city_pop',
+    'transaction_hour', 'transaction_day', 'transaction_month', 'age'
+)
+
+
+def _scaler_params(scaler, X_raw: pd.DataFrame, n_features: int):
+    """
+    Trích hệ số affine theo từng cột của scaler
+
+    Returns:
+        Tuple (kind, a, b):
+        - 'center_scale': scaled = (x - a) / b   (StandardScaler, RobustScaler, MaxAbsScaler)
+        - 'mul_add':      scaled = x * a + b     (MinMaxScaler, hoặc scaler khác - dò bằng 2 điểm)
+    """
+    zeros = np.zeros(n_features, dtype=np.float64)
+    ones = np.ones(n_features, dtype=np.float64)
+    name = type(scaler).__name__
+
+    if name == 'StandardScaler':
+        center = scaler.mean_ if getattr(scaler, 'with_mean', True) and scaler.mean_ is not None else zeros
+        scale = scaler.scale_ if getattr(scaler, 'with_std', True) and scaler.scale_ is not None else ones
+        return 'center_scale', np.asarray(center, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+    if name == 'RobustScaler':
+        center = scaler.center_ if getattr(scaler, 'center_', None) is not None else zeros
+        scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else ones
+        return 'center_scale', np.asarray(center, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+    if name == 'MaxAbsScaler':
+        return 'center_scale', zeros, np.asarray(scaler.scale_, dtype=np.float64)
+
+    if name == 'MinMaxScaler':
+        return 'mul_add', np.asarray(scaler.scale_, dtype=np.float64), np.asarray(scaler.min_, dtype=np.float64)
+
+    # Scaler không biết trước: giả định affine theo cột, dò tại x=0 và x=1
+    # (InferencePlan.verify ở FraudDetectorService sẽ loại plan nếu giả định sai)
+    probe = pd.DataFrame(np.vstack([zeros, ones]), columns=X_raw.columns)
+    out = np.asarray(scaler.transform(probe), dtype=np.float64)
+    return 'mul_add', out[1] - out[0], out[0]
+
+
+def _selected_indices(selector, scaled_template, n_features: int) -> np.ndarray:
+    """Chỉ số cột mà feature_selector giữ lại (dò bằng một dòng 0..n-1)"""
+    probe = np.arange(n_features, dtype=np.float64).reshape(1, -1)
+    if isinstance(scaled_template, pd.DataFrame):
+        probe = pd.DataFrame(probe, columns=scaled_template.columns)
+    out = selector.transform(probe)
+    out = out.values if isinstance(out, pd.DataFrame) else np.asarray(out)
+    return out.ravel().astype(np.intp)
+
+
+class InferencePlan:
+    """
+    Preprocessing đã biên dịch cho input 7 trường của mobile app
+
+    Input của transform()/raw_row() là dict các cột VARIABLE_FEATURES ở "không gian model"
+    (category/gender đã đổi sang tiếng Anh, amt theo USD, transaction_day/age đã suy ra
+    từ datetime như DateFeatureExtractor). Mỗi giá trị là scalar hoặc array 1 chiều.
+    """
+
+    def __init__(self, base_columns: List[str], raw_template: np.ndarray,
+                 encoders: Dict[str, Dict[str, int]], kind: str,
+                 a: np.ndarray, b: np.ndarray, selected_idx: np.ndarray):
+        self.base_columns = list(base_columns)
+        self.raw_template = raw_template
+        self.encoders = encoders
+        self.kind = kind
+        self.a = a
+        self.b = b
+        self.selected_idx = selected_idx
+        self.selected_names = [self.base_columns[i] for i in selected_idx]
+
+        # Hằng số đã scale sẵn tại các vị trí được chọn; cột biến thiên được ghi đè khi transform
+        self.constant_row = self._scale(np.arange(len(base_columns)), raw_template)[selected_idx]
+
+        base_pos = {name: i for i, name in enumerate(self.base_columns)}
+        # (vị trí output, vị trí base, tên cột) cho các cột biến thiên nằm trong feature được chọn
+        self.variable_slots = [
+            (out_pos, int(base_idx), self.base_columns[base_idx])
+            for out_pos, base_idx in enumerate(selected_idx)
+            if self.base_columns[base_idx] in VARIABLE_FEATURES
+        ]
+        self.variable_base = {name: base_pos[name] for name in VARIABLE_FEATURES}
+
+    @classmethod
+    def compile(cls, pipeline, template: pd.DataFrame) -> 'InferencePlan':
+        """
+        Biên dịch plan từ pipeline đã load
+
+        Args:
+            pipeline: sklearn Pipeline (date_features, missing_handler, categorical_encoder,
+                scaler, feature_selector, classifier)
+            template: DataFrame 1 dòng do FraudDetectorService.prepare_input_dataframe tạo ra,
+                cung cấp giá trị cho các cột hằng số
+        """
+        steps = pipeline.named_steps
+        X = steps['date_features'].transform(template)
+        X = steps['missing_handler'].transform(X)
+        X_raw = steps['categorical_encoder'].transform(X)
+
+        base_columns = [str(c) for c in X_raw.columns]
+        missing = [c for c in VARIABLE_FEATURES if c not in base_columns]
+        if missing:
+            raise ValueError(f"Pipeline output thiếu cột: {missing}")
+
+        encoders = {}
+        for col, le in steps['categorical_encoder'].label_encoders.items():
+            if col in VARIABLE_FEATURES:
+                encoders[col] = {str(c): i for i, c in enumerate(le.classes_)}
+
+        raw_template = X_raw.iloc[0].to_numpy(dtype=np.float64)
+        kind, a, b = _scaler_params(steps['scaler'], X_raw, len(base_columns))
+        scaled_template = steps['scaler'].transform(X_raw)
+        selected_idx = _selected_indices(steps['feature_selector'], scaled_template, len(base_columns))
+
+        return cls(base_columns, raw_template, encoders, kind, a, b, selected_idx)
+
+    def _scale(self, base_idx, raw):
+        if self.kind == 'center_scale':
+            return (raw - self.a[base_idx]) / self.b[base_idx]
+        return raw * self.a[base_idx] + self.b[base_idx]
+
+    def _raw_column(self, name: str, values) -> np.ndarray:
+        mapping = self.encoders.get(name)
+        if mapping is not None:
+            # Category chưa gặp lúc training → class đầu tiên (mã 0), giống CategoricalEncoder
+            values = np.atleast_1d(values)
+            return np.fromiter((mapping.get(str(v), 0) for v in values), dtype=np.float64, count=len(values))
+        return np.atleast_1d(np.asarray(values, dtype=np.float64))
+
+    def transform(self, inputs: Dict) -> np.ndarray:
+        """Dựng ma trận đầu vào classifier (N, n_selected) từ các cột VARIABLE_FEATURES"""
+        n = len(np.atleast_1d(inputs['amt']))
+        out = np.empty((n, len(self.selected_idx)), dtype=np.float64)
+        out[:] = self.constant_row
+        for out_pos, base_idx, name in self.variable_slots:
+            out[:, out_pos] = self._scale(base_idx, self._raw_column(name, inputs[name]))
+        return out
+
+    def raw_rows(self, inputs: Dict) -> List[Dict]:
+        """raw_row cho mọi dòng của batch: mỗi cột biến thiên chỉ map MỘT lần"""
+        n = len(np.atleast_1d(inputs['amt']))
+        raw = np.tile(self.raw_template, (n, 1))
+        for name, base_idx in self.variable_base.items():
+            raw[:, base_idx] = self._raw_column(name, inputs[name])
+        return [dict(zip(self.base_columns, row)) for row in raw.tolist()]
+
+    def raw_row(self, inputs: Dict, position: int = 0) -> Dict:
+        """Giá trị trước scaler {feature: value} của một dòng (tương đương raw_frame.iloc[position])"""
+        raw = self.raw_template.copy()
+        for name, base_idx in self.variable_base.items():
+            raw[base_idx] = self._raw_column(name, inputs[name])[position]
+        return dict(zip(self.base_columns, raw.tolist()))
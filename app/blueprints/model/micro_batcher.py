@@ -0,0 +1,231 @@
+"""
+Micro-batcher - Gom các request /predict-fraud đồng thời thành một batch vectorized
+
+Mỗi worker thread của Flask gọi submit() với một giao dịch và chờ kết quả. Một thread nền
+lấy request đầu tiên trong hàng đợi, chờ thêm tối đa `max_wait_ms` (hoặc tới khi đủ
+`max_batch_size` dòng) rồi chấm điểm cả batch bằng MỘT lần gọi predict_batch.
+
+Histogram kích thước batch và thời gian chờ trong hàng đợi giúp cân chỉnh
+throughput ↔ latency (xem GET /api/model/stats).
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List
+import os
+import queue
+import threading
+import time
+
+
+# Bucket mặc định của histogram (cận trên, bao gồm)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+QUEUE_WAIT_MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+# Đặt vào hàng đợi để thread nền dừng (sau khi chấm xong các request xếp trước nó)
+_STOP = object()
+
+
+class Histogram:
+    """Histogram đếm theo bucket cố định (thread-safe)"""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.bounds) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.bounds, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            labels = list(self.bounds) + ['+Inf']
+            return {
+                'buckets': [{'le': le, 'count': c} for le, c in zip(labels, self._counts)],
+                'count': self._count,
+                'sum': round(self._sum, 3),
+                'mean': round(self._sum / self._count, 3) if self._count else None,
+                'max': round(self._max, 3)
+            }
+
+
+class _Pending:
+    """Một request đang chờ trong hàng đợi"""
+    __slots__ = ('transaction', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, transaction: Dict):
+        self.transaction = transaction
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Gom request đơn lẻ thành batch
+
+    Args:
+        score_batch: hàm nhận List[dict giao dịch] và trả về list kết quả cùng thứ tự,
+            mỗi phần tử là dict kết quả hoặc {'error': ...} (như FraudDetectorService.predict_batch)
+        max_batch_size: số dòng tối đa mỗi batch
+        max_wait_ms: thời gian tối đa request đầu tiên của batch chờ thêm request khác
+    """
+
+    def __init__(self, score_batch: Callable[[List[Dict]], List[Dict]],
+                 max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must be >= 0")
+
+        self.score_batch = score_batch
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = float(max_wait_ms) / 1000.0
+
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+
+        self._start_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+    def _worker_alive(self) -> bool:
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_worker(self):
+        # Thread nền được tạo lazily trong process đang phục vụ request
+        # (tạo lại sau fork, ví dụ gunicorn --preload, hoặc khi thread cũ đã chết)
+        if self._worker_alive():
+            return
+        with self._start_lock:
+            if self._closed:
+                raise RuntimeError("Micro-batcher has been shut down")
+            if self._worker_alive():
+                return
+            if self._queue is None or self._pid != os.getpid():
+                # Sau fork: hàng đợi của process cha không dùng được; thread chết: giữ hàng đợi cho request đang chờ
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='fraud-micro-batcher', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = 1.0):
+        """
+        Dừng thread nền (vd. khi configure() thay batcher mới)
+
+        Request đã xếp hàng vẫn được chấm; request lọt vào hàng đợi sau khi dừng nhận RuntimeError.
+        """
+        with self._start_lock:
+            self._closed = True
+            thread, q = self._thread, self._queue
+            self._thread = None
+        if q is None or self._pid != os.getpid():
+            return
+        if thread is not None and thread.is_alive():
+            q.put(_STOP)
+            thread.join(timeout)
+        leftover = []
+        while True:
+            try:
+                item = q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        self._fail(leftover, RuntimeError("Micro-batcher has been shut down"))
+
+    def submit(self, transaction: Dict, timeout: float = None) -> Dict:
+        """
+        Chấm điểm một giao dịch qua batch chung (block tới khi có kết quả)
+
+        Raises:
+            ValueError: dòng không hợp lệ (thông báo lỗi từ score_batch)
+            TimeoutError: quá `timeout` giây chưa có kết quả
+        """
+        self._ensure_worker()
+        pending = _Pending(transaction)
+        self._queue.put(pending)
+
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Micro-batch scoring timed out")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self):
+        q = self._queue
+        stopping = False
+        while not stopping:
+            first = q.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                # Không để thread nền chết với request còn đang chờ
+                self._fail(batch, e)
+
+    def _dispatch(self, batch: List[_Pending]):
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for pending in batch:
+            self.queue_wait_ms.observe((started - pending.enqueued_at) * 1000.0)
+
+        try:
+            results = list(self.score_batch([pending.transaction for pending in batch]))
+        except Exception as e:
+            self._fail(batch, e)
+            return
+
+        for position, pending in enumerate(batch):
+            result = results[position] if position < len(results) else None
+            if not isinstance(result, dict):
+                # score_batch trả thiếu dòng: báo lỗi thay vì để request chờ mãi
+                pending.error = RuntimeError("Micro-batch scoring returned no result for this transaction")
+            elif 'error' in result:
+                pending.error = ValueError(result['error'])
+            else:
+                pending.result = result
+            pending.done.set()
+
+    @staticmethod
+    def _fail(batch: List[_Pending], error: Exception):
+        """Trả lỗi cho mọi request trong batch chưa có kết quả"""
+        for pending in batch:
+            if not pending.done.is_set():
+                pending.error = error
+                pending.done.set()
+
+    def stats(self) -> Dict:
+        """Cấu hình + histogram batch size / queue wait (ms)"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_ms': self.queue_wait_ms.snapshot()
+        }
@@ -4,22 +4,58 @@ Model routes - Fraud detection predictions using direct model
 from flask import request, jsonify, current_app
 from app.blueprints.model import model_bp
 from app.blueprints.model.fraud_detector import fraud_detector
+from app.cache import MemoryCache, create_cache
+from app.blueprints.model.explanation_jobs import ExplanationJobs, JOB_DONE, JOB_ERROR
+from app.blueprints.model.explanation_templates import render_explanation
+from app.blueprints.model.semantic_cache import SemanticExplanationCache
 from app.blueprints.openai.services import OpenAIService
+from app.utils.singleflight import SingleFlight
+from functools import partial
 import re
 import time
 import json
 import hashlib
-import threading
 
 
-# Simple in-memory caches (per-process) to avoid recomputing explanations for identical inputs.
-# NOTE: In multi-worker deployments (gunicorn/uwsgi), each worker has its own cache.
-_cache_lock = threading.Lock()
-_CONTRIB_CACHE = {}  # key -> (ts, factors)
-_AI_EXPL_CACHE = {}  # key -> (ts, explanation)
+# Cache giải thích AI (bước chậm nhất). Backend cấu hình qua CACHE_* trong Config:
+# memory (mỗi worker một bản), sqlite (dùng chung giữa các worker trên một máy), redis.
+_AI_EXPL_CACHE = MemoryCache('ai_explanation', ttl_seconds=10 * 60, max_items=256)
 
-_CACHE_TTL_SECONDS = 10 * 60  # 10 minutes
-_CACHE_MAX_ITEMS = 256
+# Giải thích AI chạy nền (explanation_mode=async), tra kết quả qua GET /explanations/<id>
+_EXPLANATION_JOBS = ExplanationJobs()
+
+# Tầng cache thứ hai theo chữ ký thô (None = tắt, bật qua SEMANTIC_CACHE_ENABLED)
+_SEMANTIC_EXPL_CACHE = None
+
+# Burst các giao dịch giống nhau cùng miss cache → chỉ một lời gọi LLM cho mỗi ai_key
+_AI_EXPL_FLIGHT = SingleFlight()
+
+# Giá trị hợp lệ của explanation_mode / explanation_engine trong request /predict-fraud
+EXPLANATION_MODES = ('sync', 'async')
+EXPLANATION_ENGINES = ('llm', 'template', 'auto')
+
+
+def configure_caches(config):
+    """Tạo cache + executor giải thích theo app config (gọi một lần khi đăng ký model blueprint)"""
+    global _AI_EXPL_CACHE, _EXPLANATION_JOBS, _SEMANTIC_EXPL_CACHE
+    _AI_EXPL_CACHE = create_cache('ai_explanation', config)
+    _SEMANTIC_EXPL_CACHE = None
+    if config.get('SEMANTIC_CACHE_ENABLED', False):
+        _SEMANTIC_EXPL_CACHE = SemanticExplanationCache(
+            create_cache(
+                'ai_explanation_semantic', config,
+                ttl_seconds=config.get('SEMANTIC_CACHE_TTL_SECONDS', 86400),
+                max_items=config.get('SEMANTIC_CACHE_MAX_ITEMS', 4096)
+            ),
+            amt_bands=config.get('SEMANTIC_CACHE_AMT_BANDS') or (),
+            hour_band=config.get('SEMANTIC_CACHE_HOUR_BAND', 3),
+            age_band=config.get('SEMANTIC_CACHE_AGE_BAND', 10),
+            top_factors=config.get('SEMANTIC_CACHE_TOP_FACTORS', 3)
+        )
+    _EXPLANATION_JOBS = ExplanationJobs(
+        max_workers=config.get('AI_EXPLANATION_WORKERS', 4),
+        ttl_seconds=config.get('AI_EXPLANATION_JOB_TTL_SECONDS', 600)
+    )
 
 
 def _cache_key_from_obj(obj) -> str:
@@ -27,28 +63,143 @@ def _cache_key_from_obj(obj) -> str:
     return hashlib.sha256(blob.encode("utf-8")).hexdigest()
 
 
-def _cache_get(cache: dict, key: str):
-    now = time.time()
-    with _cache_lock:
-        item = cache.get(key)
-        if not item:
-            return None
-        ts, value = item
-        if now - ts > _CACHE_TTL_SECONDS:
-            cache.pop(key, None)
-            return None
-        return value
+def _validate_transaction(data):
+    """
+    Validate 7 trường bắt buộc + các trường optional của một giao dịch
+
+    Returns:
+        Tuple (fields, error): fields là dict đã chuẩn hóa kiểu dữ liệu,
+        error là thông báo lỗi (None nếu hợp lệ)
+    """
+    if not isinstance(data, dict):
+        return None, 'Transaction must be a JSON object'
+
+    # Validate required fields (7 trường bắt buộc, city_pop là OPTIONAL)
+    required_fields = ['amt', 'gender', 'category', 'transaction_hour', 
+                      'transaction_day', 'age', 'city']
+    missing_fields = [field for field in required_fields if field not in data]
+    
+    if missing_fields:
+        return None, f'Missing required fields: {", ".join(missing_fields)}'
+    
+    amt = data['amt']
+    gender = data['gender']
+    category = data['category']
+    transaction_hour = data['transaction_hour']
+    transaction_day = data['transaction_day']
+    age = data['age']
+    city = data['city']
+    city_pop = data.get('city_pop')  # OPTIONAL - nếu app gửi thì dùng, không thì backend tự lookup
+    transaction_month = data.get('transaction_month')  # Optional
+    
+    # Validate amt (Số tiền VND)
+    try:
+        amt = float(amt)
+        if amt <= 0:
+            raise ValueError("Amount must be positive")
+    except (ValueError, TypeError):
+        return None, f'Invalid amount: {amt}. Must be a positive number'
+    
+    # Validate gender (Giới tính: Nam/Nữ)
+    if gender not in ['Nam', 'Nữ']:
+        return None, f'Invalid gender: {gender}. Must be "Nam" or "Nữ"'
+    
+    # Validate transaction_hour (0-23)
+    try:
+        transaction_hour = int(transaction_hour)
+        if not (0 <= transaction_hour <= 23):
+            raise ValueError()
+    except (ValueError, TypeError):
+        return None, f'Invalid transaction_hour: {transaction_hour}. Must be 0-23'
+    
+    # Validate transaction_day (0-6, Monday=0, Sunday=6)
+    try:
+        transaction_day = int(transaction_day)
+        if not (0 <= transaction_day <= 6):
+            raise ValueError()
+    except (ValueError, TypeError):
+        return None, f'Invalid transaction_day: {transaction_day}. Must be 0-6 (Monday=0, Sunday=6)'
+    
+    # Validate age (18-100)
+    try:
+        age = int(age)
+        if not (18 <= age <= 100):
+            raise ValueError()
+    except (ValueError, TypeError):
+        return None, f'Invalid age: {age}. Must be 18-100'
+    
+    # Validate city_pop nếu có (nếu không có, fraud_detector sẽ tự lookup)
+    if city_pop is not None:
+        try:
+            city_pop = int(city_pop)
+            if city_pop <= 0:
+                raise ValueError("City population must be positive")
+        except (ValueError, TypeError):
+            return None, f'Invalid city_pop: {city_pop}. Must be a positive integer'
+    
+    # Validate transaction_month if provided
+    if transaction_month is not None:
+        try:
+            transaction_month = int(transaction_month)
+            if not (1 <= transaction_month <= 12):
+                raise ValueError()
+        except (ValueError, TypeError):
+            return None, f'Invalid transaction_month: {transaction_month}. Must be 1-12'
+
+    return {
+        'amt': amt,
+        'gender': gender,
+        'category': category,
+        'transaction_hour': transaction_hour,
+        'transaction_day': transaction_day,
+        'age': age,
+        'city': city,
+        'city_pop': city_pop,
+        'transaction_month': transaction_month,
+    }, None
+
+
+def _score(fields: dict) -> dict:
+    """
+    Chấm điểm một giao dịch đã validate.
+    Trả về dict như fraud_detector.predict(return_features=True): contributions (TreeSHAP)
+    tính sau từ 'features' / 'raw_features', không chạy lại preprocessing.
+    """
+    batcher = fraud_detector.batcher
+    if batcher is None:
+        return fraud_detector.predict(**fields, return_features=True)
+
+    # Gom với các request đồng thời khác thành một batch vectorized
+    return batcher.submit(fields, timeout=current_app.config.get('FRAUD_MICRO_BATCH_TIMEOUT_SECONDS', 10))
+
 
+def _risk_assessment(fraud_proba: float):
+    """Map fraud probability -> (risk_level, confidence)"""
+    if fraud_proba < 0.1:
+        return "very_low", "very_high"
+    elif fraud_proba < 0.3:
+        return "low", "high"
+    elif fraud_proba < 0.5:
+        return "medium", "medium"
+    elif fraud_proba < 0.7:
+        return "high", "medium"
+    return "very_high", "high"
 
-def _cache_set(cache: dict, key: str, value):
-    now = time.time()
-    with _cache_lock:
-        cache[key] = (now, value)
-        if len(cache) > _CACHE_MAX_ITEMS:
-            # Evict oldest entries
-            oldest = sorted(cache.items(), key=lambda kv: kv[1][0])[: max(1, len(cache) - _CACHE_MAX_ITEMS)]
-            for k, _ in oldest:
-                cache.pop(k, None)
+
+def _format_input(converted: dict) -> dict:
+    """Format input_converted của fraud_detector thành block 'input' trả về cho client"""
+    return {
+        'amt_vnd': converted['amt_vnd'],
+        'amt_usd': round(converted['amt_usd'], 2),
+        'gender': f"{converted['gender_vn']} ({converted['gender_en']})",
+        'category': f"{converted['category_vn']} ({converted['category_en']})",
+        'transaction_hour': converted['transaction_hour'],
+        'transaction_day': converted['transaction_day'],
+        'transaction_month': converted['transaction_month'],
+        'age': converted['age'],
+        'city': converted['city'],
+        'city_pop': converted['city_pop']  # Return as integer, not formatted string
+    }
 
 
 @model_bp.route('/predict-fraud', methods=['POST'])
@@ -66,9 +217,20 @@ def predict_fraud():
         "age": 28,                        // Tuổi (18-100) [REQUIRED]
         "city": "ha noi",                 // Thành phố/Tỉnh VN [REQUIRED]
         "city_pop": 8054000,              // Dân số tỉnh/thành [REQUIRED - app tự lookup]
-        "transaction_month": 6            // Tháng (1-12) [OPTIONAL, default=6]
+        "transaction_month": 6,           // Tháng (1-12) [OPTIONAL, default=6]
+        "explanation_detail": "full",     // short | full [OPTIONAL]
+        "explanation_mode": "sync",       // sync | async [OPTIONAL, default=AI_EXPLANATION_MODE]
+        "explanation_engine": "llm"       // llm | template | auto [OPTIONAL, default=AI_EXPLANATION_ENGINE]
     }
     
+    explanation_mode=async: khi fraud, response có "explanation_id" + "ai_explanation_status"
+    thay vì chờ LLM; lấy giải thích qua GET /api/model/explanations/<explanation_id>.
+    
+    explanation_engine: template = giải thích sinh cục bộ từ contributions (không gọi LLM);
+    auto = gọi LLM, dùng template khi LLM lỗi hoặc quá AI_EXPLANATION_LLM_TIMEOUT_SECONDS.
+    Response có "explanation_engine" cho biết engine đã sinh ai_explanation.
+    explanation_mode / explanation_engine không hợp lệ → 400.
+    
     Response:
     {
         "success": true,
@@ -101,139 +263,53 @@ def predict_fraud():
                 'error': 'No JSON data provided'
             }), 400
         
-        # Validate required fields (7 trường bắt buộc, city_pop là OPTIONAL)
-        required_fields = ['amt', 'gender', 'category', 'transaction_hour', 
-                          'transaction_day', 'age', 'city']
-        missing_fields = [field for field in required_fields if field not in data]
-        
-        if missing_fields:
+        fields, error = _validate_transaction(data)
+        if error:
             return jsonify({
                 'success': False,
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
+                'error': error
             }), 400
-        
-        amt = data['amt']
-        gender = data['gender']
-        category = data['category']
-        transaction_hour = data['transaction_hour']
-        transaction_day = data['transaction_day']
-        age = data['age']
-        city = data['city']
-        city_pop = data.get('city_pop')  # OPTIONAL - nếu app gửi thì dùng, không thì backend tự lookup
-        transaction_month = data.get('transaction_month')  # Optional
+
+        amt = fields['amt']
+        gender = fields['gender']
+        category = fields['category']
+        transaction_hour = fields['transaction_hour']
+        transaction_day = fields['transaction_day']
+        age = fields['age']
+        city = fields['city']
+        city_pop = fields['city_pop']
+        transaction_month = fields['transaction_month']
         explanation_detail = data.get('explanation_detail', 'full')  # Optional: short|full
-        
-        # Validate amt (Số tiền VND)
-        try:
-            amt = float(amt)
-            if amt <= 0:
-                raise ValueError("Amount must be positive")
-        except (ValueError, TypeError):
-            return jsonify({
-                'success': False,
-                'error': f'Invalid amount: {amt}. Must be a positive number'
-            }), 400
-        
-        # Validate gender (Giới tính: Nam/Nữ)
-        if gender not in ['Nam', 'Nữ']:
+        # Optional: sync (chờ giải thích AI) | async (trả về explanation_id ngay)
+        explanation_mode = str(
+            data.get('explanation_mode') or current_app.config.get('AI_EXPLANATION_MODE', 'sync')
+        ).strip().lower()
+        # Optional: llm | template (cục bộ) | auto (LLM, fallback template)
+        explanation_engine = str(
+            data.get('explanation_engine') or current_app.config.get('AI_EXPLANATION_ENGINE', 'llm')
+        ).strip().lower()
+        if explanation_mode not in EXPLANATION_MODES:
             return jsonify({
                 'success': False,
-                'error': f'Invalid gender: {gender}. Must be "Nam" or "Nữ"'
+                'error': f"Invalid explanation_mode '{explanation_mode}'. Must be one of: {', '.join(EXPLANATION_MODES)}"
             }), 400
-        
-        # Validate transaction_hour (0-23)
-        try:
-            transaction_hour = int(transaction_hour)
-            if not (0 <= transaction_hour <= 23):
-                raise ValueError()
-        except (ValueError, TypeError):
+        if explanation_engine not in EXPLANATION_ENGINES:
             return jsonify({
                 'success': False,
-                'error': f'Invalid transaction_hour: {transaction_hour}. Must be 0-23'
+                'error': f"Invalid explanation_engine '{explanation_engine}'. Must be one of: {', '.join(EXPLANATION_ENGINES)}"
             }), 400
         
-        # Validate transaction_day (0-6, Monday=0, Sunday=6)
-        try:
-            transaction_day = int(transaction_day)
-            if not (0 <= transaction_day <= 6):
-                raise ValueError()
-        except (ValueError, TypeError):
-            return jsonify({
-                'success': False,
-                'error': f'Invalid transaction_day: {transaction_day}. Must be 0-6 (Monday=0, Sunday=6)'
-            }), 400
-        
-        # Validate age (18-100)
-        try:
-            age = int(age)
-            if not (18 <= age <= 100):
-                raise ValueError()
-        except (ValueError, TypeError):
-            return jsonify({
-                'success': False,
-                'error': f'Invalid age: {age}. Must be 18-100'
-            }), 400
-        
-        # Validate city_pop nếu có (nếu không có, fraud_detector sẽ tự lookup)
-        if city_pop is not None:
-            try:
-                city_pop = int(city_pop)
-                if city_pop <= 0:
-                    raise ValueError("City population must be positive")
-            except (ValueError, TypeError):
-                return jsonify({
-                    'success': False,
-                    'error': f'Invalid city_pop: {city_pop}. Must be a positive integer'
-                }), 400
-        
-        # Validate transaction_month if provided
-        if transaction_month is not None:
-            try:
-                transaction_month = int(transaction_month)
-                if not (1 <= transaction_month <= 12):
-                    raise ValueError()
-            except (ValueError, TypeError):
-                return jsonify({
-                    'success': False,
-                    'error': f'Invalid transaction_month: {transaction_month}. Must be 1-12'
-                }), 400
-        
         current_app.logger.info(
             f"[PREDICT-FRAUD] Input: amt={amt} VND, gender={gender}, category={category}, "
             f"hour={transaction_hour}, day={transaction_day}, age={age}, city={city}, city_pop={city_pop}"
         )
         
-        # Predict using fraud_detector (với 7 required + city_pop + 1 optional fields)
-        result = fraud_detector.predict(
-            amt=amt,
-            gender=gender,
-            category=category,
-            transaction_hour=transaction_hour,
-            transaction_day=transaction_day,
-            age=age,
-            city=city,
-            city_pop=city_pop,  # App đã lookup, truyền trực tiếp
-            transaction_month=transaction_month
-        )
+        # Predict; contributions (khi fraud) dùng lại dòng đã preprocess
+        result = _score(fields)
         
         # Determine risk level and confidence
         fraud_proba = result['fraud_probability']
-        
-        if fraud_proba < 0.1:
-            risk_level = "very_low"
-            confidence = "very_high"
-        elif fraud_proba < 0.3:
-            risk_level = "low"
-            confidence = "high"
-        elif fraud_proba < 0.5:
-            risk_level = "medium"
-            confidence = "medium"
-        elif fraud_proba < 0.7:
-            risk_level = "high"
-            confidence = "medium"
-        else:
-            risk_level = "very_high"
-            confidence = "high"
+        risk_level, confidence = _risk_assessment(fraud_proba)
         
         converted = result['input_converted']
         
@@ -248,56 +324,18 @@ def predict_fraud():
                 'risk_level': risk_level,
                 'confidence': confidence
             },
-            'input': {
-                'amt_vnd': converted['amt_vnd'],
-                'amt_usd': round(converted['amt_usd'], 2),
-                'gender': f"{converted['gender_vn']} ({converted['gender_en']})",
-                'category': f"{converted['category_vn']} ({converted['category_en']})",
-                'transaction_hour': converted['transaction_hour'],
-                'transaction_day': converted['transaction_day'],
-                'transaction_month': converted['transaction_month'],
-                'age': converted['age'],
-                'city': converted['city'],
-                'city_pop': converted['city_pop']  # Return as integer, not formatted string
-            }
+            'input': _format_input(converted)
         }
 
         # Only call AI explanation when fraud=true
         if result.get('is_fraud') is True:
             try:
-                # Cache key based on normalized request inputs (not on derived fields)
-                contrib_key = _cache_key_from_obj({
-                    'amt': float(amt),
-                    'gender': gender,
-                    'category': category,
-                    'transaction_hour': int(transaction_hour),
-                    'transaction_day': int(transaction_day),
-                    'age': int(age),
-                    'city': city,
-                    'city_pop': int(city_pop) if city_pop is not None else None,
-                    'transaction_month': int(transaction_month) if transaction_month is not None else None,
-                })
-
-                factors_for_ai = _cache_get(_CONTRIB_CACHE, contrib_key)
-                if factors_for_ai is None:
-                    # Compute model-level contribution factors (no external AI) to ground the explanation
-                    model_explain = fraud_detector.explain_contributions(
-                        amt=amt,
-                        gender=gender,
-                        category=category,
-                        transaction_hour=transaction_hour,
-                        transaction_day=transaction_day,
-                        age=age,
-                        city=city,
-                        city_pop=city_pop,
-                        transaction_month=transaction_month,
-                        top_k=6
-                    )
-
-                    all_factors = model_explain.get('top_factors', []) or []
-                    user_factors = [f for f in all_factors if f.get('source') == 'user_input']
-                    factors_for_ai = user_factors if user_factors else all_factors
-                    _cache_set(_CONTRIB_CACHE, contrib_key, factors_for_ai)
+                # Model-level contribution factors (no external AI) to ground the explanation
+                # (TreeSHAP lỗi → chỉ mất giải thích, kết quả dự đoán vẫn trả về)
+                contributions = fraud_detector.explain_features(result['features'], result['raw_features'], top_k=6)
+                all_factors = contributions.get('top_factors', []) or []
+                user_factors = [f for f in all_factors if f.get('source') == 'user_input']
+                factors_for_ai = user_factors if user_factors else all_factors
 
                 # Cache AI explanation as it is typically the slowest step
                 ai_key = _cache_key_from_obj({
@@ -309,24 +347,104 @@ def predict_fraud():
                     },
                     'input': response_payload['input'],
                     'model_top_factors': factors_for_ai,
+                    'explanation_detail': explanation_detail,
                 })
 
-                explanation = _cache_get(_AI_EXPL_CACHE, ai_key)
-                if explanation is None:
-                    explanation = OpenAIService.explain_prediction(
+                def _template_explanation():
+                    return render_explanation(
+                        response_payload['prediction'], response_payload['input'],
+                        factors_for_ai, explanation_detail
+                    )
+
+                # auto: giới hạn thời gian chờ LLM, hết hạn thì dùng template
+                llm_timeout = (
+                    current_app.config.get('AI_EXPLANATION_LLM_TIMEOUT_SECONDS', 8)
+                    if explanation_engine == 'auto' else None
+                )
+
+                def _call_llm(semantic_cache, semantic_key):
+                    generated = OpenAIService.explain_prediction(
                         prediction_result=response_payload['prediction'],
                         transaction_data={
                             **response_payload['input'],
                             # Grounding evidence from the model
                             'model_top_factors': factors_for_ai
                         },
-                        explanation_detail=explanation_detail
+                        explanation_detail=explanation_detail,
+                        timeout=llm_timeout
                     )
-                    _cache_set(_AI_EXPL_CACHE, ai_key, explanation)
-                response_payload['ai_explanation'] = explanation
-                response_payload['ai_explanation_success'] = True
+                    _AI_EXPL_CACHE.set(ai_key, generated)
+                    if semantic_cache is not None:
+                        semantic_cache.put(
+                            semantic_key, generated, response_payload['prediction'], response_payload['input'],
+                            factors_for_ai
+                        )
+                    return generated
+
+                def _generate_explanation(semantic_cache, semantic_key):
+                    """
+                    (giải thích, engine, lý do fallback) - chạy cả trên thread job (async),
+                    nên không ghi vào response_payload
+                    """
+                    # Request cùng ai_key đang gọi LLM → chờ và dùng chung kết quả/lỗi
+                    try:
+                        explanation = _AI_EXPL_FLIGHT.do(ai_key, lambda: _call_llm(semantic_cache, semantic_key))
+                        return explanation, 'llm', None
+                    except Exception as llm_err:
+                        if explanation_engine != 'auto':
+                            raise
+                        # Không ghi cache: lần sau vẫn thử LLM
+                        current_app.logger.warning(
+                            f"[PREDICT-FRAUD] LLM explanation failed, using template: {str(llm_err)}"
+                        )
+                        return _template_explanation(), 'template', str(llm_err)
+
                 # Optional: return factors for debugging/inspection (clients can ignore)
                 response_payload['model_top_factors'] = factors_for_ai
+                response_payload['explanation_engine'] = 'template' if explanation_engine == 'template' else 'llm'
+
+                # Tầng 2: chữ ký thô (risk level, dấu các top factor, band giá trị) → text đã điền giá trị
+                semantic_cache = _SEMANTIC_EXPL_CACHE if explanation_engine != 'template' else None
+                semantic_key = semantic_cache.signature(
+                    response_payload['prediction'], response_payload['input'],
+                    factors_for_ai, explanation_detail
+                ) if semantic_cache is not None else None
+
+                if explanation_engine == 'template':
+                    explanation = _template_explanation()
+                else:
+                    explanation = _AI_EXPL_CACHE.get(ai_key)
+                    if explanation is None and semantic_cache is not None:
+                        explanation = semantic_cache.get(
+                            semantic_key, response_payload['prediction'], response_payload['input'],
+                            factors_for_ai
+                        )
+                        if explanation is not None:
+                            response_payload['ai_explanation_cache'] = 'semantic'
+                if explanation is None and explanation_mode == 'async':
+                    # Trả kết quả dự đoán ngay; client lấy giải thích qua GET /explanations/<id>
+                    job = _EXPLANATION_JOBS.submit(
+                        current_app._get_current_object(), ai_key,
+                        partial(_generate_explanation, semantic_cache, semantic_key)
+                    )
+                    response_payload['explanation_id'] = ai_key
+                    response_payload['ai_explanation'] = None
+                    response_payload['ai_explanation_status'] = job['status']
+                    # Engine (llm / template khi auto fallback) chỉ biết khi job xong: GET /explanations/<id>
+                    response_payload['explanation_engine'] = job.get('explanation_engine')
+                else:
+                    if explanation is None:
+                        explanation, engine, fallback_reason = _generate_explanation(semantic_cache, semantic_key)
+                        response_payload['explanation_engine'] = engine
+                        if fallback_reason is not None:
+                            response_payload['ai_explanation_fallback_reason'] = fallback_reason
+                    # Giải thích template / semantic không lưu theo id → không có explanation_id
+                    if (explanation_mode == 'async' and response_payload['explanation_engine'] == 'llm'
+                            and 'ai_explanation_cache' not in response_payload):
+                        response_payload['explanation_id'] = ai_key
+                        response_payload['ai_explanation_status'] = JOB_DONE
+                    response_payload['ai_explanation'] = explanation
+                    response_payload['ai_explanation_success'] = True
             except Exception as ai_err:
                 current_app.logger.error(f"[PREDICT-FRAUD] AI explanation error: {str(ai_err)}")
                 response_payload['ai_explanation'] = None
@@ -343,3 +461,179 @@ def predict_fraud():
             'success': False,
             'error': f'Prediction failed: {str(e)}'
         }), 500
+
+
+@model_bp.route('/batch-predict', methods=['POST'])
+def batch_predict():
+    """
+    API: Predict fraud cho nhiều giao dịch trong một request (vectorized)
+    
+    Request body:
+    {
+        "transactions": [
+            {"amt": 500000, "gender": "Nam", "category": "xăng dầu", "transaction_hour": 13,
+             "transaction_day": 5, "age": 28, "city": "ha noi", "city_pop": 8054000},
+            ...
+        ]
+    }
+    
+    Response (lỗi từng dòng KHÔNG làm hỏng cả batch):
+    {
+        "success": true,
+        "total": 2,
+        "succeeded": 1,
+        "failed": 1,
+        "results": [
+            {"index": 0, "success": true, "prediction": {...}, "input": {...}},
+            {"index": 1, "success": false, "error": "Invalid age: 10. Must be 18-100"}
+        ],
+        "processing_time": 0.05
+    }
+    """
+    try:
+        start_time = time.time()
+        data = request.get_json(silent=True)
+        transactions = data.get('transactions') if isinstance(data, dict) else data
+
+        if not isinstance(transactions, list) or not transactions:
+            return jsonify({
+                'success': False,
+                'error': 'Request body must contain a non-empty "transactions" list'
+            }), 400
+
+        max_rows = current_app.config.get('BATCH_PREDICT_MAX_ROWS', 10000)
+        if len(transactions) > max_rows:
+            return jsonify({
+                'success': False,
+                'error': f'Too many transactions: {len(transactions)}. Maximum is {max_rows}'
+            }), 400
+
+        results = [None] * len(transactions)
+        valid_positions = []
+        valid_rows = []
+        for i, tx in enumerate(transactions):
+            fields, error = _validate_transaction(tx)
+            if error:
+                results[i] = {'index': i, 'success': False, 'error': error}
+            else:
+                valid_positions.append(i)
+                valid_rows.append(fields)
+
+        predictions = fraud_detector.predict_batch(valid_rows)
+
+        for i, result in zip(valid_positions, predictions):
+            if 'error' in result:
+                results[i] = {'index': i, 'success': False, 'error': result['error']}
+                continue
+            risk_level, confidence = _risk_assessment(result['fraud_probability'])
+            results[i] = {
+                'index': i,
+                'success': True,
+                'prediction': {
+                    'is_fraud': result['is_fraud'],
+                    'fraud_probability': result['fraud_probability'],
+                    'safe_probability': result['safe_probability'],
+                    'risk_level': risk_level,
+                    'confidence': confidence
+                },
+                'input': _format_input(result['input_converted'])
+            }
+
+        succeeded = sum(1 for r in results if r['success'])
+        total_time = time.time() - start_time
+        current_app.logger.info(
+            f"[BATCH-PREDICT] {len(transactions)} rows, {succeeded} ok, "
+            f"{len(transactions) - succeeded} failed in {total_time:.3f}s"
+        )
+
+        return jsonify({
+            'success': True,
+            'total': len(transactions),
+            'succeeded': succeeded,
+            'failed': len(transactions) - succeeded,
+            'results': results,
+            'processing_time': round(total_time, 3)
+        }), 200
+
+    except Exception as e:
+        current_app.logger.error(f"[BATCH-PREDICT] Error: {str(e)}")
+        import traceback
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': f'Batch prediction failed: {str(e)}'
+        }), 500
+
+
+@model_bp.route('/explanations/<explanation_id>', methods=['GET'])
+def get_explanation(explanation_id):
+    """
+    API: Trạng thái / kết quả giải thích AI chạy nền (explanation_mode=async)
+    
+    Response:
+    {
+        "success": true,
+        "explanation_id": "...",
+        "status": "pending" | "running" | "done" | "error",
+        "ai_explanation": "..." | null,
+        "explanation_engine": "llm" | "template" | null,   // null khi chưa xong
+        "ai_explanation_fallback_reason": null | "...",     // lỗi LLM khi auto dùng template
+        "ai_explanation_error": null | "..."
+    }
+    HTTP 202 khi còn đang chạy, 404 khi không có hoặc đã hết hạn.
+    """
+    job = _EXPLANATION_JOBS.get(explanation_id)
+    if job is None:
+        # Job có thể do worker khác tạo: kết quả vẫn nằm trong cache dùng chung
+        cached = _AI_EXPL_CACHE.get(explanation_id)
+        if cached is None:
+            return jsonify({
+                'success': False,
+                'error': 'Explanation not found or expired'
+            }), 404
+        # Cache giải thích chỉ chứa kết quả của LLM
+        job = {'status': JOB_DONE, 'ai_explanation': cached, 'explanation_engine': 'llm',
+               'fallback_reason': None, 'error': None}
+
+    status_code = 200 if job['status'] in (JOB_DONE, JOB_ERROR) else 202
+    return jsonify({
+        'success': True,
+        'explanation_id': explanation_id,
+        'status': job['status'],
+        'ai_explanation': job['ai_explanation'],
+        'explanation_engine': job['explanation_engine'],
+        'ai_explanation_fallback_reason': job['fallback_reason'],
+        'ai_explanation_error': job['error']
+    }), status_code
+
+
+@model_bp.route('/stats', methods=['GET'])
+def model_stats():
+    """
+    API: Số liệu runtime của tầng chấm điểm (để cân chỉnh throughput ↔ latency)
+    - engine: engine chấm điểm đang dùng
+    - micro_batch: histogram kích thước batch + thời gian chờ hàng đợi (null nếu tắt)
+    - score_index: số lần tra index trúng / fallback
+    - contrib_cache: hit rate của cache contributions (null nếu tắt)
+    - ai_explanation_cache: backend + hit rate của cache giải thích AI
+    - explanation_jobs: số job giải thích chạy nền theo trạng thái
+    - semantic_cache: hit rate của cache giải thích theo chữ ký thô (null nếu tắt)
+    - single_flight: số lời gọi LLM / TreeSHAP thực thi và số lời gọi được gộp
+    """
+    batcher = fraud_detector.batcher
+    contrib_cache = fraud_detector.contrib_cache
+    return jsonify({
+        'success': True,
+        'engine': fraud_detector.engine,
+        'micro_batch': batcher.stats() if batcher is not None else None,
+        'score_index': fraud_detector.score_index_stats(),
+        'contrib_cache': contrib_cache.stats() if contrib_cache is not None else None,
+        'ai_explanation_cache': _AI_EXPL_CACHE.stats(),
+        'semantic_cache': _SEMANTIC_EXPL_CACHE.stats() if _SEMANTIC_EXPL_CACHE is not None else None,
+        'explanation_jobs': _EXPLANATION_JOBS.stats(),
+        'single_flight': {
+            'ai_explanation': _AI_EXPL_FLIGHT.stats(),
+            'parse_transaction': OpenAIService._parse_flight.stats(),
+            'contributions': fraud_detector.contrib_flight.stats()
+        }
+    }), 200
@@ -0,0 +1,266 @@
+"""
+Score Index - Bảng tra xác suất fraud chính xác trên không gian input rời rạc
+
+Cây XGBoost chỉ so sánh `x < threshold` (float32). Với mỗi feature, các threshold chia
+trục giá trị thành các "lớp": hai giá trị cùng lớp đi cùng nhánh ở MỌI node của MỌI cây.
+Input mobile ngoài amt đều rời rạc (category, giới tính, giờ, ngày, tháng, tuổi, dân số
+tỉnh) → với mỗi tổ hợp lớp rời rạc, xác suất là hàm bậc thang theo amt, chỉ đổi giá trị
+tại các threshold của amt.
+
+ScoreIndex lưu, cho từng tổ hợp, các điểm gãy amt (đã sort) và xác suất tương ứng trong
+các mảng NumPy liền (kiểu CSR). Tra cứu = tính lớp của từng feature + binary search trên
+amt → kết quả trùng khớp tuyệt đối với Booster. Tổ hợp không có trong index (ví dụ
+city_pop tùy ý rơi vào lớp chưa liệt kê) được báo "miss" để caller fallback về Booster.
+"""
+from typing import Dict, List, Tuple
+import hashlib
+import json
+import numpy as np
+
+
+def extract_split_thresholds(booster, n_features: int) -> List[np.ndarray]:
+    """
+    Threshold (float32, đã sort, duy nhất) của từng feature trên toàn bộ cây của booster
+
+    Đọc từ JSON model (split_conditions được lưu đủ chính xác float32),
+    không dùng text dump vốn làm tròn threshold.
+    """
+    model = json.loads(booster.save_raw(raw_format='json'))
+    gbm = model['learner']['gradient_booster']
+    if 'gbtree' in gbm:  # dart bọc gbtree bên trong
+        gbm = gbm['gbtree']
+
+    splits = [[] for _ in range(n_features)]
+    for tree in gbm['model']['trees']:
+        for left, feature, condition in zip(tree['left_children'], tree['split_indices'],
+                                            tree['split_conditions']):
+            if left != -1:
+                splits[feature].append(condition)
+
+    return [np.unique(np.asarray(values, dtype=np.float32)) for values in splits]
+
+
+def booster_fingerprint(booster, iteration_range) -> str:
+    """Hash của model + iteration_range, dùng để từ chối index build từ model khác"""
+    digest = hashlib.sha256(bytes(booster.save_raw(raw_format='json')))
+    digest.update(repr(tuple(iteration_range)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _interval_representatives(thresholds: np.ndarray) -> np.ndarray:
+    """Một giá trị float32 đại diện cho mỗi lớp: lớp 0 < t[0], lớp k (k>=1) = t[k-1]"""
+    if len(thresholds) == 0:
+        return np.zeros(1, dtype=np.float32)
+    below = np.nextafter(thresholds[0], np.float32(-np.inf)).astype(np.float32)
+    return np.concatenate([[below], thresholds]).astype(np.float32)
+
+
+class ScoreIndex:
+    """
+    Index xác suất fraud theo tổ hợp lớp rời rạc × bậc thang amt
+
+    Arrays:
+    - dim_positions[d]: vị trí cột (trong ma trận đầu vào classifier) của chiều rời rạc d
+    - dim_thresholds / dim_threshold_offsets: threshold của từng chiều (nối liền)
+    - dim_slots / dim_slot_offsets: lớp → slot (-1 = lớp không có trong index) của từng chiều
+    - dim_radix[d]: số slot của chiều d (combo id = mixed-radix theo thứ tự chiều)
+    - amt_thresholds: threshold của amt (float32, đã sort)
+    - breakpoints / breakpoint_offsets: điểm gãy amt của từng combo, lưu dạng chỉ số vào
+      amt_thresholds (uint16 nếu đủ, nhỏ hơn một nửa so với lưu float32)
+    - probs: xác suất float32, combo c chiếm probs[breakpoint_offsets[c] + c : ... + 1]
+    """
+
+    def __init__(self, amt_position: int, dim_positions, dim_thresholds, dim_threshold_offsets,
+                 dim_slots, dim_slot_offsets, dim_radix, amt_thresholds, breakpoints,
+                 breakpoint_offsets, probs, fingerprint: str):
+        self.amt_position = int(amt_position)
+        self.dim_positions = np.asarray(dim_positions, dtype=np.int64)
+        self.dim_thresholds = np.asarray(dim_thresholds, dtype=np.float32)
+        self.dim_threshold_offsets = np.asarray(dim_threshold_offsets, dtype=np.int64)
+        self.dim_slots = np.asarray(dim_slots, dtype=np.int32)
+        self.dim_slot_offsets = np.asarray(dim_slot_offsets, dtype=np.int64)
+        self.dim_radix = np.asarray(dim_radix, dtype=np.int64)
+        self.amt_thresholds = np.asarray(amt_thresholds, dtype=np.float32)
+        self.breakpoints = np.asarray(breakpoints)
+        self.breakpoint_offsets = np.asarray(breakpoint_offsets, dtype=np.int64)
+        self.probs = np.asarray(probs, dtype=np.float32)
+        self.fingerprint = str(fingerprint)
+
+        self._dims = [
+            (
+                int(self.dim_positions[d]),
+                self.dim_thresholds[self.dim_threshold_offsets[d]:self.dim_threshold_offsets[d + 1]],
+                self.dim_slots[self.dim_slot_offsets[d]:self.dim_slot_offsets[d + 1]],
+                int(self.dim_radix[d])
+            )
+            for d in range(len(self.dim_positions))
+        ]
+
+    @property
+    def n_combos(self) -> int:
+        return len(self.breakpoint_offsets) - 1
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, booster, iteration_range, base_row: np.ndarray, amt_position: int,
+              discrete_values: Dict[int, np.ndarray], max_combos: int = 5_000_000,
+              chunk_rows: int = 1 << 20) -> 'ScoreIndex':
+        """
+        Liệt kê mọi tổ hợp lớp rời rạc và chấm điểm bằng Booster
+
+        Args:
+            booster: xgboost Booster
+            iteration_range: iteration_range dùng khi predict (giống service)
+            base_row: dòng đầu vào classifier chứa các hằng số đã scale
+            amt_position: vị trí cột amt trong dòng đầu vào classifier
+            discrete_values: {vị trí cột: các giá trị đã scale có thể gặp} cho mỗi feature rời rạc
+            max_combos: giới hạn số tổ hợp (tránh build index quá lớn)
+            chunk_rows: số dòng tối đa gửi vào Booster mỗi lần
+        """
+        n_features = len(base_row)
+        thresholds = extract_split_thresholds(booster, n_features)
+
+        dim_positions, dim_thr, dim_slots, dim_radix, dim_reps = [], [], [], [], []
+        for position, values in sorted(discrete_values.items()):
+            thr = thresholds[position]
+            values = np.asarray(values, dtype=np.float32)
+            classes = np.searchsorted(thr, values, side='right')
+            unique_classes, first = np.unique(classes, return_index=True)
+            slots = np.full(len(thr) + 1, -1, dtype=np.int32)
+            slots[unique_classes] = np.arange(len(unique_classes), dtype=np.int32)
+
+            dim_positions.append(position)
+            dim_thr.append(thr)
+            dim_slots.append(slots)
+            dim_radix.append(len(unique_classes))
+            dim_reps.append(values[first])
+
+        n_combos = int(np.prod(dim_radix, dtype=np.int64)) if dim_radix else 1
+        if n_combos > max_combos:
+            raise ValueError(
+                f"Score index would need {n_combos:,} combos (> max_combos={max_combos:,}); "
+                f"classes per dimension: {dim_radix}"
+            )
+
+        amt_thr = thresholds[amt_position]
+        amt_reps = _interval_representatives(amt_thr)
+        n_amt = len(amt_reps)
+        bp_dtype = np.uint16 if len(amt_thr) <= np.iinfo(np.uint16).max else np.uint32
+        bp_ids = np.arange(n_amt - 1, dtype=bp_dtype)
+
+        combos_per_chunk = max(1, chunk_rows // n_amt)
+        strides = np.cumprod([1] + dim_radix[::-1][:-1])[::-1] if dim_radix else []
+        base = np.asarray(base_row, dtype=np.float32)
+
+        bp_chunks, prob_chunks, count_chunks = [], [], []
+        for start in range(0, n_combos, combos_per_chunk):
+            combo_ids = np.arange(start, min(n_combos, start + combos_per_chunk), dtype=np.int64)
+            rows = np.repeat(base[None, :], len(combo_ids) * n_amt, axis=0)
+            for d, position in enumerate(dim_positions):
+                digit = (combo_ids // strides[d]) % dim_radix[d]
+                rows[:, position] = np.repeat(dim_reps[d][digit], n_amt)
+            rows[:, amt_position] = np.tile(amt_reps, len(combo_ids))
+
+            p = np.asarray(booster.inplace_predict(
+                rows, iteration_range=iteration_range, validate_features=False
+            ), dtype=np.float32).reshape(len(combo_ids), n_amt)
+
+            # Chỉ giữ điểm amt mà xác suất thực sự đổi
+            keep = np.ones_like(p, dtype=bool)
+            keep[:, 1:] = p[:, 1:] != p[:, :-1]
+            prob_chunks.append(p[keep])
+            bp_chunks.append(np.broadcast_to(bp_ids, (len(combo_ids), n_amt - 1))[keep[:, 1:]])
+            count_chunks.append(keep.sum(axis=1) - 1)
+
+        breakpoint_offsets = np.concatenate([[0], np.cumsum(np.concatenate(count_chunks))])
+        return cls(
+            amt_position=amt_position,
+            dim_positions=dim_positions,
+            dim_thresholds=np.concatenate(dim_thr) if dim_thr else np.zeros(0, np.float32),
+            dim_threshold_offsets=np.concatenate([[0], np.cumsum([len(t) for t in dim_thr])]),
+            dim_slots=np.concatenate(dim_slots) if dim_slots else np.zeros(0, np.int32),
+            dim_slot_offsets=np.concatenate([[0], np.cumsum([len(s) for s in dim_slots])]),
+            dim_radix=dim_radix,
+            amt_thresholds=amt_thr,
+            breakpoints=np.concatenate(bp_chunks),
+            breakpoint_offsets=breakpoint_offsets,
+            probs=np.concatenate(prob_chunks),
+            fingerprint=booster_fingerprint(booster, iteration_range)
+        )
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def lookup(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tra xác suất fraud cho ma trận đầu vào classifier (N, n_features)
+
+        Returns:
+            Tuple (fraud_proba float32 (N,), hit mask (N,)); dòng miss có proba = NaN
+        """
+        # XGBoost so sánh trên float32 → phân lớp cũng trên float32
+        X = np.atleast_2d(np.asarray(features, dtype=np.float32))
+        n = len(X)
+        combo = np.zeros(n, dtype=np.int64)
+        hit = np.ones(n, dtype=bool)
+        for position, thr, slots, radix in self._dims:
+            slot = slots[np.searchsorted(thr, X[:, position], side='right')]
+            hit &= slot >= 0
+            combo = combo * radix + np.maximum(slot, 0)
+
+        proba = np.full(n, np.nan, dtype=np.float32)
+        rows = np.flatnonzero(hit)
+        if len(rows) == 0:
+            return proba, hit
+
+        # Binary search vector hóa trên đoạn điểm gãy của từng combo (searchsorted side='right')
+        c = combo[rows]
+        amt = X[rows, self.amt_position]
+        lo = self.breakpoint_offsets[c]
+        hi = self.breakpoint_offsets[c + 1]
+        while True:
+            active = lo < hi
+            if not active.any():
+                break
+            mid = (lo + hi) // 2
+            mid_bp = self.breakpoints[np.minimum(mid, len(self.breakpoints) - 1)]
+            go_right = active & (self.amt_thresholds[mid_bp] <= amt)
+            lo = np.where(go_right, mid + 1, lo)
+            hi = np.where(active & ~go_right, mid, hi)
+        proba[rows] = self.probs[lo + c]
+        return proba, hit
+
+    # ------------------------------------------------------------------
+    # Persistence / report
+    # ------------------------------------------------------------------
+
+    _ARRAYS = ('dim_positions', 'dim_thresholds', 'dim_threshold_offsets', 'dim_slots',
+               'dim_slot_offsets', 'dim_radix', 'amt_thresholds', 'breakpoints', 'breakpoint_offsets', 'probs')
+
+    def save(self, path: str):
+        np.savez(path, amt_position=self.amt_position, fingerprint=self.fingerprint,
+                 **{name: getattr(self, name) for name in self._ARRAYS})
+
+    @classmethod
+    def load(cls, path: str) -> 'ScoreIndex':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(amt_position=int(data['amt_position']), fingerprint=str(data['fingerprint']),
+                       **{name: data[name] for name in cls._ARRAYS})
+
+    def memory_report(self) -> Dict:
+        """Kích thước index: số combo, số điểm gãy, bytes theo từng mảng"""
+        arrays = {name: int(getattr(self, name).nbytes) for name in self._ARRAYS}
+        total = sum(arrays.values())
+        return {
+            'n_combos': self.n_combos,
+            'classes_per_dimension': {int(p): int(r) for p, r in zip(self.dim_positions, self.dim_radix)},
+            'n_breakpoints': int(len(self.breakpoints)),
+            'avg_breakpoints_per_combo': round(len(self.breakpoints) / max(1, self.n_combos), 2),
+            'bytes_by_array': arrays,
+            'total_bytes': total,
+            'total_mb': round(total / (1024 * 1024), 3)
+        }
@@ -0,0 +1,361 @@
+"""
+Semantic Explanation Cache - Tầng cache thứ hai cho giải thích AI, khóa theo chữ ký thô
+
+Khóa của cache chính gồm toàn bộ block input + xác suất chính xác, nên hầu như mọi giao
+dịch fraud đều miss. Tầng này khóa theo chữ ký thô:
+    risk_level + explanation_detail
+    + top-K factor user-input theo thứ tự |contribution| kèm dấu (+/-)
+    + band số tiền / band giờ / band tuổi + giới tính + loại giao dịch + thành phố
+    (+ band dân số khi city_pop nằm trong top factors)
+
+Thành phố nằm trong chữ ký vì LLM thường viết tên có dấu ("Hà Nội") trong khi input là
+"ha noi": template chỉ dùng lại cho đúng thành phố đó.
+
+Text lưu vào cache được tham số hóa: các giá trị cụ thể (số tiền, xác suất, giờ, tuổi,
+tháng, thành phố, dân số, thứ, contribution + raw_value của từng factor) được thay bằng
+placeholder ⟦field:format⟧ giữ nguyên cách viết của LLM, rồi điền lại giá trị của giao dịch
+mới khi trả về. Text mà sau khi tham số hóa vẫn còn giá trị của giao dịch (cách viết lạ,
+hoặc cùng một chuỗi ứng với hai giá trị khác nhau) không được lưu.
+"""
+from bisect import bisect_right
+from typing import Dict, List, Optional
+import hashlib
+import json
+import math
+import numbers
+import re
+import unicodedata
+
+from app.cache import Cache
+
+
+# Band số tiền mặc định (VND, cận dưới của band kế tiếp)
+DEFAULT_AMT_BANDS = (1_000_000, 5_000_000, 10_000_000, 20_000_000, 50_000_000, 100_000_000)
+
+# Factor của model → field của block input
+FACTOR_FIELDS = {
+    'amt': 'amt_vnd',
+    'gender': 'gender',
+    'category': 'category',
+    'transaction_hour': 'transaction_hour',
+    'transaction_day': 'transaction_day',
+    'age': 'age',
+    'city_pop': 'city_pop'
+}
+
+WEEKDAY_NUMBERS = ['Thứ 2', 'Thứ 3', 'Thứ 4', 'Thứ 5', 'Thứ 6', 'Thứ 7', 'Chủ nhật']
+WEEKDAY_WORDS = ['Thứ Hai', 'Thứ Ba', 'Thứ Tư', 'Thứ Năm', 'Thứ Sáu', 'Thứ Bảy', 'Chủ Nhật']
+
+_PLACEHOLDER = re.compile(r'⟦(\w+):(\w+)⟧')
+
+
+def _formats(field: str) -> Dict:
+    if field in FORMATTERS:
+        return FORMATTERS[field]
+    if field.startswith('contrib_'):
+        return CONTRIBUTION_FORMATS
+    if field.startswith('raw_'):
+        return RAW_FORMATS
+    return {}
+
+
+def _fold(text: str) -> str:
+    """Bỏ dấu tiếng Việt + lowercase + gộp khoảng trắng ("Hà  Nội" → "ha noi")"""
+    text = unicodedata.normalize('NFD', str(text).replace('đ', 'd').replace('Đ', 'D'))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+def _thousands(value, sep: str) -> str:
+    return f"{int(round(value)):,}".replace(',', sep)
+
+
+def _percent(p: float, digits: int, sep: str = '.') -> str:
+    return f"{p * 100:.{digits}f}".replace('.', sep) + '%'
+
+
+def _millions(value: float, sep: str = '.') -> Optional[str]:
+    if value < 1_000_000 or value % 100_000:
+        return None
+    return f"{value / 1_000_000:g}".replace('.', sep) + ' triệu'
+
+
+PROBABILITY_FORMATS = {
+    'pct2': lambda p: _percent(p, 2),
+    'pct1': lambda p: _percent(p, 1),
+    'pct0': lambda p: _percent(p, 0),
+    'pct2_comma': lambda p: _percent(p, 2, ','),
+    'pct1_comma': lambda p: _percent(p, 1, ','),
+    'frac4': lambda p: f"{p:.4f}",
+    'frac3': lambda p: f"{p:.3f}",
+}
+
+# Contribution (TreeSHAP) của factor: dấu nằm trong chữ ký, LLM có thể viết giá trị tuyệt đối
+CONTRIBUTION_FORMATS = {
+    'fixed4': lambda c: f"{c:.4f}",
+    'fixed3': lambda c: f"{c:.3f}",
+    'fixed2': lambda c: f"{c:.2f}",
+    'fixed1': lambda c: f"{c:.1f}",
+    'abs4': lambda c: f"{abs(c):.4f}",
+    'abs3': lambda c: f"{abs(c):.3f}",
+    'abs2': lambda c: f"{abs(c):.2f}",
+    'abs1': lambda c: f"{abs(c):.1f}",
+    'fixed2_comma': lambda c: f"{c:.2f}".replace('.', ','),
+}
+
+# raw_value không nguyên của factor (vd. amt USD chưa làm tròn mà LLM nhận được)
+RAW_FORMATS = {
+    'repr': lambda v: repr(float(v)),
+    'fixed4': lambda v: f"{v:.4f}",
+    'fixed2': lambda v: f"{v:.2f}",
+}
+
+# field → {format: hàm(value) -> chuỗi | None}; format dài hơn được thay trước
+# (field contrib_<feature> / raw_<feature> dùng CONTRIBUTION_FORMATS / RAW_FORMATS)
+FORMATTERS = {
+    'amt_vnd': {
+        'dot': lambda v: _thousands(v, '.'),
+        'comma': lambda v: _thousands(v, ','),
+        'plain': lambda v: str(int(round(v))) if v >= 10_000 else None,
+        'million': lambda v: _millions(v),
+        'million_comma': lambda v: _millions(v, ','),
+    },
+    'amt_usd': {
+        'usd': lambda v: f"{v:,.2f}",
+        'usd_plain': lambda v: f"{v:.2f}",
+    },
+    'fraud_probability': PROBABILITY_FORMATS,
+    'safe_probability': PROBABILITY_FORMATS,
+    'transaction_hour': {
+        'clock': lambda h: f"{int(h):02d}:00",
+        'clock_short': lambda h: f"{int(h)}:00",
+        'hour_vi': lambda h: f"{int(h)} giờ",
+        'hour_h2': lambda h: f"{int(h):02d}h",
+        'hour_h': lambda h: f"{int(h)}h",
+    },
+    'age': {
+        'age_vi': lambda a: f"{int(a)} tuổi",
+    },
+    'transaction_month': {
+        'month_vi': lambda m: f"tháng {int(m)}",
+        'month_vi_cap': lambda m: f"Tháng {int(m)}",
+        'month_vi2': lambda m: f"tháng {int(m):02d}",
+        'month_vi2_cap': lambda m: f"Tháng {int(m):02d}",
+    },
+    'city_pop': {
+        'dot': lambda v: _thousands(v, '.'),
+        'comma': lambda v: _thousands(v, ','),
+        'plain': lambda v: str(int(v)) if v >= 10_000 else None,
+    },
+    'city': {
+        'raw': lambda c: c if len(c) >= 3 else None,
+    },
+    'transaction_day': {
+        'number': lambda d: WEEKDAY_NUMBERS[int(d)],
+        'word': lambda d: WEEKDAY_WORDS[int(d)],
+    },
+}
+
+
+class SemanticExplanationCache:
+    """
+    Cache giải thích theo chữ ký thô + text tham số hóa (lưu trong một Cache backend)
+
+    Args:
+        store: backend lưu template (MemoryCache / SQLiteCache / RedisCache)
+        amt_bands: cận band số tiền (VND, tăng dần)
+        hour_band: độ rộng band giờ (giờ)
+        age_band: độ rộng band tuổi (năm)
+        top_factors: số factor user-input đưa vào chữ ký
+    """
+
+    def __init__(self, store: Cache, amt_bands=DEFAULT_AMT_BANDS, hour_band: int = 3,
+                 age_band: int = 10, top_factors: int = 3):
+        self.store = store
+        self.amt_bands = tuple(sorted(float(b) for b in amt_bands))
+        self.hour_band = max(1, int(hour_band))
+        self.age_band = max(1, int(age_band))
+        self.top_factors = max(1, int(top_factors))
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.rejected = 0
+
+    # ------------------------------------------------------------------
+    # Chữ ký
+    # ------------------------------------------------------------------
+    def signature(self, prediction: Dict, input_data: Dict, factors: List[Dict],
+                  explanation_detail: str) -> Optional[str]:
+        """Khóa cache từ chữ ký thô; None nếu không có factor user-input"""
+        ordered = []
+        for factor in factors or []:
+            field = FACTOR_FIELDS.get(str(factor.get('feature', '')))
+            if field is None or any(field == f for f, _ in ordered):
+                continue
+            try:
+                sign = '+' if float(factor.get('contribution')) > 0 else '-'
+            except (TypeError, ValueError):
+                continue
+            ordered.append((field, sign))
+            if len(ordered) >= self.top_factors:
+                break
+        if not ordered:
+            return None
+
+        try:
+            parts = {
+                'risk_level': prediction.get('risk_level'),
+                'detail': explanation_detail,
+                'factors': [f"{field}{sign}" for field, sign in ordered],
+                'amt_band': bisect_right(self.amt_bands, float(input_data['amt_vnd'])),
+                'hour_band': int(input_data['transaction_hour']) // self.hour_band,
+                'age_band': int(input_data['age']) // self.age_band,
+                'gender': input_data.get('gender'),
+                'category': input_data.get('category'),
+                'city': _fold(input_data.get('city') or ''),
+            }
+            if any(field == 'city_pop' for field, _ in ordered) and input_data.get('city_pop'):
+                # Band nửa bậc thập phân (~x3.16) của dân số
+                parts['city_pop_band'] = int(math.log10(max(float(input_data['city_pop']), 1.0)) * 2)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return 'sem:' + hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Tham số hóa
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _values(prediction: Dict, input_data: Dict, factors: List[Dict] = None) -> Dict:
+        values = {
+            'amt_vnd': input_data.get('amt_vnd'),
+            'amt_usd': input_data.get('amt_usd'),
+            'fraud_probability': prediction.get('fraud_probability'),
+            'safe_probability': prediction.get('safe_probability'),
+            'transaction_hour': input_data.get('transaction_hour'),
+            'transaction_month': input_data.get('transaction_month'),
+            'age': input_data.get('age'),
+            'city': input_data.get('city'),
+            'city_pop': input_data.get('city_pop'),
+            'transaction_day': input_data.get('transaction_day'),
+        }
+        # Số liệu của model_top_factors mà LLM được xem (prompt yêu cầu nêu con số contribution)
+        for factor in factors or []:
+            name = re.sub(r'\W', '_', str(factor.get('feature', '')))
+            if not name:
+                continue
+            try:
+                values[f'contrib_{name}'] = float(factor.get('contribution'))
+            except (TypeError, ValueError):
+                pass
+            raw = factor.get('raw_value')
+            if (isinstance(raw, numbers.Real) and not isinstance(raw, (numbers.Integral, bool))
+                    and not float(raw).is_integer()):
+                values[f'raw_{name}'] = float(raw)
+        return {k: v for k, v in values.items() if v is not None}
+
+    @staticmethod
+    def _render(field: str, fmt: str, value) -> Optional[str]:
+        try:
+            return _formats(field)[fmt](value)
+        except (KeyError, TypeError, ValueError, IndexError):
+            return None
+
+    def parameterize(self, text: str, values: Dict) -> str:
+        """Thay các giá trị cụ thể trong text bằng placeholder ⟦field:format⟧"""
+        variants = {}
+        ambiguous = set()
+        for field, value in values.items():
+            for fmt in _formats(field):
+                rendered = self._render(field, fmt, value)
+                if not rendered:
+                    continue
+                if rendered in variants and variants[rendered][0] != field:
+                    # Cùng chuỗi cho hai field (vd. hai contribution 0.42): không biết điền lại field nào
+                    ambiguous.add(rendered)
+                variants.setdefault(rendered, (field, fmt))
+        # Dài trước: "9.000.000" trước "9 triệu", "03:00" trước "3h"
+        ordered = sorted(variants.items(), key=lambda item: len(item[0]), reverse=True)
+
+        for rendered, (field, fmt) in ordered:
+            if rendered in ambiguous:
+                continue
+            # Không nằm giữa một số khác ("13h" không chứa "3h"); cho phép đơn vị dính liền ("9.000.000đ")
+            pattern = r'(?<![\w.,])' + re.escape(rendered) + r'(?![\d]|[.,]\d)'
+            text = re.sub(pattern, f'⟦{field}:{fmt}⟧', text)
+        return text
+
+    def leaked(self, template: str, values: Dict) -> List[str]:
+        """
+        Giá trị của giao dịch còn sót lại trong template sau khi tham số hóa
+
+        parameterize bỏ qua giá trị dính sau chữ/dấu ("VND30.000.000"); ở đây chỉ cần không
+        nằm giữa một số khác là tính là sót.
+        """
+        text = _PLACEHOLDER.sub(' ', template)
+        leaked = []
+        for field, value in values.items():
+            for fmt in _formats(field):
+                rendered = self._render(field, fmt, value)
+                if rendered and re.search(r'(?<!\d)' + re.escape(rendered) + r'(?!\d)', text):
+                    leaked.append(f"{field}:{fmt}")
+        return leaked
+
+    def fill(self, template: str, values: Dict) -> Optional[str]:
+        """Điền giá trị vào template; None nếu thiếu giá trị cho placeholder nào đó"""
+        missing = False
+
+        def substitute(match):
+            nonlocal missing
+            field, fmt = match.group(1), match.group(2)
+            rendered = self._render(field, fmt, values[field]) if field in values else None
+            if rendered is None:
+                missing = True
+                return match.group(0)
+            return rendered
+
+        text = _PLACEHOLDER.sub(substitute, template)
+        return None if missing else text
+
+    # ------------------------------------------------------------------
+    # get / put
+    # ------------------------------------------------------------------
+    def get(self, key: Optional[str], prediction: Dict, input_data: Dict,
+            factors: List[Dict] = None) -> Optional[str]:
+        """Giải thích đã điền giá trị của giao dịch hiện tại, hoặc None khi miss"""
+        template = self.store.get(key) if key else None
+        text = self.fill(template, self._values(prediction, input_data, factors)) if template else None
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def put(self, key: Optional[str], text: str, prediction: Dict, input_data: Dict,
+            factors: List[Dict] = None):
+        if not key or not text:
+            return
+        values = self._values(prediction, input_data, factors)
+        template = self.parameterize(text, values)
+        if self.leaked(template, values):
+            # Dùng lại cho giao dịch khác sẽ lộ giá trị của giao dịch này
+            self.rejected += 1
+            return
+        self.store.set(key, template)
+        self.stored += 1
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stored': self.stored,
+            'rejected': self.rejected,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+            'amt_bands': list(self.amt_bands),
+            'hour_band': self.hour_band,
+            'age_band': self.age_band,
+            'top_factors': self.top_factors,
+            'store': self.store.stats()
+        }
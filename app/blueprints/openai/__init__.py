@@ -1,6 +1,8 @@
 """
-OpenAI Blueprint - Services for AI integration (no routes)
+OpenAI Blueprint - Services for AI integration + SSE streaming endpoints
 """
 from flask import Blueprint
 
 openai_bp = Blueprint('openai', __name__)
+
+from app.blueprints.openai import routes
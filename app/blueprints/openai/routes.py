@@ -0,0 +1,114 @@
+"""
+OpenAI routes - Streaming (Server-Sent Events) cho giải thích dự đoán và chat
+
+Token được đẩy về client ngay khi model sinh ra (stream=True), nên client hiển thị
+được chữ đầu tiên sau time-to-first-token thay vì chờ toàn bộ câu trả lời.
+
+Định dạng event:
+    event: token   data: {"text": "..."}        (lặp lại)
+    event: done    data: {"text": "<toàn bộ>"}
+    event: error   data: {"error": "..."}
+"""
+from flask import request, jsonify, current_app, Response, stream_with_context
+from app.blueprints.openai import openai_bp
+from app.blueprints.openai.services import OpenAIService
+import json
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Một event SSE (data là JSON một dòng)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(chunks, log_tag: str) -> Response:
+    """Bọc generator text chunks thành response text/event-stream"""
+    def generate():
+        parts = []
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield _sse_event('token', {'text': text})
+        except Exception as e:
+            current_app.logger.error(f"[{log_tag}] Stream error: {str(e)}")
+            yield _sse_event('error', {'error': str(e)})
+            return
+        yield _sse_event('done', {'text': ''.join(parts).strip()})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Tắt buffer của nginx để token tới client ngay
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@openai_bp.route('/explain-prediction/stream', methods=['POST'])
+def explain_prediction_stream():
+    """
+    Stream giải thích AI cho một kết quả dự đoán (SSE)
+
+    Request body (JSON) - các trường lấy từ response của /api/model/predict-fraud:
+    {
+        "prediction": {"is_fraud": true, "fraud_probability": 0.93, "risk_level": "CRITICAL", ...},
+        "input": {"amt": 25000000, "category": "shopping_net", ...},
+        "model_top_factors": [...],       # optional
+        "explanation_detail": "short"     # optional: short|full (default: full)
+    }
+
+    Response: text/event-stream (xem docstring module)
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+    prediction = data.get('prediction')
+    transaction = data.get('input')
+    if not isinstance(prediction, dict) or not isinstance(transaction, dict):
+        return jsonify({
+            'success': False,
+            'error': 'Fields "prediction" and "input" (objects) are required'
+        }), 400
+
+    explanation_detail = str(data.get('explanation_detail', 'full')).strip().lower()
+    if explanation_detail not in {'short', 'full'}:
+        explanation_detail = 'full'
+
+    transaction_data = dict(transaction)
+    if data.get('model_top_factors'):
+        transaction_data['model_top_factors'] = data['model_top_factors']
+
+    current_app.logger.info(f"[EXPLAIN-STREAM] detail={explanation_detail}")
+    chunks = OpenAIService.explain_prediction_stream(
+        prediction_result=prediction,
+        transaction_data=transaction_data,
+        explanation_detail=explanation_detail
+    )
+    return _sse_response(chunks, 'EXPLAIN-STREAM')
+
+
+@openai_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Stream câu trả lời chat (SSE)
+
+    Request body (JSON):
+    {
+        "message": "Làm sao nhận biết giao dịch lừa đảo?",
+        "context": "..."   # optional
+    }
+
+    Response: text/event-stream (xem docstring module)
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+    message = data.get('message')
+    if not isinstance(message, str) or not message.strip():
+        return jsonify({'success': False, 'error': 'Field "message" is required'}), 400
+
+    chunks = OpenAIService.chat_stream(message, context=data.get('context'))
+    return _sse_response(chunks, 'CHAT-STREAM')
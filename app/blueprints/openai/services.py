@@ -1,32 +1,99 @@
 """
 OpenAI services - Business logic for AI operations
 """
-from openai import OpenAI
+from openai import OpenAI, DefaultHttpxClient, Timeout, DEFAULT_CONNECTION_LIMITS
 from flask import current_app
+from app.utils.singleflight import SingleFlight
+import hashlib
 import json
+import os
 import re
+import threading
+
+# Limits của đúng package HTTP mà bản openai đang cài dùng (không import httpx trực tiếp)
+Limits = type(DEFAULT_CONNECTION_LIMITS)
 
 
 class OpenAIService:
     """Service class for OpenAI operations"""
     
+    # Client dùng chung cho cả process: giữ connection pool (keep-alive, TLS) giữa các request
+    _client = None
+    _client_settings = None
+    _client_lock = threading.Lock()
+    
+    # Gộp các lần parse cùng một OCR text đang chạy đồng thời
+    _parse_flight = SingleFlight()
+    
+    @classmethod
+    def _client_settings_from_config(cls):
+        config = current_app.config
+        return (
+            config.get('OPENAI_API_KEY'),
+            config.get('OPENAI_BASE_URL'),
+            int(config.get('OPENAI_MAX_CONNECTIONS', 20)),
+            int(config.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 10)),
+            float(config.get('OPENAI_KEEPALIVE_EXPIRY', 60)),
+            float(config.get('OPENAI_CONNECT_TIMEOUT', 5)),
+            float(config.get('OPENAI_READ_TIMEOUT', 60)),
+            bool(config.get('OPENAI_HTTP2', False)),
+            int(config.get('OPENAI_MAX_RETRIES', 2))
+        )
+    
     @classmethod
     def _get_client(cls):
-        """Get OpenAI client with API key from config"""
-        api_key = current_app.config.get('OPENAI_API_KEY')
-        base_url = current_app.config.get('OPENAI_BASE_URL')
+        """Get process-wide OpenAI client (built once per worker from config)"""
+        settings = cls._client_settings_from_config()
+        client = cls._client
+        if client is not None and cls._client_settings == settings:
+            return client
         
-        if not api_key:
-            raise ValueError("OpenAI API key not configured")
-        
-        client = OpenAI(
-            api_key=api_key,
-            base_url=base_url
-        )
-        return client
+        with cls._client_lock:
+            if cls._client is not None and cls._client_settings == settings:
+                return cls._client
+            
+            (api_key, base_url, max_connections, max_keepalive, keepalive_expiry,
+             connect_timeout, read_timeout, http2, max_retries) = settings
+            
+            if not api_key:
+                raise ValueError("OpenAI API key not configured")
+            
+            limits = Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry
+            )
+            timeout = Timeout(read_timeout, connect=connect_timeout)
+            try:
+                http_client = DefaultHttpxClient(limits=limits, timeout=timeout, http2=http2)
+            except ImportError:
+                # http2=True cần package `h2`
+                current_app.logger.warning("OPENAI_HTTP2 requires the 'h2' package - falling back to HTTP/1.1")
+                http_client = DefaultHttpxClient(limits=limits, timeout=timeout)
+            
+            # Cấu hình đổi: đóng connection pool của client cũ trước khi thay
+            if cls._client is not None:
+                cls._client.close()
+            cls._client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=http_client
+            )
+            cls._client_settings = settings
+            return cls._client
     
     @classmethod
-    def _get_completion(cls, messages, temperature=0.7, max_tokens=2000):
+    def _reset_client_after_fork(cls):
+        # Socket của pool thuộc process cha: bỏ tham chiếu (không close để không
+        # đóng kết nối TLS mà cha còn dùng); process con tự tạo client mới
+        cls._client = None
+        cls._client_settings = None
+        cls._client_lock = threading.Lock()
+    
+    @classmethod
+    def _get_completion(cls, messages, temperature=0.7, max_tokens=2000, timeout=None):
         """
         Get completion from OpenAI
         
@@ -34,12 +101,15 @@ class OpenAIService:
             messages (list): List of message dictionaries
             temperature (float): Response randomness (0-1)
             max_tokens (int): Maximum response length
+            timeout (float): Giới hạn thời gian (giây) cho lời gọi này, không retry (optional)
             
         Returns:
             str: AI response
         """
         try:
             client = cls._get_client()
+            if timeout is not None:
+                client = client.with_options(timeout=timeout, max_retries=0)
             model = current_app.config.get('OPENAI_MODEL', 'anthropic/claude-3.5-sonnet')
             
             current_app.logger.info(f"Calling AI model: {model}")
@@ -56,6 +126,43 @@ class OpenAIService:
             current_app.logger.error(f"AI API Error: {str(e)}")
             raise ValueError(f"AI service error: {str(e)}")
     
+    @classmethod
+    def _stream_completion(cls, messages, temperature=0.7, max_tokens=2000):
+        """
+        Stream completion from OpenAI (stream=True)
+        
+        Args:
+            messages (list): List of message dictionaries
+            temperature (float): Response randomness (0-1)
+            max_tokens (int): Maximum response length
+            
+        Yields:
+            str: Text chunks theo thứ tự model sinh ra
+        """
+        try:
+            client = cls._get_client()
+            model = current_app.config.get('OPENAI_MODEL', 'anthropic/claude-3.5-sonnet')
+            
+            current_app.logger.info(f"Streaming AI model: {model}")
+            
+            stream = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
+        except Exception as e:
+            current_app.logger.error(f"AI API Error: {str(e)}")
+            raise ValueError(f"AI service error: {str(e)}")
+    
     @classmethod
     def parse_transaction_text(cls, ocr_text):
         """
@@ -67,6 +174,14 @@ class OpenAIService:
         Returns:
             dict: Parsed transaction information (4 fields cho fraud prediction)
         """
+        # Cùng OCR text đang được parse ở request khác → chờ và dùng chung kết quả
+        key = hashlib.sha256(str(ocr_text).encode('utf-8')).hexdigest()
+        result = cls._parse_flight.do(key, lambda: cls._parse_transaction_text(ocr_text))
+        return dict(result)
+    
+    @classmethod
+    def _parse_transaction_text(cls, ocr_text):
+        """Gọi LLM parse OCR text (không dedup; dùng parse_transaction_text)"""
         
         system_prompt = """Bạn là một AI chuyên phân tích giao dịch ngân hàng từ văn bản OCR.
 Nhiệm vụ của bạn là trích xuất thông tin giao dịch từ văn bản và trả về JSON với format chính xác.
@@ -475,17 +590,35 @@ Format your response as a structured analysis."""
         return filtered
     
     @classmethod
-    def explain_prediction(cls, prediction_result, transaction_data, explanation_detail: str = "full"):
+    def explain_prediction(cls, prediction_result, transaction_data, explanation_detail: str = "full", timeout=None):
         """
         Generate human-readable explanation for a model prediction
         
         Args:
             prediction_result (dict): Model prediction output
             transaction_data (dict): Transaction details
+            timeout (float): Giới hạn thời gian gọi LLM (giây, optional)
             
         Returns:
             str: Natural language explanation
         """
+        messages, max_tokens = cls._explanation_messages(prediction_result, transaction_data, explanation_detail)
+        return cls._get_completion(messages, temperature=0.2, max_tokens=max_tokens, timeout=timeout)
+    
+    @classmethod
+    def explain_prediction_stream(cls, prediction_result, transaction_data, explanation_detail: str = "full"):
+        """
+        Như explain_prediction nhưng stream từng đoạn text (cho SSE)
+        
+        Yields:
+            str: Text chunks của giải thích
+        """
+        messages, max_tokens = cls._explanation_messages(prediction_result, transaction_data, explanation_detail)
+        return cls._stream_completion(messages, temperature=0.2, max_tokens=max_tokens)
+    
+    @classmethod
+    def _explanation_messages(cls, prediction_result, transaction_data, explanation_detail: str = "full"):
+        """Dựng prompt giải thích dự đoán; trả về (messages, max_tokens)"""
         is_fraud = bool(prediction_result.get('is_fraud', False))
         probability = prediction_result.get('fraud_probability', 0)
 
@@ -560,7 +693,7 @@ Lưu ý:
             {"role": "user", "content": user_prompt}
         ]
 
-        return cls._get_completion(messages, temperature=0.2, max_tokens=max_tokens)
+        return messages, max_tokens
     
     @classmethod
     def chat(cls, message, context=None):
@@ -574,6 +707,21 @@ Lưu ý:
         Returns:
             str: AI response
         """
+        return cls._get_completion(cls._chat_messages(message, context), temperature=0.7)
+    
+    @classmethod
+    def chat_stream(cls, message, context=None):
+        """
+        Như chat nhưng stream từng đoạn text (cho SSE)
+        
+        Yields:
+            str: Text chunks của câu trả lời
+        """
+        return cls._stream_completion(cls._chat_messages(message, context), temperature=0.7)
+    
+    @classmethod
+    def _chat_messages(cls, message, context=None):
+        """Dựng messages cho chat"""
         system_message = """You are an AI assistant specializing in credit card fraud detection. 
 You help users understand fraud patterns, prevention strategies, and transaction analysis."""
         
@@ -581,12 +729,10 @@ You help users understand fraud patterns, prevention strategies, and transaction
         if context:
             user_message = f"Context: {context}\n\nQuestion: {message}"
         
-        messages = [
+        return [
             {"role": "system", "content": system_message},
             {"role": "user", "content": user_message}
         ]
-        
-        return cls._get_completion(messages, temperature=0.7)
     
     @classmethod
     def generate_fraud_report(cls, transactions, time_period):
@@ -625,3 +771,8 @@ Keep the report professional and actionable."""
         ]
         
         return cls._get_completion(messages, temperature=0.4, max_tokens=1000)
+
+
+if hasattr(os, 'register_at_fork'):
+    # Pre-fork servers (gunicorn --preload): mỗi worker có pool riêng
+    os.register_at_fork(after_in_child=OpenAIService._reset_client_after_fork)
@@ -6,3 +6,11 @@ from flask import Blueprint
 preprocess_bp = Blueprint('preprocess', __name__)
 
 from app.blueprints.preprocess import routes
+
+
+@preprocess_bp.record_once
+def _configure_preprocess(state):
+    """Áp dụng app config cho OCR pool và tạo cache kết quả OCR khi đăng ký blueprint"""
+    from app.blueprints.preprocess.ocr_pool import ocr_pool
+    ocr_pool.configure(state.app.config)
+    routes.configure_caches(state.app.config)
@@ -0,0 +1,202 @@
+"""
+OCR Pool - Chạy OCRService trong process pool giới hạn
+
+Tesseract + tiền xử lý ảnh tốn CPU; chạy trên thread của request Flask thì một batch ảnh
+chỉ dùng một core. Pool này phân phối ảnh ra `max_workers` process (mặc định = số core),
+giới hạn số OCR đồng thời của mỗi worker Flask, và trả kết quả theo đúng thứ tự input.
+
+Timeout theo ảnh:
+    - trong process con: tesseract bị kill khi chạy quá `timeout_seconds`
+    - ở process cha: ảnh còn xếp hàng quá hạn bị hủy, trả lỗi timeout cho riêng ảnh đó
+
+max_workers = 0 → chạy inline trên thread của request (như trước khi có pool).
+
+Process con chạy app.ocr.worker.ocr_task: với spawn/forkserver chỉ import package app.ocr.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence
+import math
+import multiprocessing
+import os
+import threading
+import time
+
+from app.ocr.services import OCRService
+from app.ocr.worker import ocr_task
+
+
+class OCRPool:
+    """
+    ProcessPoolExecutor tạo lazily cho OCRService
+
+    Args:
+        max_workers: số process OCR (None = os.cpu_count(), 0 = chạy inline)
+        timeout_seconds: thời gian tối đa cho một ảnh (0 = không giới hạn)
+        start_method: fork | spawn | forkserver ('' = mặc định của nền tảng)
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout_seconds: float = 30, start_method: str = ''):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.configure({
+            'OCR_POOL_WORKERS': max_workers,
+            'OCR_TIMEOUT_SECONDS': timeout_seconds,
+            'OCR_POOL_START_METHOD': start_method
+        })
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        # Theo tầng OCR (fast / full): số ảnh + tổng thời gian OCR; fast_rejected = pass nhanh không đạt
+        self._tiers = {'fast': {'count': 0, 'total_ms': 0.0}, 'full': {'count': 0, 'total_ms': 0.0}}
+        self._fast_rejected = 0
+        self._stats_lock = threading.Lock()
+
+    def configure(self, config):
+        """Áp dụng app config (OCR_POOL_WORKERS, OCR_TIMEOUT_SECONDS, OCR_POOL_START_METHOD)"""
+        workers = config.get('OCR_POOL_WORKERS')
+        self.max_workers = (os.cpu_count() or 1) if workers is None else max(0, int(workers))
+        self.timeout_seconds = max(0.0, float(config.get('OCR_TIMEOUT_SECONDS', 30) or 0))
+        self.start_method = (config.get('OCR_POOL_START_METHOD') or '').strip().lower()
+        self.shutdown()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method or None)
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _reset_after_fork(self):
+        # Process con (fork) không dùng lại executor của process cha
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def extract_text(self, image_data: bytes, language: str = 'vie+eng') -> Dict:
+        """
+        OCR một ảnh qua pool
+
+        Raises:
+            ValueError: OCR lỗi hoặc quá timeout (như OCRService.extract_text_from_image)
+        """
+        result = self.extract_text_batch([image_data], language)[0]
+        if not result.get('success'):
+            raise ValueError(result['error'])
+        return result
+
+    def extract_text_batch(self, images: Sequence[bytes], language: str = 'vie+eng') -> List[Dict]:
+        """
+        OCR nhiều ảnh song song
+
+        Returns:
+            List kết quả theo thứ tự input: kết quả của extract_text_from_image,
+            hoặc {'success': False, 'error': ...} cho ảnh lỗi / quá timeout
+        """
+        if not images:
+            return []
+        # Dựng tùy chọn từ app config ở process cha (process con không có app context)
+        options = {
+            'preprocessor': OCRService.current_preprocessor(),
+            'timeout': self.timeout_seconds,
+            'engine': OCRService.get_engine().name,
+            'roi_scale': OCRService.current_roi_scale(),
+            'fast_pass': OCRService.current_fast_pass() or False
+        }
+
+        if self.max_workers == 0:
+            return [self._run_inline(data, language, options) for data in images]
+
+        try:
+            executor = self._get_executor()
+            futures = [executor.submit(ocr_task, data, language, options) for data in images]
+        except BrokenProcessPool:
+            self.shutdown()
+            return [self._failure('OCR worker pool is unavailable') for _ in images]
+
+        # Hạn chót của cả batch: mỗi "đợt" max_workers ảnh được timeout_seconds (+ khởi động process)
+        deadline = None
+        if self.timeout_seconds:
+            waves = math.ceil(len(images) / self.max_workers)
+            deadline = time.monotonic() + waves * self.timeout_seconds + 5
+
+        results = []
+        for future in futures:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                results.append(self._record(future.result(timeout=remaining)))
+            except FutureTimeoutError:
+                future.cancel()
+                with self._stats_lock:
+                    self.timed_out += 1
+                results.append({'success': False, 'error': f'OCR timed out after {self.timeout_seconds:g}s'})
+            except BrokenProcessPool:
+                # Một process con chết (OOM, segfault): tạo pool mới cho lần sau
+                self.shutdown()
+                results.append(self._failure('OCR worker process died'))
+            except ValueError as e:
+                results.append(self._failure(str(e)))
+        return results
+
+    def _run_inline(self, image_data: bytes, language: str, options: Dict) -> Dict:
+        try:
+            result = OCRService.extract_text_from_image(image_data, language, **options)
+        except ValueError as e:
+            return self._failure(str(e))
+        return self._record(result)
+
+    def _record(self, result: Dict) -> Dict:
+        """Cộng dồn thống kê theo tầng từ kết quả (process con không chia sẻ bộ đếm với cha)"""
+        tiers = result.get('tiers') or {}
+        with self._stats_lock:
+            self.completed += 1
+            fast = tiers.get('fast')
+            if fast:
+                self._tiers['fast']['count'] += 1
+                self._tiers['fast']['total_ms'] += fast['ms']
+                self._fast_rejected += not fast['accepted']
+            full = tiers.get('full')
+            if full:
+                self._tiers['full']['count'] += 1
+                self._tiers['full']['total_ms'] += full['ms']
+        return result
+
+    def _failure(self, error: str) -> Dict:
+        with self._stats_lock:
+            self.failed += 1
+        return {'success': False, 'error': error}
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            fast_runs = self._tiers['fast']['count']
+            fast_hits = fast_runs - self._fast_rejected
+            tiers = {
+                name: {
+                    'count': tier['count'],
+                    'avg_ms': round(tier['total_ms'] / tier['count'], 2) if tier['count'] else None
+                }
+                for name, tier in self._tiers.items()
+            }
+            tiers['fast']['accepted'] = fast_hits
+            tiers['fast']['hit_rate'] = round(fast_hits / fast_runs, 4) if fast_runs else None
+            return {
+                'max_workers': self.max_workers,
+                'timeout_seconds': self.timeout_seconds,
+                'start_method': self.start_method or multiprocessing.get_start_method(allow_none=True),
+                'completed': self.completed,
+                'failed': self.failed,
+                'timed_out': self.timed_out,
+                'tiers': tiers
+            }
+
+
+ocr_pool = OCRPool()
+
+if hasattr(os, 'register_at_fork'):
+    # Pre-fork servers (gunicorn --preload): mỗi worker có pool riêng
+    os.register_at_fork(after_in_child=ocr_pool._reset_after_fork)
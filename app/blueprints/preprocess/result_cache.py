@@ -0,0 +1,152 @@
+"""
+OCR Result Cache - Cache kết quả OCR + parse theo nội dung ảnh
+
+Người dùng mobile hay gửi lại cùng một ảnh chụp màn hình (timeout, sửa form...). Mỗi lần gửi
+lại chạy lại Tesseract (vài giây) và parse (có thể gọi LLM). Cache này lưu text OCR, độ tin cậy
+và giao dịch đã parse, để lần gửi lại trả về trong vài mili giây.
+
+Hai tầng:
+    exact - sha256 của bytes ảnh (sau khi giải mã base64) + ngôn ngữ OCR
+    dhash - (tùy chọn) difference hash 64 bit của ảnh thu nhỏ, bắt các bản encode lại
+            (nén lại JPEG, PNG → JPEG) của cùng một ảnh. Tra cứu theo 4 band 16 bit:
+            hai hash cách nhau <= 3 bit chắc chắn trùng ít nhất một band.
+            Lưu ý: biên lai cùng app, cùng bố cục chỉ khác vài chữ số có thể có dHash rất gần
+            nhau → để max_distance nhỏ và chỉ bật khi chấp nhận được rủi ro này.
+
+Backend lưu trữ là một Cache (mặc định SQLite: dùng chung giữa các worker, còn sau restart).
+"""
+from typing import Dict, Optional, Tuple
+import hashlib
+import io
+
+from PIL import Image
+
+from app.cache import Cache
+
+
+DHASH_BANDS = 4
+DHASH_BAND_BITS = 16
+# Số ảnh tối đa nhớ cho mỗi band (tránh danh sách phình to với ảnh trắng / gần trắng)
+DHASH_BUCKET_SIZE = 8
+
+
+def content_hash(image_data: bytes) -> str:
+    """sha256 hex của bytes ảnh"""
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def dhash(image_data: bytes, hash_size: int = 8) -> Optional[int]:
+    """
+    Difference hash (hash_size x hash_size bit): so sánh độ sáng các pixel kề nhau theo hàng
+    trên ảnh xám thu nhỏ còn (hash_size + 1) x hash_size
+
+    Returns:
+        int hoặc None nếu không giải mã được ảnh
+    """
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        # JPEG: giải mã thẳng ở kích thước nhỏ
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        small = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+class OCRResultCache:
+    """
+    Cache {text OCR, confidence, giao dịch đã parse} theo nội dung ảnh
+
+    Args:
+        store: backend lưu kết quả (key = sha256:language)
+        dhash_store: backend index dHash (None = tắt tầng dhash)
+        dhash_max_distance: khoảng cách Hamming tối đa coi là cùng ảnh (0-3)
+    """
+
+    def __init__(self, store: Cache, dhash_store: Optional[Cache] = None, dhash_max_distance: int = 2):
+        self.store = store
+        self.dhash_store = dhash_store
+        self.dhash_max_distance = max(0, min(int(dhash_max_distance), DHASH_BANDS - 1))
+        self.exact_hits = 0
+        self.dhash_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _result_key(digest: str, language: str) -> str:
+        return f"{digest}:{language}"
+
+    @staticmethod
+    def _band_keys(value: int, language: str):
+        mask = (1 << DHASH_BAND_BITS) - 1
+        for band in range(DHASH_BANDS):
+            yield f"dh:{language}:{band}:{(value >> (band * DHASH_BAND_BITS)) & mask:04x}"
+
+    def lookup(self, image_data: bytes, language: str) -> Tuple[Optional[Dict], Dict]:
+        """
+        Tìm kết quả đã cache cho ảnh
+
+        Returns:
+            (entry hoặc None, context) - context truyền lại cho store() sau khi xử lý xong
+        """
+        context = {'digest': content_hash(image_data), 'language': language, 'dhash': None}
+        entry = self.store.get(self._result_key(context['digest'], language))
+        if entry is not None:
+            self.exact_hits += 1
+            return entry, dict(context, tier='exact')
+
+        if self.dhash_store is not None:
+            context['dhash'] = dhash(image_data)
+            match = self._dhash_match(context['dhash'], language)
+            if match is not None:
+                entry = self.store.get(self._result_key(match, language))
+                if entry is not None:
+                    self.dhash_hits += 1
+                    return entry, dict(context, tier='dhash')
+
+        self.misses += 1
+        return None, dict(context, tier=None)
+
+    def _dhash_match(self, value: Optional[int], language: str) -> Optional[str]:
+        if value is None:
+            return None
+        best = None
+        for band_key in self._band_keys(value, language):
+            for candidate, digest in self.dhash_store.get(band_key) or []:
+                distance = bin(int(candidate, 16) ^ value).count('1')
+                if distance <= self.dhash_max_distance and (best is None or distance < best[0]):
+                    best = (distance, digest)
+        return best[1] if best else None
+
+    def store_result(self, context: Dict, entry: Dict):
+        """Lưu entry cho ảnh (và index dHash nếu bật)"""
+        digest, language = context['digest'], context['language']
+        self.store.set(self._result_key(digest, language), entry)
+
+        if self.dhash_store is None or context.get('tier') == 'dhash':
+            return
+        value = context.get('dhash')
+        if value is None:
+            return
+        hex_value = f"{value:016x}"
+        for band_key in self._band_keys(value, language):
+            bucket = [item for item in (self.dhash_store.get(band_key) or []) if item[1] != digest]
+            bucket.append([hex_value, digest])
+            self.dhash_store.set(band_key, bucket[-DHASH_BUCKET_SIZE:])
+
+    def stats(self) -> Dict:
+        total = self.exact_hits + self.dhash_hits + self.misses
+        return {
+            'exact_hits': self.exact_hits,
+            'dhash_hits': self.dhash_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.exact_hits + self.dhash_hits) / total, 4) if total else None,
+            'dhash_enabled': self.dhash_store is not None,
+            'dhash_max_distance': self.dhash_max_distance,
+            'store': self.store.stats()
+        }
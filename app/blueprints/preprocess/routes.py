@@ -3,10 +3,214 @@ Preprocess routes - Handle OCR text extraction from images
 """
 from flask import request, jsonify, current_app
 from app.blueprints.preprocess import preprocess_bp
-from app.blueprints.preprocess.services import OCRService
+from app.ocr.receipt_parser import parse_receipt
+from app.blueprints.preprocess.result_cache import OCRResultCache
+from app.blueprints.preprocess.ocr_pool import ocr_pool
+from app.cache import create_cache
 from app.blueprints.openai.services import OpenAIService
 import base64
 
+# Cache kết quả OCR + parse theo nội dung ảnh (None = tắt, bật qua OCR_CACHE_ENABLED)
+_OCR_RESULT_CACHE = None
+
+
+def configure_caches(config):
+    """Tạo cache kết quả OCR theo app config (gọi một lần khi đăng ký preprocess blueprint)"""
+    global _OCR_RESULT_CACHE
+    _OCR_RESULT_CACHE = None
+    if not config.get('OCR_CACHE_ENABLED', True):
+        return
+    backend = config.get('OCR_CACHE_BACKEND', 'sqlite')
+    ttl = config.get('OCR_CACHE_TTL_SECONDS', 604800)
+    max_items = config.get('OCR_CACHE_MAX_ITEMS', 10000)
+    dhash_store = None
+    if config.get('OCR_CACHE_DHASH_ENABLED', False):
+        # 4 band key cho mỗi ảnh
+        dhash_store = create_cache('ocr_dhash', config, ttl_seconds=ttl, max_items=max_items * 4, backend=backend)
+    _OCR_RESULT_CACHE = OCRResultCache(
+        create_cache('ocr_result', config, ttl_seconds=ttl, max_items=max_items, backend=backend),
+        dhash_store=dhash_store,
+        dhash_max_distance=config.get('OCR_CACHE_DHASH_MAX_DISTANCE', 2)
+    )
+
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'}
+
+
+def _file_extension_error(filename):
+    """Thông báo lỗi nếu tên file rỗng / sai định dạng, None nếu hợp lệ"""
+    if not filename:
+        return 'No file selected'
+    file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    if file_ext not in ALLOWED_EXTENSIONS:
+        return f'Invalid file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'
+    return None
+
+
+def _image_from_request():
+    """
+    Đọc ảnh từ form-data "file" hoặc JSON "image" (base64, có thể kèm data URL prefix)
+    
+    Returns:
+        Tuple (image_data, error): error là thông báo lỗi (None nếu hợp lệ)
+    """
+    # Check if image is sent as file upload
+    if 'file' in request.files:
+        file = request.files['file']
+        error = _file_extension_error(file.filename)
+        if error:
+            return None, error
+        return file.read(), None
+    
+    # Check if image is sent as base64
+    if request.is_json and 'image' in request.json:
+        image_base64 = request.json['image']
+        
+        # Remove data URL prefix if present
+        if ',' in image_base64:
+            image_base64 = image_base64.split(',')[1]
+        
+        try:
+            return base64.b64decode(image_base64), None
+        except Exception:
+            return None, 'Invalid base64 image data'
+    
+    return None, 'No image provided. Send "file" in form-data or "image" (base64) in JSON body'
+
+
+@preprocess_bp.route('/extract-text', methods=['POST'])
+def extract_text():
+    """
+    Extract text from one image using OCR (chạy trong OCR process pool)
+    
+    Request body (form-data):
+    - file: image file (jpg, png, jpeg, etc.)
+    - language: "vie+eng" (optional)
+    
+    Hoặc JSON: {"image": "<base64>", "language": "vie+eng"}
+    
+    Response: kết quả của OCRService.extract_text_from_image
+    {
+        "success": true,
+        "text": "...",
+        "confidence": 85.5,
+        "language": "vie+eng",
+        "processing_time": 1.2,
+        "word_count": 42,
+        "char_count": 230,
+        "image_size": {"width": 1080, "height": 2340},
+        "preprocessing": {...},
+        "tier": "fast" | "full",
+        "tiers": {"fast": {...} | null, "full": {"ms": ...} | null}
+    }
+    """
+    try:
+        language = request.form.get('language') or (request.get_json(silent=True) or {}).get('language') or 'vie+eng'
+        image_data, error = _image_from_request()
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        return jsonify(ocr_pool.extract_text(image_data, language)), 200
+        
+    except ValueError as e:
+        current_app.logger.error(f"Extract text error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        current_app.logger.error(f"Extract text error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'An error occurred during processing'
+        }), 500
+
+
+@preprocess_bp.route('/extract-text-batch', methods=['POST'])
+def extract_text_batch():
+    """
+    Extract text from many images in one request (song song trên OCR process pool)
+    
+    Request body (form-data):
+    - files: nhiều image file (lặp lại field "files"; tối đa OCR_BATCH_MAX_FILES)
+    - language: "vie+eng" (optional)
+    
+    Response:
+    {
+        "success": true,
+        "results": [                       # cùng thứ tự với files
+            {"index": 0, "filename": "a.png", "success": true, "text": "...", "confidence": 85.5, ...},
+            {"index": 1, "filename": "b.txt", "success": false, "error": "Invalid file type. ..."}
+        ],
+        "total": 2,
+        "succeeded": 1,
+        "failed": 1,
+        "processing_time": 3.1,
+        "language": "vie+eng"
+    }
+    
+    Mỗi ảnh có timeout riêng (OCR_TIMEOUT_SECONDS); ảnh lỗi / quá hạn không làm hỏng cả batch.
+    """
+    try:
+        import time
+        
+        start_time = time.time()
+        language = request.form.get('language', 'vie+eng')
+        files = request.files.getlist('files') or request.files.getlist('file')
+        
+        if not files:
+            return jsonify({
+                'success': False,
+                'error': 'No images provided. Send one or more "files" in form-data'
+            }), 400
+        
+        max_files = current_app.config.get('OCR_BATCH_MAX_FILES', 50)
+        if len(files) > max_files:
+            return jsonify({
+                'success': False,
+                'error': f'Too many files ({len(files)}). Maximum: {max_files}'
+            }), 400
+        
+        results = [None] * len(files)
+        valid = []
+        for index, file in enumerate(files):
+            error = _file_extension_error(file.filename)
+            if error:
+                results[index] = {'success': False, 'error': error}
+            else:
+                valid.append((index, file.read()))
+        
+        ocr_results = ocr_pool.extract_text_batch([data for _, data in valid], language)
+        for (index, _), result in zip(valid, ocr_results):
+            results[index] = result
+        
+        results = [
+            {'index': index, 'filename': file.filename, **result}
+            for index, (file, result) in enumerate(zip(files, results))
+        ]
+        succeeded = sum(1 for result in results if result.get('success'))
+        total_time = time.time() - start_time
+        current_app.logger.info(
+            f"[EXTRACT-TEXT-BATCH] {succeeded}/{len(results)} images in {total_time:.2f}s"
+        )
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'total': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'processing_time': round(total_time, 2),
+            'language': language
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Extract text batch error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'An error occurred during processing'
+        }), 500
+
 
 @preprocess_bp.route('/extract-and-parse', methods=['POST'])
 def extract_and_parse():
@@ -28,8 +232,17 @@ def extract_and_parse():
             ...
         },
         "ocr_confidence": 85.5,
+        "parser": "rules",              # rules (parser cục bộ) | llm
+        "parser_confidence": 0.9,
+        "cache": null,                  # null | exact | dhash (ảnh đã xử lý trước đó)
         "processing_time": 2.5
     }
+    
+    Parser cục bộ (receipt_parser) chạy trước; chỉ gọi AI khi độ tin cậy < RECEIPT_PARSER_MIN_CONFIDENCE
+    hoặc thiếu số tiền / ngày / giờ.
+    
+    Ảnh gửi lại (cùng bytes, hoặc bản encode lại khi bật OCR_CACHE_DHASH_ENABLED) lấy kết quả
+    từ cache: bỏ qua OCR, và bỏ qua cả parse nếu lần trước parse thành công.
     """
     try:
         from app.blueprints.openai.services import OpenAIService
@@ -38,62 +251,44 @@ def extract_and_parse():
         start_time = time.time()
         language = request.form.get('language', 'vie+eng')
         
-        # Check if image is sent as file upload
-        if 'file' in request.files:
-            file = request.files['file']
-            
-            if file.filename == '':
-                return jsonify({
-                    'success': False,
-                    'error': 'No file selected'
-                }), 400
-            
-            # Check file extension
-            allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'}
-            file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+        image_data, error = _image_from_request()
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        # Step 0: Ảnh đã xử lý trước đó?
+        result_cache = _OCR_RESULT_CACHE
+        cached, cache_context = result_cache.lookup(image_data, language) if result_cache else (None, {})
+        cache_tier = cache_context.get('tier')
+        
+        if cached is not None and cached.get('transaction') is not None:
+            current_app.logger.info(f"[EXTRACT-AND-PARSE] Result cache hit ({cache_tier})")
+            return jsonify({
+                'success': True,
+                'ai_parsing_success': True,
+                'transaction': cached['transaction'],
+                'ocr_confidence': cached['ocr_confidence'],
+                'parser': cached.get('parser'),
+                'parser_confidence': cached.get('parser_confidence'),
+                'cache': cache_tier,
+                'processing_time': round(time.time() - start_time, 2),
+                'language': language
+            }), 200
+        
+        # Step 1: Extract text using OCR (bỏ qua nếu cache có text nhưng lần trước parse lỗi)
+        if cached is not None:
+            extracted_text = cached['ocr_text']
+            ocr_confidence = cached['ocr_confidence']
+        else:
+            ocr_result = ocr_pool.extract_text(image_data, language)
             
-            if file_ext not in allowed_extensions:
+            if not ocr_result.get('success'):
                 return jsonify({
                     'success': False,
-                    'error': f'Invalid file type. Allowed: {", ".join(allowed_extensions)}'
+                    'error': 'OCR extraction failed'
                 }), 400
             
-            # Read file content
-            image_data = file.read()
-            
-        # Check if image is sent as base64
-        elif request.is_json and 'image' in request.json:
-            import base64
-            image_base64 = request.json['image']
-            
-            # Remove data URL prefix if present
-            if ',' in image_base64:
-                image_base64 = image_base64.split(',')[1]
-            
-            try:
-                image_data = base64.b64decode(image_base64)
-            except Exception as e:
-                return jsonify({
-                    'success': False,
-                    'error': 'Invalid base64 image data'
-                }), 400
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'No image provided. Send "file" in form-data or "image" (base64) in JSON body'
-            }), 400
-        
-        # Step 1: Extract text using OCR
-        ocr_result = OCRService.extract_text_from_image(image_data, language)
-        
-        if not ocr_result.get('success'):
-            return jsonify({
-                'success': False,
-                'error': 'OCR extraction failed'
-            }), 400
-        
-        extracted_text = ocr_result.get('text', '')
-        ocr_confidence = ocr_result.get('confidence', 0)
+            extracted_text = ocr_result.get('text', '')
+            ocr_confidence = ocr_result.get('confidence', 0)
         
         if not extracted_text or len(extracted_text.strip()) == 0:
             return jsonify({
@@ -101,8 +296,35 @@ def extract_and_parse():
                 'error': 'No text extracted from image'
             }), 400
         
-        # Step 2: Parse transaction with AI
-        parse_result = OpenAIService.parse_transaction_text(extracted_text)
+        # Step 2: Parse transaction - luật cục bộ trước, AI khi không chắc chắn
+        parser = 'llm'
+        local = parse_receipt(extracted_text) if current_app.config.get('RECEIPT_PARSER_ENABLED', True) else None
+        min_confidence = current_app.config.get('RECEIPT_PARSER_MIN_CONFIDENCE', 0.8)
+        if local is not None and not local['missing'] and local['confidence'] >= min_confidence:
+            parser = 'rules'
+            parse_result = {'success': True, 'data': local['data'], 'raw_text': extracted_text}
+            current_app.logger.info(
+                f"[EXTRACT-AND-PARSE] Rule parser accepted (confidence={local['confidence']}, "
+                f"signals={local['signals']})"
+            )
+        else:
+            if local is not None:
+                current_app.logger.info(
+                    f"[EXTRACT-AND-PARSE] Rule parser confidence={local['confidence']}, "
+                    f"missing={local['missing']} - falling back to AI"
+                )
+            parse_result = OpenAIService.parse_transaction_text(extracted_text)
+        parser_confidence = local['confidence'] if local is not None else None
+        
+        if result_cache is not None:
+            # Parse lỗi vẫn lưu text OCR: lần gửi lại chỉ chạy lại bước parse
+            result_cache.store_result(cache_context, {
+                'ocr_text': extracted_text,
+                'ocr_confidence': ocr_confidence,
+                'parser': parser,
+                'parser_confidence': parser_confidence,
+                'transaction': parse_result.get('data') if parse_result.get('success') else None
+            })
         
         total_time = time.time() - start_time
         
@@ -114,6 +336,9 @@ def extract_and_parse():
                 'ai_error': parse_result.get('error', 'AI parsing failed'),
                 'ocr_text': extracted_text,
                 'ocr_confidence': ocr_confidence,
+                'parser': parser,
+                'parser_confidence': parser_confidence,
+                'cache': cache_tier,
                 'processing_time': round(total_time, 2),
                 'language': language
             }), 200
@@ -124,6 +349,9 @@ def extract_and_parse():
             'ai_parsing_success': True,
             'transaction': parse_result.get('data'),
             'ocr_confidence': ocr_confidence,
+            'parser': parser,
+            'parser_confidence': parser_confidence,
+            'cache': cache_tier,
             'processing_time': round(total_time, 2),
             'language': language
         }), 200
@@ -140,3 +368,18 @@ def extract_and_parse():
             'success': False,
             'error': 'An error occurred during processing'
         }), 500
+
+
+@preprocess_bp.route('/stats', methods=['GET'])
+def preprocess_stats():
+    """
+    API: Số liệu runtime của tầng OCR
+    - ocr_pool: số worker, số ảnh xong / lỗi / timeout, và theo tầng OCR:
+      fast (số lần chạy, số lần được nhận, hit_rate, avg_ms) / full (số lần chạy, avg_ms)
+    - result_cache: hit rate của cache kết quả OCR (null nếu tắt)
+    """
+    return jsonify({
+        'success': True,
+        'ocr_pool': ocr_pool.stats(),
+        'result_cache': _OCR_RESULT_CACHE.stats() if _OCR_RESULT_CACHE is not None else None
+    }), 200
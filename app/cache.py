@@ -0,0 +1,548 @@
+"""
+Cache backends - Cache dùng chung cho các kết quả đắt (giải thích AI, ...)
+
+- MemoryCache: LRU + TTL trong process (mỗi worker gunicorn một bản riêng), có thể warm-start
+  từ file snapshot lúc khởi động và ghi snapshot khi thoát
+- SQLiteCache: file SQLite chế độ WAL, dùng chung giữa các worker trên cùng một máy,
+  dữ liệu còn nguyên sau restart/deploy
+- RedisCache: server nói giao thức Redis (RESP) - dùng chung giữa nhiều máy.
+  Client RESP tối giản qua socket, không cần thêm package
+
+Backend + TTL + giới hạn kích thước cấu hình qua Config (CACHE_*), xem create_cache().
+Giá trị phải serialize được bằng JSON (SQLite/Redis lưu dạng JSON).
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse, unquote
+import atexit
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+
+class Cache:
+    """Interface chung: get / set / stats; get trả về None khi miss hoặc hết hạn"""
+
+    backend = 'base'
+
+    def __init__(self, namespace: str, ttl_seconds: float = 600, max_items: int = 256):
+        self.namespace = namespace
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_items = int(max_items)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        # get/set chạy đồng thời trên nhiều thread request: bộ đếm chỉ đổi dưới lock này
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def _count(self, counter: str, n: int = 1) -> int:
+        """Tăng bộ đếm `counter`, trả về giá trị mới"""
+        with self._stats_lock:
+            value = getattr(self, counter) + n
+            setattr(self, counter, value)
+            return value
+
+    def _record(self, value):
+        self._count('misses' if value is None else 'hits')
+        return value
+
+    def _size(self) -> Optional[int]:
+        return None
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            hits, misses, errors = self.hits, self.misses, self.errors
+        total = hits + misses
+        return {
+            'backend': self.backend,
+            'namespace': self.namespace,
+            'size': self._size(),
+            'max_items': self.max_items,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': hits,
+            'misses': misses,
+            'errors': errors,
+            'hit_rate': round(hits / total, 4) if total else None
+        }
+
+
+# ============================================================================
+# IN-MEMORY
+# ============================================================================
+
+class MemoryCache(Cache):
+    """
+    LRU + TTL trong process, mọi thao tác O(1)
+
+    - OrderedDict {key: (timestamp, value)} theo thứ tự dùng gần nhất: get/set đưa key
+      xuống cuối, vượt max_items → bỏ key đầu (ít dùng nhất)
+    - TTL: không có timer/thread dọn định kỳ. Entry hết hạn bị bỏ khi đọc tới (lazy), và dần
+      dần trong MỖI get/set: OrderedDict {key: timestamp} theo thứ tự ghi (ghi lại một key →
+      chuyển xuống cuối, nên mỗi key còn trong cache có đúng một bản ghi), TTL cố định nên
+      phần đầu luôn hết hạn trước. Mỗi get/set bỏ tối đa EXPIRE_PER_CALL entry hết hạn ở đầu:
+      không có lần quét dài dưới lock, và cache chỉ được đọc (không ghi) vẫn được dọn dần
+    - Lock riêng cho từng cache
+    """
+
+    backend = 'memory'
+
+    # Mỗi set thêm tối đa một entry và mỗi get/set bỏ tối đa ngần này entry hết hạn → phần hết hạn luôn được dọn kịp
+    EXPIRE_PER_CALL = 4
+
+    def __init__(self, namespace: str, ttl_seconds: float = 600, max_items: int = 256):
+        super().__init__(namespace, ttl_seconds, max_items)
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        # Bộ đếm của MemoryCache đổi cùng dữ liệu, dưới lock dữ liệu
+        self._stats_lock = self._lock
+        self._items = OrderedDict()
+        self._write_order = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            self._expire(now, self.EXPIRE_PER_CALL)
+            item = self._items.get(key)
+            if item is None:
+                return self._record(None)
+            ts, value = item
+            if now - ts > self.ttl_seconds:
+                del self._items[key]
+                del self._write_order[key]
+                self.expirations += 1
+                return self._record(None)
+            self._items.move_to_end(key)
+            return self._record(value)
+
+    def _record(self, value):
+        # Gọi khi đang giữ self._lock
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        self._store(key, value, time.time())
+
+    def _store(self, key: str, value: Any, ts: float):
+        with self._lock:
+            self._items[key] = (ts, value)
+            self._items.move_to_end(key)
+            self._write_order.pop(key, None)
+            self._write_order[key] = ts
+            while len(self._items) > self.max_items:
+                evicted, _ = self._items.popitem(last=False)
+                del self._write_order[evicted]
+                self.evictions += 1
+            self._expire(ts, self.EXPIRE_PER_CALL)
+
+    def _expire(self, now: float, limit: int):
+        """Bỏ tối đa `limit` entry đã hết hạn ở đầu thứ tự ghi (gọi khi đang giữ lock)"""
+        order = self._write_order
+        for _ in range(limit):
+            if not order:
+                return
+            key, ts = next(iter(order.items()))
+            if now - ts <= self.ttl_seconds:
+                return
+            del order[key]
+            del self._items[key]
+            self.expirations += 1
+
+    def _size(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        with self._lock:
+            stats['evictions'] = self.evictions
+            stats['expirations'] = self.expirations
+        return stats
+
+    def save_snapshot(self, path: str):
+        """Ghi các entry còn hạn ra file JSON lines (key, timestamp, value)"""
+        now = time.time()
+        with self._lock:
+            entries = [(k, ts, v) for k, (ts, v) in self._items.items() if now - ts <= self.ttl_seconds]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, ts, value in entries:
+                f.write(json.dumps({'key': key, 'ts': ts, 'value': value}, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str) -> int:
+        """Nạp lại snapshot (bỏ entry đã hết hạn); trả về số entry đã nạp"""
+        if not os.path.exists(path):
+            return 0
+        now = time.time()
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if now - entry['ts'] <= self.ttl_seconds:
+                    entries.append(entry)
+        # Nạp theo thứ tự thời gian ghi để hàng đợi hạn dùng vẫn đúng thứ tự
+        entries.sort(key=lambda entry: entry['ts'])
+        for entry in entries:
+            self._store(entry['key'], entry['value'], entry['ts'])
+        return len(entries)
+
+
+# ============================================================================
+# SQLITE (WAL)
+# ============================================================================
+
+class SQLiteCache(Cache):
+    """
+    Cache trong file SQLite (WAL: nhiều reader đồng thời với một writer, an toàn đa process)
+
+    Mỗi thread/process dùng connection riêng. get chỉ trả entry còn hạn (lọc theo expires_at);
+    dòng hết hạn và phần vượt max_items (entry cũ nhất) bị xóa sau mỗi `prune_every` lần set
+    để không đếm bảng ở mọi lần ghi.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, namespace: str, path: str, ttl_seconds: float = 600,
+                 max_items: int = 256, prune_every: int = 64):
+        super().__init__(namespace, ttl_seconds, max_items)
+        self.path = path
+        self.prune_every = max(1, int(prune_every))
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_entries_created ON cache_entries (namespace, created_at)"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._count('errors')
+            print(f"⚠️  SQLite cache read failed: {e}")
+            return self._record(None)
+        return self._record(json.loads(row[0]) if row else None)
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, ensure_ascii=False), now, now + self.ttl_seconds)
+            )
+            if self._count('_writes') % self.prune_every == 0:
+                self._prune(conn, now)
+            conn.commit()
+        except sqlite3.Error as e:
+            self._count('errors')
+            print(f"⚠️  SQLite cache write failed: {e}")
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, now)
+        )
+        conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+            " SELECT key FROM cache_entries WHERE namespace = ?"
+            " ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_items)
+        )
+
+    def _size(self) -> Optional[int]:
+        try:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+
+# ============================================================================
+# REDIS PROTOCOL (RESP)
+# ============================================================================
+
+class RedisProtocolError(Exception):
+    """Lỗi trả về từ server (reply '-ERR ...')"""
+
+
+class RedisUnavailableError(ConnectionError):
+    """Server vừa lỗi kết nối, đang trong thời gian tạm ngừng thử lại"""
+
+
+class RespClient:
+    """
+    Client RESP tối giản (một connection, khóa theo lệnh, tự kết nối lại một lần khi lỗi mạng)
+
+    Kết nối lỗi → bỏ qua server trong `retry_seconds` giây (RedisUnavailableError ngay, không
+    chờ connect timeout dưới lock): Redis down chỉ làm cache miss, không cộng thêm latency.
+
+    URL: redis://[:password@]host[:port][/db]
+    """
+
+    def __init__(self, url: str, timeout: float = 1.0, retry_seconds: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self.retry_seconds = max(0.0, float(retry_seconds))
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+        self._pid = None
+        self._down_until = 0.0
+
+    def _connect(self):
+        self.close()
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile('rb')
+        self._pid = os.getpid()
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._file = None
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b'+':
+            return payload.decode('utf-8')
+        if prefix == b'-':
+            raise RedisProtocolError(payload.decode('utf-8'))
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if prefix == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisProtocolError(f"Unknown reply prefix: {line!r}")
+
+    def _call(self, *args):
+        self._sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def _check_available(self):
+        if time.monotonic() < self._down_until:
+            raise RedisUnavailableError(f"Redis {self.host}:{self.port} unavailable, retrying later")
+
+    def execute(self, *args):
+        """
+        Gửi một lệnh và trả về reply đã decode
+
+        Raises:
+            RedisUnavailableError: đang trong thời gian tạm ngừng sau lỗi kết nối
+            OSError: lỗi mạng (bắt đầu thời gian tạm ngừng)
+        """
+        self._check_available()
+        with self._lock:
+            # Thread chờ lock trong lúc thread khác vừa gặp lỗi kết nối → không thử lại
+            self._check_available()
+            try:
+                # Socket không dùng chung được qua fork
+                if self._sock is None or self._pid != os.getpid():
+                    self._connect()
+                    return self._call(*args)
+                try:
+                    return self._call(*args)
+                except OSError:
+                    # Connection cũ hỏng (server restart, idle timeout) → kết nối lại một lần
+                    self._connect()
+                    return self._call(*args)
+            except OSError:
+                self.close()
+                self._down_until = time.monotonic() + self.retry_seconds
+                raise
+
+
+class RedisCache(Cache):
+    """
+    Cache trên server Redis-protocol: SET key value EX ttl
+
+    Giới hạn kích thước do server quản lý (maxmemory + maxmemory-policy allkeys-lru);
+    max_items chỉ mang tính thông tin với backend này.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, namespace: str, url: str, ttl_seconds: float = 600,
+                 max_items: int = 256, key_prefix: str = 'fraud', timeout: float = 1.0,
+                 retry_seconds: float = 5.0):
+        super().__init__(namespace, ttl_seconds, max_items)
+        self.client = RespClient(url, timeout=timeout, retry_seconds=retry_seconds)
+        self.key_prefix = key_prefix
+        # Lệnh bỏ qua vì server đang trong thời gian tạm ngừng (tính là miss, không log)
+        self.skipped = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.key_prefix}:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            data = self.client.execute('GET', self._key(key))
+        except RedisUnavailableError:
+            self._count('skipped')
+            return self._record(None)
+        except (RedisProtocolError, OSError) as e:
+            self._count('errors')
+            print(f"⚠️  Redis cache read failed: {e}")
+            return self._record(None)
+        return self._record(json.loads(data) if data is not None else None)
+
+    def set(self, key: str, value: Any):
+        try:
+            self.client.execute(
+                'SET', self._key(key), json.dumps(value, ensure_ascii=False),
+                'EX', max(1, int(self.ttl_seconds))
+            )
+        except RedisUnavailableError:
+            self._count('skipped')
+        except (RedisProtocolError, OSError) as e:
+            self._count('errors')
+            print(f"⚠️  Redis cache write failed: {e}")
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        with self._stats_lock:
+            stats['skipped'] = self.skipped
+        return stats
+
+
+# ============================================================================
+# FACTORY
+# ============================================================================
+
+CACHE_BACKENDS = ('memory', 'sqlite', 'redis')
+
+# File snapshot → MemoryCache ghi ra file đó khi process thoát (cache tạo sau cùng cho mỗi file).
+# Một hook atexit cho cả process: create_app() gọi nhiều lần không đăng ký thêm hook / ghi thêm file.
+_SNAPSHOTS: Dict[str, MemoryCache] = {}
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def _save_snapshots():
+    with _SNAPSHOTS_LOCK:
+        snapshots = list(_SNAPSHOTS.items())
+    for path, cache in snapshots:
+        try:
+            cache.save_snapshot(path)
+        except OSError as e:
+            print(f"⚠️  Cache '{cache.namespace}' snapshot failed: {e}")
+
+
+def _register_snapshot(path: str, cache: MemoryCache):
+    with _SNAPSHOTS_LOCK:
+        if not _SNAPSHOTS:
+            atexit.register(_save_snapshots)
+        _SNAPSHOTS[os.path.abspath(path)] = cache
+
+
+def create_cache(namespace: str, config, ttl_seconds: float = None, max_items: int = None,
+                 backend: str = None) -> Cache:
+    """
+    Tạo cache theo app config (ttl_seconds / max_items / backend ghi đè CACHE_TTL_SECONDS /
+    CACHE_MAX_ITEMS / CACHE_BACKEND)
+
+    Config keys:
+        CACHE_BACKEND: memory | sqlite | redis
+        CACHE_TTL_SECONDS, CACHE_MAX_ITEMS
+        CACHE_SQLITE_PATH: file SQLite (backend sqlite)
+        CACHE_REDIS_URL: redis://host:port/db (backend redis)
+        CACHE_REDIS_RETRY_SECONDS: backend redis - bỏ qua server bao lâu sau lỗi kết nối
+        CACHE_WARM_START: backend memory - nạp snapshot CACHE_SNAPSHOT_DIR/<namespace>.jsonl
+            lúc khởi động và ghi lại khi process thoát
+    """
+    backend = (backend or config.get('CACHE_BACKEND') or 'memory').strip().lower()
+    ttl = ttl_seconds if ttl_seconds is not None else config.get('CACHE_TTL_SECONDS', 600)
+    max_items = max_items if max_items is not None else config.get('CACHE_MAX_ITEMS', 256)
+
+    if backend == 'sqlite':
+        return SQLiteCache(namespace, config.get('CACHE_SQLITE_PATH', 'instance/cache.sqlite3'),
+                           ttl_seconds=ttl, max_items=max_items)
+    if backend == 'redis':
+        return RedisCache(namespace, config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+                          ttl_seconds=ttl, max_items=max_items,
+                          retry_seconds=config.get('CACHE_REDIS_RETRY_SECONDS', 5))
+    if backend != 'memory':
+        raise ValueError(f"Invalid CACHE_BACKEND '{backend}'. Must be one of: {', '.join(CACHE_BACKENDS)}")
+
+    cache = MemoryCache(namespace, ttl_seconds=ttl, max_items=max_items)
+    if config.get('CACHE_WARM_START', False):
+        snapshot_dir = config.get('CACHE_SNAPSHOT_DIR', 'instance')
+        os.makedirs(snapshot_dir, exist_ok=True)
+        snapshot_path = os.path.join(snapshot_dir, f"{namespace}.jsonl")
+        try:
+            loaded = cache.load_snapshot(snapshot_path)
+            print(f"✅ Cache '{namespace}' warm-started with {loaded} entries")
+        except (OSError, KeyError, TypeError) as e:
+            print(f"⚠️  Cache '{namespace}' warm start failed: {e}")
+        _register_snapshot(snapshot_path, cache)
+    return cache
@@ -16,6 +16,15 @@ class Config:
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL', 'https://openrouter.ai/api/v1')
     OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'anthropic/claude-3.5-sonnet')
+    # Pooled HTTP client (one per worker process): pool limits, keep-alive, timeouts
+    OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', '20'))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '10'))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY', '60'))
+    OPENAI_CONNECT_TIMEOUT = float(os.environ.get('OPENAI_CONNECT_TIMEOUT', '5'))
+    OPENAI_READ_TIMEOUT = float(os.environ.get('OPENAI_READ_TIMEOUT', '60'))
+    OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', '2'))
+    # HTTP/2 needs `pip install h2`; falls back to HTTP/1.1 otherwise
+    OPENAI_HTTP2 = os.environ.get('OPENAI_HTTP2', 'false').lower() == 'true'
     
     # Exchange Rate
     USD_TO_VND_RATE = float(os.environ.get('USD_TO_VND_RATE', '24000'))
@@ -23,6 +32,108 @@ class Config:
     # Model Configuration
     MODEL_PATH = os.environ.get('MODEL_PATH', 'models/fraud_detection_model.pkl')
     SCALER_PATH = os.environ.get('SCALER_PATH', 'models/scaler.pkl')
+    BATCH_PREDICT_MAX_ROWS = int(os.environ.get('BATCH_PREDICT_MAX_ROWS', '10000'))
+    # Scoring engine: 'sklearn' (XGBClassifier wrapper) | 'booster' (Booster.inplace_predict)
+    FRAUD_ENGINE = os.environ.get('FRAUD_ENGINE', 'sklearn')
+    # Exact score index (build_score_index.py); empty = disabled
+    FRAUD_SCORE_INDEX_PATH = os.environ.get('FRAUD_SCORE_INDEX_PATH', '')
+    FRAUD_SCORE_INDEX_BUILD = os.environ.get('FRAUD_SCORE_INDEX_BUILD', 'false').lower() == 'true'
+    FRAUD_SCORE_INDEX_MAX_COMBOS = int(os.environ.get('FRAUD_SCORE_INDEX_MAX_COMBOS', '5000000'))
+    # Micro-batching of concurrent /predict-fraud requests
+    FRAUD_MICRO_BATCH_ENABLED = os.environ.get('FRAUD_MICRO_BATCH_ENABLED', 'false').lower() == 'true'
+    FRAUD_MICRO_BATCH_MAX_SIZE = int(os.environ.get('FRAUD_MICRO_BATCH_MAX_SIZE', '32'))
+    FRAUD_MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('FRAUD_MICRO_BATCH_MAX_WAIT_MS', '2'))
+    # Max time a request waits for its batch result (then fails instead of blocking the worker)
+    FRAUD_MICRO_BATCH_TIMEOUT_SECONDS = float(os.environ.get('FRAUD_MICRO_BATCH_TIMEOUT_SECONDS', '10'))
+    # TreeSHAP contribution cache entries (keyed on split-interval signature); 0 = disabled
+    FRAUD_CONTRIB_CACHE_SIZE = int(os.environ.get('FRAUD_CONTRIB_CACHE_SIZE', '4096'))
+
+    # Explanation cache backend: memory (per worker) | sqlite (shared per node) | redis
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', '600'))
+    CACHE_MAX_ITEMS = int(os.environ.get('CACHE_MAX_ITEMS', '256'))
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', 'instance/cache.sqlite3')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    # After a Redis connection error, skip Redis (cache miss) for this many seconds
+    CACHE_REDIS_RETRY_SECONDS = float(os.environ.get('CACHE_REDIS_RETRY_SECONDS', '5'))
+    # memory backend: load/save a snapshot in CACHE_SNAPSHOT_DIR at boot/exit
+    CACHE_WARM_START = os.environ.get('CACHE_WARM_START', 'false').lower() == 'true'
+    CACHE_SNAPSHOT_DIR = os.environ.get('CACHE_SNAPSHOT_DIR', 'instance')
+
+    # AI explanation on /predict-fraud: sync (wait) | async (explanation_id + background job)
+    AI_EXPLANATION_MODE = os.environ.get('AI_EXPLANATION_MODE', 'sync')
+    AI_EXPLANATION_WORKERS = int(os.environ.get('AI_EXPLANATION_WORKERS', '4'))
+    AI_EXPLANATION_JOB_TTL_SECONDS = int(os.environ.get('AI_EXPLANATION_JOB_TTL_SECONDS', '600'))
+    # Explanation engine: llm | template (local, no LLM call) | auto (LLM, template on error/timeout)
+    AI_EXPLANATION_ENGINE = os.environ.get('AI_EXPLANATION_ENGINE', 'llm')
+    # auto engine: max seconds to wait for the LLM before falling back to the template
+    AI_EXPLANATION_LLM_TIMEOUT_SECONDS = float(os.environ.get('AI_EXPLANATION_LLM_TIMEOUT_SECONDS', '8'))
+    # Second-tier explanation cache keyed on a coarse signature (risk level, top factor signs,
+    # amount/hour/age bands); cached text is parameterized and refilled with actual values
+    SEMANTIC_CACHE_ENABLED = os.environ.get('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'
+    SEMANTIC_CACHE_TOP_FACTORS = int(os.environ.get('SEMANTIC_CACHE_TOP_FACTORS', '3'))
+    SEMANTIC_CACHE_AMT_BANDS = [
+        float(b) for b in os.environ.get(
+            'SEMANTIC_CACHE_AMT_BANDS', '1000000,5000000,10000000,20000000,50000000,100000000'
+        ).split(',') if b.strip()
+    ]
+    SEMANTIC_CACHE_HOUR_BAND = int(os.environ.get('SEMANTIC_CACHE_HOUR_BAND', '3'))
+    SEMANTIC_CACHE_AGE_BAND = int(os.environ.get('SEMANTIC_CACHE_AGE_BAND', '10'))
+    SEMANTIC_CACHE_TTL_SECONDS = int(os.environ.get('SEMANTIC_CACHE_TTL_SECONDS', '86400'))
+    SEMANTIC_CACHE_MAX_ITEMS = int(os.environ.get('SEMANTIC_CACHE_MAX_ITEMS', '4096'))
+    
+    # Receipt parsing: local rule parser first, LLM only below this confidence / on missing fields
+    RECEIPT_PARSER_ENABLED = os.environ.get('RECEIPT_PARSER_ENABLED', 'true').lower() == 'true'
+    RECEIPT_PARSER_MIN_CONFIDENCE = float(os.environ.get('RECEIPT_PARSER_MIN_CONFIDENCE', '0.8'))
+    
+    # OCR image preprocessing (each step timed; see OCRService response 'preprocessing')
+    OCR_PREPROCESS_ENABLED = os.environ.get('OCR_PREPROCESS_ENABLED', 'true').lower() == 'true'
+    OCR_PREPROCESS_MAX_HEIGHT = int(os.environ.get('OCR_PREPROCESS_MAX_HEIGHT', '2400'))  # 0 = no limit
+    OCR_PREPROCESS_TARGET_DPI = int(os.environ.get('OCR_PREPROCESS_TARGET_DPI', '300'))  # 0 = ignore DPI
+    OCR_PREPROCESS_DRAFT = os.environ.get('OCR_PREPROCESS_DRAFT', 'true').lower() == 'true'
+    OCR_PREPROCESS_EXIF = os.environ.get('OCR_PREPROCESS_EXIF', 'true').lower() == 'true'
+    OCR_PREPROCESS_GRAYSCALE = os.environ.get('OCR_PREPROCESS_GRAYSCALE', 'true').lower() == 'true'
+    OCR_PREPROCESS_BINARIZE = os.environ.get('OCR_PREPROCESS_BINARIZE', 'false').lower() == 'true'
+    OCR_PREPROCESS_BINARIZE_WINDOW = int(os.environ.get('OCR_PREPROCESS_BINARIZE_WINDOW', '31'))
+    OCR_PREPROCESS_BINARIZE_OFFSET = float(os.environ.get('OCR_PREPROCESS_BINARIZE_OFFSET', '10'))
+    OCR_PREPROCESS_DESKEW = os.environ.get('OCR_PREPROCESS_DESKEW', 'false').lower() == 'true'
+    OCR_PREPROCESS_MAX_SKEW = float(os.environ.get('OCR_PREPROCESS_MAX_SKEW', '5'))
+    
+    # OCR + parse result cache keyed on image content (persistent by default: sqlite at CACHE_SQLITE_PATH)
+    OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+    OCR_CACHE_BACKEND = os.environ.get('OCR_CACHE_BACKEND', 'sqlite')
+    OCR_CACHE_TTL_SECONDS = int(os.environ.get('OCR_CACHE_TTL_SECONDS', '604800'))
+    OCR_CACHE_MAX_ITEMS = int(os.environ.get('OCR_CACHE_MAX_ITEMS', '10000'))
+    # Perceptual (dHash) tier for re-encoded copies; same-layout receipts can collide, keep distance small
+    OCR_CACHE_DHASH_ENABLED = os.environ.get('OCR_CACHE_DHASH_ENABLED', 'false').lower() == 'true'
+    OCR_CACHE_DHASH_MAX_DISTANCE = int(os.environ.get('OCR_CACHE_DHASH_MAX_DISTANCE', '2'))
+    
+    # OCR engine: pytesseract (tesseract subprocess per call) | tesserocr (in-process libtesseract,
+    # one initialized API per thread + language; needs `pip install tesserocr`). Both read TESSDATA_PREFIX.
+    OCR_ENGINE = os.environ.get('OCR_ENGINE', 'pytesseract')
+    
+    # Region-of-interest OCR: coarse pass at OCR_ROI_COARSE_SCALE, then re-OCR only the amount and
+    # date/time value regions at full resolution (single-line mode + digit whitelist). Pays off with
+    # OCR_ENGINE=tesserocr; with pytesseract the three tesseract launches cost more than they save.
+    OCR_ROI_ENABLED = os.environ.get('OCR_ROI_ENABLED', 'false').lower() == 'true'
+    OCR_ROI_COARSE_SCALE = float(os.environ.get('OCR_ROI_COARSE_SCALE', '0.5'))
+    
+    # Tiered OCR: cheap single-language pass first (downscaled, psm 6); the full vie+eng pass runs only
+    # when its mean word confidence < OCR_FAST_MIN_CONFIDENCE or the receipt parser misses a required field
+    OCR_TIERED_ENABLED = os.environ.get('OCR_TIERED_ENABLED', 'false').lower() == 'true'
+    OCR_FAST_LANGUAGE = os.environ.get('OCR_FAST_LANGUAGE', 'vie')
+    OCR_FAST_SCALE = float(os.environ.get('OCR_FAST_SCALE', '0.75'))
+    OCR_FAST_PSM = int(os.environ.get('OCR_FAST_PSM', '6'))
+    OCR_FAST_MIN_CONFIDENCE = float(os.environ.get('OCR_FAST_MIN_CONFIDENCE', '80'))
+    OCR_FAST_REQUIRE_FIELDS = os.environ.get('OCR_FAST_REQUIRE_FIELDS', 'true').lower() == 'true'
+    
+    # OCR process pool (per Flask worker): unset = one process per core, 0 = run OCR inline
+    OCR_POOL_WORKERS = int(os.environ['OCR_POOL_WORKERS']) if os.environ.get('OCR_POOL_WORKERS') else None
+    # fork | spawn | forkserver (empty = platform default)
+    OCR_POOL_START_METHOD = os.environ.get('OCR_POOL_START_METHOD', '')
+    # Per-image limit: tesseract is killed after this many seconds (0 = no limit)
+    OCR_TIMEOUT_SECONDS = float(os.environ.get('OCR_TIMEOUT_SECONDS', '30'))
+    OCR_BATCH_MAX_FILES = int(os.environ.get('OCR_BATCH_MAX_FILES', '50'))
     
     # API Configuration
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max request size
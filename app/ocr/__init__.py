@@ -0,0 +1,5 @@
+"""
+OCR - Tiền xử lý ảnh, Tesseract và parse biên lai (không import blueprint nào)
+
+Process con của OCR pool chỉ import package này, không kéo theo Flask blueprint / model.
+"""
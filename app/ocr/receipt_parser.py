@@ -0,0 +1,240 @@
+"""
+Receipt Parser - Bộ parse bằng luật (regex) cho biên lai chuyển khoản / thanh toán của ngân hàng VN
+
+Phần lớn ảnh biên lai đến từ một số ít app ngân hàng có bố cục cố định ("Số tiền: 500.000 VND",
+"Thời gian: 13:05:02 15/10/2024", ...). Parser này trích xuất số tiền, ngày + giờ (tính thứ
+trong tuần cục bộ), tỉnh/thành và loại giao dịch, kèm điểm tin cậy 0-1. Route chỉ gọi LLM
+khi điểm tin cậy thấp hoặc thiếu trường bắt buộc.
+
+Kết quả `data` cùng format với OpenAIService.parse_transaction_text.
+"""
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+import re
+import unicodedata
+
+
+# Trường phải có để bỏ qua LLM
+REQUIRED_FIELDS = ('amt', 'transaction_time', 'transaction_day')
+
+# 63 tỉnh/thành (viết thường, không dấu) - cùng danh sách hợp lệ với parse_transaction_text
+PROVINCES = (
+    'ha noi', 'ho chi minh', 'hai phong', 'da nang', 'can tho',
+    'an giang', 'ba ria vung tau', 'bac giang', 'bac kan', 'bac lieu', 'bac ninh',
+    'ben tre', 'binh dinh', 'binh duong', 'binh phuoc', 'binh thuan', 'ca mau',
+    'cao bang', 'dak lak', 'dak nong', 'dien bien', 'dong nai', 'dong thap',
+    'gia lai', 'ha giang', 'ha nam', 'ha tinh', 'hai duong', 'hau giang',
+    'hoa binh', 'hung yen', 'khanh hoa', 'kien giang', 'kon tum', 'lai chau',
+    'lam dong', 'lang son', 'lao cai', 'long an', 'nam dinh', 'nghe an',
+    'ninh binh', 'ninh thuan', 'phu tho', 'phu yen', 'quang binh', 'quang nam',
+    'quang ngai', 'quang ninh', 'quang tri', 'soc trang', 'son la', 'tay ninh',
+    'thai binh', 'thai nguyen', 'thanh hoa', 'thua thien hue', 'tien giang',
+    'tra vinh', 'tuyen quang', 'vinh long', 'vinh phuc', 'yen bai'
+)
+
+PROVINCE_ALIASES = {
+    'hanoi': 'ha noi',
+    'tp hcm': 'ho chi minh', 'tphcm': 'ho chi minh', 'hcm': 'ho chi minh',
+    'sai gon': 'ho chi minh', 'saigon': 'ho chi minh',
+    'ba ria - vung tau': 'ba ria vung tau', 'vung tau': 'ba ria vung tau',
+    'daklak': 'dak lak'
+}
+
+# Từ khóa (không dấu) → category; theo thứ tự ưu tiên (online trước offline)
+CATEGORY_KEYWORDS = (
+    ('siêu thị online', ('bachhoaxanh.com', 'winmart online', 'di cho online', 'grabmart', 'sieu thi online')),
+    ('mua sắm online', ('shopee', 'lazada', 'tiki', 'tiktok shop', 'sendo')),
+    ('du lịch', ('khach san', 'hotel', 've may bay', 'vietnam airlines', 'vietjet', 'bamboo airways',
+                 'traveloka', 'agoda', 'booking.com', 'tour')),
+    ('xăng dầu', ('xang', 'petrolimex', 'nhien lieu', 'cay xang', 'pvoil')),
+    ('ăn uống', ('nha hang', 'quan an', 'cafe', 'ca phe', 'coffee', 'highlands', 'tra sua',
+                 'grabfood', 'shopeefood', 'baemin', 'an uong')),
+    ('sức khỏe', ('benh vien', 'phong kham', 'nha thuoc', 'pharmacy', 'long chau', 'gym', 'fitness')),
+    ('siêu thị', ('sieu thi', 'winmart', 'coopmart', 'co.opmart', 'bach hoa xanh', 'circle k',
+                  'familymart', 'ministop', 'aeon', 'lotte mart', 'big c', 'go!')),
+    ('giải trí', ('cgv', 'lotte cinema', 'galaxy cinema', 'karaoke', 'rap phim', 'netflix', 'steam')),
+    ('chăm sóc cá nhân', ('spa', 'salon', 'my pham', 'lam dep', 'hasaki', 'guardian')),
+    ('trẻ em', ('do choi', 'bibo mart', 'con cung', 'kids', 'ta bim', 'sua bot', 'pet')),
+    ('nội thất', ('noi that', 'ikea', 'nha xinh', 'trang tri')),
+    ('mua sắm', ('thoi trang', 'quan ao', 'giay dep', 'uniqlo', 'zara', 'h&m')),
+)
+
+# Tên app / ngân hàng có bố cục biên lai quen thuộc
+KNOWN_ISSUERS = (
+    'vietcombank', 'techcombank', 'vietinbank', 'bidv', 'agribank', 'mb bank', 'mbbank',
+    'acb', 'tpbank', 'vpbank', 'sacombank', 'hdbank', 'vib', 'shb', 'ocb', 'msb', 'seabank',
+    'momo', 'zalopay', 'vnpay', 'shopeepay', 'viettel money'
+)
+
+# Số tiền không bao giờ kéo qua dòng sau: dấu phân cách nghìn / khoảng trắng chỉ là ' ',
+# không phải \s (ký tự xuống dòng). Có nhãn thì nhận cả số nhỏ ("Tong tien 500")
+_AMOUNT_LABEL = re.compile(
+    r'(so tien|tong tien|thanh tien|tong cong|gia tri|amount|total)[^\d\n]{0,25}?'
+    r'([-+]? ?\d{1,3}(?:[., ]\d{3})+|[-+]? ?\d+)(?:[.,]\d{1,2})? *(vnd|d\b|dong)?'
+)
+_AMOUNT_CURRENCY = re.compile(
+    r'(?<![\d.,])([-+]? ?\d{1,3}(?:[.,]\d{3})+|[-+]? ?\d{4,}) *(vnd|d\b|dong)'
+)
+_DATE_DMY = re.compile(r'(?<!\d)(\d{1,2})\s*[/\-.]\s*(\d{1,2})\s*[/\-.]\s*(\d{4})(?!\d)')
+_DATE_YMD = re.compile(r'(?<!\d)(\d{4})-(\d{1,2})-(\d{1,2})(?!\d)')
+_DATE_WORDS = re.compile(r'ngay\s+(\d{1,2})\s+thang\s+(\d{1,2})\s+nam\s+(\d{4})')
+_TIME = re.compile(r'(?<![\d:])([01]?\d|2[0-3])\s*[:h]\s*([0-5]\d)(?:\s*:\s*([0-5]\d))?(?![\d:])')
+
+
+def _word_pattern(words) -> re.Pattern:
+    """Một regex khớp bất kỳ từ nào (dài trước), không dính chữ cái hai bên"""
+    alternatives = '|'.join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+    return re.compile(r'(?<![a-z])(' + alternatives + r')(?![a-z])')
+
+
+_CITY_PATTERN = _word_pattern(set(PROVINCES) | set(PROVINCE_ALIASES))
+# Nhãn của dòng số tiền / thời gian (OCR thô có thể đọc sai chữ số nhưng thường đúng nhãn)
+_AMOUNT_HINT = _word_pattern(('so tien', 'tong tien', 'thanh tien', 'tong cong', 'gia tri', 'amount', 'total'))
+_DATETIME_HINT = _word_pattern(('thoi gian', 'ngay', 'gio', 'time', 'date'))
+_CATEGORY_PATTERNS = [(category, _word_pattern(keywords)) for category, keywords in CATEGORY_KEYWORDS]
+_ISSUER_PATTERN = _word_pattern(KNOWN_ISSUERS)
+
+
+def normalize_text(text: str) -> str:
+    """Chữ thường, bỏ dấu tiếng Việt (đ → d), gộp khoảng trắng trong từng dòng"""
+    text = unicodedata.normalize('NFD', text or '').replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn').lower()
+    return '\n'.join(' '.join(line.split()) for line in text.splitlines())
+
+
+def _to_amount(raw: str) -> Optional[int]:
+    digits = re.sub(r'[^\d]', '', raw)
+    if not digits:
+        return None
+    amount = int(digits)
+    return amount if amount > 0 else None
+
+
+def _find_amount(text: str) -> Tuple[Optional[int], float, List[str]]:
+    """(số tiền, độ tin cậy, signals) - ưu tiên dòng có nhãn "Số tiền"/"Amount"..."""
+    labelled = [_to_amount(m.group(2)) for m in _AMOUNT_LABEL.finditer(text)]
+    labelled = [a for a in labelled if a]
+    if labelled:
+        # Biên lai thường lặp lại số tiền (số + bằng chữ / tổng); nhiều giá trị khác nhau → kém tin cậy
+        distinct = set(labelled)
+        return labelled[0], (1.0 if len(distinct) == 1 else 0.6), ['amount_labelled']
+
+    with_currency = [_to_amount(m.group(1)) for m in _AMOUNT_CURRENCY.finditer(text)]
+    with_currency = [a for a in with_currency if a]
+    if with_currency:
+        distinct = set(with_currency)
+        return max(with_currency), (0.8 if len(distinct) == 1 else 0.4), ['amount_currency']
+    return None, 0.0, []
+
+
+def _find_date(text: str) -> Optional[date]:
+    for pattern, order in ((_DATE_WORDS, 'dmy'), (_DATE_DMY, 'dmy'), (_DATE_YMD, 'ymd')):
+        for m in pattern.finditer(text):
+            a, b, c = (int(g) for g in m.groups())
+            day, month, year = (a, b, c) if order == 'dmy' else (c, b, a)
+            try:
+                return date(year, month, day)
+            except ValueError:
+                continue
+    return None
+
+
+def _find_time(text: str) -> Optional[str]:
+    for m in _TIME.finditer(text):
+        hour, minute, second = m.group(1), m.group(2), m.group(3)
+        return f"{int(hour):02d}:{minute}:{second or '00'}"
+    return None
+
+
+def _find_city(text: str) -> Optional[str]:
+    m = _CITY_PATTERN.search(text)
+    return PROVINCE_ALIASES.get(m.group(1), m.group(1)) if m else None
+
+
+def _find_category(text: str) -> Tuple[str, bool]:
+    for category, pattern in _CATEGORY_PATTERNS:
+        if pattern.search(text):
+            return category, True
+    return 'khác', False
+
+
+def line_fields(line: str) -> List[str]:
+    """
+    Trường (amount / datetime) mà một dòng OCR có thể chứa - dùng để chọn vùng OCR lại (ROI)
+
+    Dòng phải có chữ số và khớp nhãn hoặc định dạng của trường.
+    """
+    text = normalize_text(line)
+    if not any(ch.isdigit() for ch in text):
+        return []
+    fields = []
+    if _AMOUNT_HINT.search(text) or _AMOUNT_LABEL.search(text) or _AMOUNT_CURRENCY.search(text):
+        fields.append('amount')
+    if (_DATETIME_HINT.search(text) or _TIME.search(text) or _DATE_DMY.search(text)
+            or _DATE_YMD.search(text) or _DATE_WORDS.search(text)):
+        fields.append('datetime')
+    return fields
+
+
+def parse_receipt(ocr_text: str) -> Dict:
+    """
+    Parse OCR text của biên lai bằng luật
+
+    Returns:
+        {
+            'data': {amt, gender, category, transaction_time, transaction_day, city, age},
+            'confidence': 0-1,
+            'missing': [trường bắt buộc không tìm thấy],
+            'signals': [luật đã khớp]
+        }
+    """
+    text = normalize_text(ocr_text)
+    signals = []
+
+    amount, amount_score, amount_signals = _find_amount(text)
+    signals += amount_signals
+
+    tx_date = _find_date(text)
+    tx_time = _find_time(text)
+    city = _find_city(text)
+    category, category_matched = _find_category(text)
+    issuer_match = _ISSUER_PATTERN.search(text)
+    issuer = issuer_match.group(1) if issuer_match else None
+
+    if tx_date is not None:
+        signals.append('date')
+    if tx_time is not None:
+        signals.append('time')
+    if city is not None:
+        signals.append('city')
+    if category_matched:
+        signals.append('category')
+    if issuer is not None:
+        signals.append(f'issuer:{issuer}')
+
+    data = {
+        'amt': amount,
+        'gender': None,
+        'category': category,
+        'transaction_time': tx_time,
+        # 0=Thứ 2 ... 6=Chủ nhật (như date.weekday())
+        'transaction_day': tx_date.weekday() if tx_date is not None else None,
+        'city': city,
+        'age': 18
+    }
+
+    # Số tiền là trường quan trọng nhất; ngày + giờ kế tiếp; bố cục quen thuộc cộng thêm
+    confidence = (
+        0.5 * amount_score +
+        0.2 * (tx_date is not None) +
+        0.2 * (tx_time is not None) +
+        0.1 * (issuer is not None)
+    )
+    missing = [field for field in REQUIRED_FIELDS if data[field] is None]
+
+    return {
+        'data': data,
+        'confidence': round(confidence, 3),
+        'missing': missing,
+        'signals': signals
+    }
@@ -0,0 +1,153 @@
+"""
+ROI OCR - OCR thô toàn ảnh ở độ phân giải thấp, rồi OCR lại chỉ vùng số tiền / ngày giờ
+
+Biên lai của cùng một app ngân hàng luôn có dòng "Số tiền: ..." và "Thời gian: ...". Các trường
+mà parse (receipt_parser / parse_transaction_text) cần là các chữ số trên những dòng này, nhưng
+OCR toàn ảnh ở độ phân giải đầy đủ tốn thời gian nhất.
+
+    1. Pass thô: ảnh thu nhỏ `coarse_scale` (0.5 → 1/4 số pixel), bố cục tự động (psm 3):
+       lấy box + text từng dòng. Nhãn thường đọc đúng ngay cả khi chữ số bị đọc sai.
+    2. Chọn dòng số tiền / ngày giờ (receipt_parser.line_fields), lấy vùng các từ có chữ số.
+    3. OCR lại từng vùng ở độ phân giải đầy đủ, psm 7 (một dòng) + whitelist ký tự của trường,
+       rồi thay vào text của pass thô.
+
+Không tìm thấy dòng số tiền hoặc ngày giờ → trả về None để OCR toàn ảnh như bình thường.
+"""
+from typing import Dict, List, Optional, Tuple
+import time
+
+from PIL import Image
+
+from app.ocr.receipt_parser import line_fields
+
+
+SINGLE_LINE_PSM = 7
+
+# Ký tự được phép khi OCR lại vùng giá trị (có dấu cách: thiếu nó LSTM dính "04:25:41 03/01/2024")
+FIELD_WHITELISTS = {
+    'amount': '0123456789., ',
+    'datetime': '0123456789:/-. ',
+}
+
+_VALUE_CHARS = set('0123456789.,:/-')
+
+REQUIRED_REGIONS = ('amount', 'datetime')
+
+
+def _ocr_lines(ocr_data: Dict) -> List[Dict]:
+    """Nhóm các từ (level 5) theo dòng (page, block, par, line), giữ thứ tự đọc"""
+    lines = {}
+    for i, word in enumerate(ocr_data['text']):
+        if ocr_data['level'][i] != 5 or not str(word).strip():
+            continue
+        key = (ocr_data['page_num'][i], ocr_data['block_num'][i], ocr_data['par_num'][i], ocr_data['line_num'][i])
+        lines.setdefault(key, []).append(i)
+    return [
+        {'words': words, 'text': ' '.join(str(ocr_data['text'][i]) for i in words)}
+        for words in lines.values()
+    ]
+
+
+def _is_value_word(word: str) -> bool:
+    """Từ chủ yếu là chữ số / dấu phân cách ("1.660.000", "04:25:41"); nhãn đọc sai như "S6" thì không"""
+    word = word.strip()
+    if not any(ch.isdigit() for ch in word):
+        return False
+    return sum(ch in _VALUE_CHARS for ch in word) / len(word) >= 0.6
+
+
+def _value_span(ocr_data: Dict, words: List[int]) -> List[int]:
+    """Các từ từ giá trị đầu tiên đến giá trị cuối cùng (phần giá trị của dòng "nhãn: giá trị")"""
+    positions = [n for n, i in enumerate(words) if _is_value_word(str(ocr_data['text'][i]))]
+    if not positions:
+        return []
+    return words[positions[0]:positions[-1] + 1]
+
+
+def _box(ocr_data: Dict, words: List[int], scale: float, size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    """Box bao các từ (toạ độ ảnh thô → ảnh gốc) + lề theo chiều cao dòng"""
+    left = min(ocr_data['left'][i] for i in words) / scale
+    top = min(ocr_data['top'][i] for i in words) / scale
+    right = max(ocr_data['left'][i] + ocr_data['width'][i] for i in words) / scale
+    bottom = max(ocr_data['top'][i] + ocr_data['height'][i] for i in words) / scale
+    pad = 0.3 * (bottom - top)
+    return (
+        max(0, int(left - pad)), max(0, int(top - pad)),
+        min(size[0], int(right + pad) + 1), min(size[1], int(bottom + pad) + 1)
+    )
+
+
+def roi_ocr(engine, image, language: str, coarse_scale: float = 0.5, timeout: float = 0
+            ) -> Tuple[Optional[Dict], Dict]:
+    """
+    OCR theo vùng quan tâm
+
+    Args:
+        engine: OCREngine
+        image: PIL.Image đã tiền xử lý
+        coarse_scale: tỉ lệ ảnh của pass thô (0-1]
+
+    Returns:
+        (ocr_data cùng format image_to_data - text vùng giá trị đã được thay bằng kết quả OCR lại,
+         report {regions, pixels_ratio, steps_ms, fallback}); ocr_data None khi cần OCR toàn ảnh
+    """
+    steps = {}
+    report = {'coarse_scale': coarse_scale, 'regions': [], 'steps_ms': steps, 'fallback': None}
+    full_pixels = image.width * image.height
+
+    start = time.perf_counter()
+    coarse = image
+    if coarse_scale < 1.0:
+        coarse = image.resize(
+            (max(1, round(image.width * coarse_scale)), max(1, round(image.height * coarse_scale))),
+            Image.LANCZOS
+        )
+    scale = coarse.width / image.width
+    ocr_data = engine.image_to_data(coarse, language, timeout=timeout)
+    steps['coarse'] = round((time.perf_counter() - start) * 1000, 2)
+    pixels = coarse.width * coarse.height
+
+    # Mỗi trường lấy dòng đầu tiên khớp (biên lai lặp lại số tiền ở dòng "bằng chữ" / tổng)
+    selected = {}
+    for line in _ocr_lines(ocr_data):
+        for field in line_fields(line['text']):
+            if field not in selected:
+                span = _value_span(ocr_data, line['words'])
+                if span:
+                    selected[field] = span
+
+    missing = [field for field in REQUIRED_REGIONS if field not in selected]
+    if missing:
+        report['fallback'] = f"no {' / '.join(missing)} line in coarse pass"
+        report['pixels_ratio'] = round(pixels / full_pixels, 3)
+        return None, report
+
+    start = time.perf_counter()
+    texts = list(ocr_data['text'])
+    for field, span in selected.items():
+        box = _box(ocr_data, span, scale, image.size)
+        region = image.crop(box)
+        pixels += region.width * region.height
+        refined_data = engine.image_to_data(
+            region, language, timeout=timeout, psm=SINGLE_LINE_PSM,
+            variables={'tessedit_char_whitelist': FIELD_WHITELISTS[field]}
+        )
+        refined = ' '.join(
+            str(word).strip() for level, word in zip(refined_data['level'], refined_data['text'])
+            if level == 5 and str(word).strip()
+        )
+        coarse_text = ' '.join(str(texts[i]) for i in span)
+        if any(ch.isdigit() for ch in refined):
+            texts[span[0]] = refined
+            for i in span[1:]:
+                texts[i] = ''
+        report['regions'].append({
+            'field': field,
+            'box': list(box),
+            'coarse_text': coarse_text,
+            'text': refined or coarse_text
+        })
+    steps['regions'] = round((time.perf_counter() - start) * 1000, 2)
+
+    report['pixels_ratio'] = round(pixels / full_pixels, 3)
+    return dict(ocr_data, text=texts), report
@@ -0,0 +1,637 @@
+"""
+OCR services - Business logic for text extraction from images
+"""
+import io
+import os
+import shlex
+import threading
+import time
+from flask import current_app, has_app_context
+from PIL import Image, ImageFilter, ImageOps
+import numpy as np
+import pytesseract
+from app.ocr.roi_ocr import roi_ocr
+from app.ocr.receipt_parser import parse_receipt
+
+
+class ImagePreprocessor:
+    """
+    Chuẩn bị ảnh cho Tesseract: thời gian OCR tăng theo số pixel, ảnh chụp 12 MP mất vài giây
+    
+    Các bước (bật/tắt riêng, mỗi bước được đo thời gian):
+        draft      - JPEG decode ở kích thước giảm (1/2, 1/4, 1/8) ngay khi giải mã
+        grayscale  - chuyển ảnh xám
+        downscale  - thu nhỏ về max_height và/hoặc target_dpi (không phóng to)
+        exif       - xoay theo EXIF orientation (ảnh chụp điện thoại)
+        deskew     - chỉnh nghiêng nhỏ (±max_skew độ) theo projection profile
+        binarize   - nhị phân hóa thích nghi (ngưỡng = trung bình cục bộ - offset)
+    
+    Args:
+        max_height: chiều cao tối đa (px); 0 = bỏ qua
+        target_dpi: DPI mục tiêu khi ảnh có thông tin DPI; 0 = bỏ qua
+        draft / exif / grayscale / binarize / deskew: bật từng bước
+        binarize_window: cạnh cửa sổ tính trung bình cục bộ (px)
+        binarize_offset: pixel tối hơn (trung bình cục bộ - offset) thành đen
+        max_skew: góc nghiêng tối đa được dò (độ)
+    """
+    
+    def __init__(self, max_height=2400, target_dpi=300, draft=True, exif=True, grayscale=True,
+                 binarize=False, binarize_window=31, binarize_offset=10, deskew=False, max_skew=5.0):
+        self.max_height = int(max_height or 0)
+        self.target_dpi = int(target_dpi or 0)
+        self.draft = draft
+        self.exif = exif
+        self.grayscale = grayscale
+        self.binarize = binarize
+        self.binarize_window = max(3, int(binarize_window))
+        self.binarize_offset = float(binarize_offset)
+        self.deskew = deskew
+        self.max_skew = float(max_skew)
+    
+    @classmethod
+    def from_config(cls, config):
+        """Tạo từ app config (OCR_PREPROCESS_*)"""
+        return cls(
+            max_height=config.get('OCR_PREPROCESS_MAX_HEIGHT', 2400),
+            target_dpi=config.get('OCR_PREPROCESS_TARGET_DPI', 300),
+            draft=config.get('OCR_PREPROCESS_DRAFT', True),
+            exif=config.get('OCR_PREPROCESS_EXIF', True),
+            grayscale=config.get('OCR_PREPROCESS_GRAYSCALE', True),
+            binarize=config.get('OCR_PREPROCESS_BINARIZE', False),
+            binarize_window=config.get('OCR_PREPROCESS_BINARIZE_WINDOW', 31),
+            binarize_offset=config.get('OCR_PREPROCESS_BINARIZE_OFFSET', 10),
+            deskew=config.get('OCR_PREPROCESS_DESKEW', False),
+            max_skew=config.get('OCR_PREPROCESS_MAX_SKEW', 5.0)
+        )
+    
+    def _target_scale(self, image):
+        """Hệ số thu nhỏ (<= 1) theo max_height / target_dpi, tính trên ảnh gốc (chưa decode)"""
+        height = image.height
+        if self.exif and image.getexif().get(0x0112) in (5, 6, 7, 8):
+            # Ảnh sẽ được xoay 90° → chiều cao hiển thị là chiều rộng lưu trữ
+            height = image.width
+        scale = 1.0
+        if self.max_height and height > self.max_height:
+            scale = self.max_height / height
+        dpi = image.info.get('dpi')
+        try:
+            if self.target_dpi and dpi and float(dpi[1]) > self.target_dpi:
+                scale = min(scale, self.target_dpi / float(dpi[1]))
+        except (TypeError, ValueError, IndexError):
+            pass
+        return scale
+    
+    def process(self, image_data):
+        """
+        Giải mã + tiền xử lý ảnh
+        
+        Args:
+            image_data (bytes): Image binary data
+            
+        Returns:
+            tuple: (PIL.Image sẵn sàng cho OCR, report dict {original_size, processed_size, steps_ms})
+        """
+        steps = {}
+        
+        def timed(name, fn, image):
+            start = time.perf_counter()
+            result = fn(image)
+            steps[name] = round((time.perf_counter() - start) * 1000, 2)
+            return result
+        
+        start = time.perf_counter()
+        image = Image.open(io.BytesIO(image_data))
+        original_size = image.size
+        scale = self._target_scale(image)
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if self.draft and image.format == 'JPEG' and scale < 1.0:
+            # Bộ giải mã JPEG bỏ bớt hệ số DCT → decode trực tiếp ở 1/2, 1/4 hoặc 1/8 kích thước
+            # (không nhỏ hơn target; phần còn lại do bước downscale xử lý)
+            image.draft('RGB', target)
+        image.load()
+        steps['decode'] = round((time.perf_counter() - start) * 1000, 2)
+        
+        # Xám trước khi resize/xoay: 1 kênh thay vì 3
+        if self.grayscale or self.binarize or self.deskew:
+            image = timed('grayscale', lambda im: im.convert('L'), image)
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        
+        if image.size != target and scale < 1.0:
+            image = timed('downscale', lambda im: im.resize(target, Image.LANCZOS, reducing_gap=2.0), image)
+        
+        if self.exif:
+            # exif_transpose giữ lại EXIF của ảnh gốc (image.getexif() trước khi convert)
+            image = timed('exif', ImageOps.exif_transpose, image)
+        
+        report = {
+            'original_size': {'width': original_size[0], 'height': original_size[1]},
+            'steps_ms': steps
+        }
+        if self.deskew:
+            angle = timed('deskew', self.estimate_skew, image)
+            if abs(angle) >= 0.25:
+                image = timed('rotate', lambda im: im.rotate(angle, resample=Image.BICUBIC,
+                                                             expand=True, fillcolor=255), image)
+            report['skew_angle'] = angle
+        
+        # Nhị phân hóa sau cùng: xoay ảnh đã nhị phân tạo lại viền xám
+        if self.binarize:
+            image = timed('binarize', self._binarize, image)
+        
+        report['processed_size'] = {'width': image.width, 'height': image.height}
+        return image, report
+    
+    def _binarize(self, gray):
+        # Trung bình cục bộ bằng box blur (C trong Pillow), so sánh bằng NumPy
+        local_mean = np.asarray(gray.filter(ImageFilter.BoxBlur(self.binarize_window // 2)), dtype=np.float32)
+        pixels = np.asarray(gray, dtype=np.float32)
+        binary = np.where(pixels < local_mean - self.binarize_offset, 0, 255).astype(np.uint8)
+        return Image.fromarray(binary, mode='L')
+    
+    def estimate_skew(self, gray):
+        """
+        Góc nghiêng (độ, chiều ngược kim đồng hồ để xoay lại) theo projection profile
+        
+        Dòng chữ thẳng hàng → tổng mực theo từng hàng pixel có phương sai lớn nhất.
+        Dò thô 1° rồi tinh 0.25° trên ảnh thu nhỏ.
+        """
+        probe = gray.copy()
+        probe.thumbnail((600, 600))
+        ink = Image.fromarray(255 - np.asarray(probe, dtype=np.uint8), mode='L')
+        
+        def score(angle):
+            rows = np.asarray(ink.rotate(angle, resample=Image.NEAREST), dtype=np.float32).sum(axis=1)
+            return float(np.var(rows))
+        
+        coarse = max(np.arange(-self.max_skew, self.max_skew + 1e-9, 1.0), key=score)
+        fine = max(np.arange(coarse - 0.75, coarse + 0.76, 0.25), key=score)
+        return round(float(fine), 2)
+
+
+# Header của TSV mà tesseract CLI ghi ra (TessBaseAPI::GetTSVText không có header)
+TSV_HEADER = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext'
+
+
+class OCREngine:
+    """
+    Interface: image_to_data trả về dict cùng format pytesseract.Output.DICT
+    
+    psm: page segmentation mode (None = mặc định 3, tự phân tích bố cục; 7 = một dòng)
+    variables: biến tesseract cho riêng lần gọi (vd. {'tessedit_char_whitelist': '0123456789'})
+    """
+    
+    name = 'base'
+    
+    def image_to_data(self, image, language, timeout=0, psm=None, variables=None):
+        raise NotImplementedError
+
+
+class PytesseractEngine(OCREngine):
+    """Mỗi lần gọi chạy một process `tesseract` (nạp lại traineddata mỗi lần)"""
+    
+    name = 'pytesseract'
+    
+    def image_to_data(self, image, language, timeout=0, psm=None, variables=None):
+        config = [f'--psm {int(psm)}'] if psm is not None else []
+        # pytesseract tách config bằng shlex.split: phải quote để giữ khoảng trắng trong giá trị
+        config += [f"-c {shlex.quote(f'{name}={value}')}" for name, value in (variables or {}).items()]
+        return pytesseract.image_to_data(
+            image,
+            lang=language,
+            config=' '.join(config),
+            output_type=pytesseract.Output.DICT,
+            timeout=timeout
+        )
+
+
+class TesserocrEngine(OCREngine):
+    """
+    libtesseract trong process qua tesserocr: mỗi thread giữ một PyTessBaseAPI đã khởi tạo
+    cho mỗi ngôn ngữ, traineddata chỉ nạp một lần (thư mục tessdata: TESSDATA_PREFIX như CLI)
+    
+    Raises:
+        ImportError: chưa cài tesserocr (pip install tesserocr)
+    """
+    
+    name = 'tesserocr'
+    
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+    
+    def _api(self, language):
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+        api = apis.get(language)
+        if api is None:
+            api = apis[language] = self._tesserocr.PyTessBaseAPI(lang=language)
+        return api
+    
+    def image_to_data(self, image, language, timeout=0, psm=None, variables=None):
+        api = self._api(language)
+        # API dùng lại giữa các lần gọi → psm / biến chỉnh cho lần này phải được trả lại
+        previous_psm = api.GetPageSegMode()
+        previous = {name: api.GetVariableAsString(name) for name in (variables or {})}
+        if psm is not None:
+            api.SetPageSegMode(int(psm))
+        for name, value in (variables or {}).items():
+            api.SetVariable(name, str(value))
+        api.SetImage(image)
+        try:
+            if not api.Recognize(int(timeout * 1000)):
+                raise RuntimeError('Tesseract process timeout')
+            tsv = api.GetTSVText(0)
+        finally:
+            # Giải phóng ảnh + kết quả, giữ lại model đã nạp
+            api.Clear()
+            api.SetPageSegMode(previous_psm)
+            for name, value in previous.items():
+                api.SetVariable(name, value or '')
+        # Cùng cách chuyển kiểu với pytesseract (int cho cột số, text giữ nguyên)
+        return pytesseract.pytesseract.file_to_dict(f"{TSV_HEADER}\n{tsv}", '\t', -1)
+
+
+OCR_ENGINES = {
+    'pytesseract': PytesseractEngine,
+    'tesserocr': TesserocrEngine
+}
+
+
+class FastOCRPass:
+    """
+    Tầng OCR rẻ chạy trước: một ngôn ngữ, ảnh thu nhỏ, psm nhanh
+    
+    Kết quả được nhận khi confidence trung bình theo từ >= min_confidence và (nếu require_fields)
+    receipt_parser tìm đủ số tiền / ngày / giờ; ngược lại chạy pass đầy đủ (vie+eng, độ phân giải
+    đầy đủ, bố cục tự động).
+    
+    Args:
+        language: ngôn ngữ của pass nhanh (vd. 'vie' thay vì 'vie+eng')
+        scale: tỉ lệ ảnh (0-1]
+        psm: page segmentation mode (6 = một khối văn bản, bỏ qua phân tích bố cục)
+        min_confidence: ngưỡng confidence trung bình theo từ (0-100)
+        require_fields: bắt buộc đủ REQUIRED_FIELDS của receipt_parser
+    """
+    
+    def __init__(self, language='vie', scale=0.75, psm=6, min_confidence=80.0, require_fields=True):
+        self.language = language
+        self.scale = min(1.0, max(0.1, float(scale)))
+        self.psm = int(psm) if psm is not None else None
+        self.min_confidence = float(min_confidence)
+        self.require_fields = require_fields
+    
+    @classmethod
+    def from_config(cls, config):
+        """Tạo từ app config (OCR_FAST_*); None nếu OCR_TIERED_ENABLED tắt"""
+        if not config.get('OCR_TIERED_ENABLED', False):
+            return None
+        return cls(
+            language=config.get('OCR_FAST_LANGUAGE', 'vie'),
+            scale=config.get('OCR_FAST_SCALE', 0.75),
+            psm=config.get('OCR_FAST_PSM', 6),
+            min_confidence=config.get('OCR_FAST_MIN_CONFIDENCE', 80.0),
+            require_fields=config.get('OCR_FAST_REQUIRE_FIELDS', True)
+        )
+    
+    def run(self, engine, image, timeout=0):
+        """
+        Returns:
+            tuple: (ocr_data, accepted, report {language, scale, psm, confidence, missing, ms})
+        """
+        start = time.perf_counter()
+        small = image
+        if self.scale < 1.0:
+            small = image.resize((max(1, round(image.width * self.scale)), max(1, round(image.height * self.scale))),
+                                 Image.LANCZOS)
+        ocr_data = engine.image_to_data(small, self.language, timeout=timeout, psm=self.psm)
+        confidence = OCRService.word_confidence(ocr_data)
+        missing = parse_receipt(OCRService.text_from_ocr_data(ocr_data))['missing'] if self.require_fields else []
+        accepted = confidence >= self.min_confidence and not missing
+        return ocr_data, accepted, {
+            'language': self.language,
+            'scale': self.scale,
+            'psm': self.psm,
+            'confidence': round(confidence, 2),
+            'missing': missing,
+            'accepted': accepted,
+            'ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+
+class OCRService:
+    """Service class for OCR operations using Tesseract"""
+    
+    # Tesseract path configuration (update this based on your system)
+    # For Windows: pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+    # For Linux/Mac: usually in PATH, no need to set
+    
+    # Tìm tesseract một lần cho cả process (lúc import), không lặp lại mỗi request
+    _tesseract_configured = False
+    
+    # Engine đã tạo theo tên - dùng chung cho mọi request của process
+    _engines = {}
+    _engines_lock = threading.Lock()
+    
+    @classmethod
+    def _configure_tesseract(cls):
+        """Configure Tesseract path if needed (cached after the first call)"""
+        if cls._tesseract_configured:
+            return
+        cls._tesseract_configured = True
+        
+        import platform
+        import os
+        
+        if platform.system() == 'Windows':
+            # Try common installation paths
+            possible_paths = [
+                r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+                r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+                r'C:\Tesseract-OCR\tesseract.exe',
+            ]
+            
+            # Check if tesseract is in PATH first
+            import shutil
+            tesseract_in_path = shutil.which('tesseract')
+            
+            if tesseract_in_path:
+                pytesseract.pytesseract.tesseract_cmd = tesseract_in_path
+            else:
+                # Try common paths
+                for path in possible_paths:
+                    if os.path.exists(path):
+                        pytesseract.pytesseract.tesseract_cmd = path
+                        break
+    
+    @classmethod
+    def get_engine(cls, name=None):
+        """
+        OCREngine theo tên (None = OCR_ENGINE trong app config, mặc định pytesseract)
+        
+        Engine không tạo được (vd. chưa cài tesserocr) → cảnh báo một lần, dùng pytesseract.
+        """
+        if not name and has_app_context():
+            name = current_app.config.get('OCR_ENGINE', 'pytesseract')
+        name = (name or 'pytesseract').strip().lower()
+        if name not in OCR_ENGINES:
+            raise ValueError(f"Invalid OCR engine '{name}'. Must be one of: {', '.join(OCR_ENGINES)}")
+        
+        engine = cls._engines.get(name)
+        if engine is not None:
+            return engine
+        with cls._engines_lock:
+            engine = cls._engines.get(name)
+            if engine is None:
+                try:
+                    engine = OCR_ENGINES[name]()
+                except ImportError as e:
+                    print(f"⚠️  OCR engine '{name}' unavailable ({e}) - falling back to pytesseract")
+                    engine = PytesseractEngine()
+                cls._engines[name] = engine
+        return engine
+    
+    @classmethod
+    def _reset_engines_after_fork(cls):
+        # Process con (OCR pool / gunicorn) tự khởi tạo lại libtesseract
+        cls._engines = {}
+        cls._engines_lock = threading.Lock()
+    
+    @staticmethod
+    def current_preprocessor():
+        """ImagePreprocessor theo app config (mặc định nếu ngoài app context / đã tắt)"""
+        if not has_app_context():
+            return ImagePreprocessor()
+        config = current_app.config
+        if not config.get('OCR_PREPROCESS_ENABLED', True):
+            # Như trước: chỉ giải mã + RGB
+            return ImagePreprocessor(max_height=0, target_dpi=0, draft=False, exif=False, grayscale=False)
+        return ImagePreprocessor.from_config(config)
+    
+    @staticmethod
+    def current_roi_scale():
+        """Tỉ lệ pass thô của ROI OCR theo app config (0 = tắt ROI, OCR toàn ảnh)"""
+        if not has_app_context() or not current_app.config.get('OCR_ROI_ENABLED', False):
+            return 0
+        return current_app.config.get('OCR_ROI_COARSE_SCALE', 0.5)
+    
+    @staticmethod
+    def current_fast_pass():
+        """FastOCRPass theo app config (None = tắt OCR nhiều tầng)"""
+        return FastOCRPass.from_config(current_app.config) if has_app_context() else None
+    
+    @classmethod
+    def extract_text_from_image(cls, image_data, language='vie+eng', preprocessor=None, timeout=0, engine=None,
+                                roi_scale=None, fast_pass=None):
+        """
+        Extract text from image using Tesseract OCR
+        
+        Args:
+            image_data (bytes): Image binary data
+            language (str): Language code for OCR (default: 'vie+eng' for Vietnamese and English)
+                           Options: 'eng', 'vie', 'vie+eng', 'chi_sim', 'jpn', etc.
+            preprocessor (ImagePreprocessor): optional - mặc định theo app config
+                           (process con của OCR pool không có app context nên truyền vào)
+            timeout (float): giây; tesseract bị kill khi chạy quá (0 = không giới hạn)
+            engine (str): pytesseract | tesserocr (mặc định OCR_ENGINE trong app config)
+            roi_scale (float): > 0 → ROI OCR (pass thô ở tỉ lệ này + OCR lại vùng số tiền / ngày giờ),
+                           0 = OCR toàn ảnh (mặc định theo OCR_ROI_ENABLED / OCR_ROI_COARSE_SCALE)
+            fast_pass (FastOCRPass): tầng nhanh chạy trước; False = tắt (mặc định theo OCR_TIERED_ENABLED)
+            
+        Returns:
+            dict: Extraction result with text and metadata
+        """
+        start_time = time.time()
+        
+        try:
+            # Configure Tesseract
+            cls._configure_tesseract()
+            
+            # Decode + preprocess (draft decode, EXIF, downscale, grayscale, ...)
+            image, preprocessing = (preprocessor or cls.current_preprocessor()).process(image_data)
+            
+            # Perform OCR ONCE: image_to_data gives both words (→ text) and confidence
+            ocr_engine = cls.get_engine(engine)
+            fast_pass = cls.current_fast_pass() if fast_pass is None else fast_pass
+            ocr_data = roi_report = fast_report = None
+            tier = 'full'
+            
+            # Tầng 1: pass nhanh; chỉ chạy pass đầy đủ khi confidence / trường trích xuất không đạt
+            if fast_pass:
+                fast_data, accepted, fast_report = fast_pass.run(ocr_engine, image, timeout=timeout)
+                if accepted:
+                    ocr_data, tier = fast_data, 'fast'
+            
+            # Tầng 2: vie+eng độ phân giải đầy đủ (hoặc ROI OCR nếu bật)
+            if ocr_data is None:
+                full_start = time.perf_counter()
+                roi_scale = cls.current_roi_scale() if roi_scale is None else roi_scale
+                if roi_scale:
+                    ocr_data, roi_report = roi_ocr(ocr_engine, image, language, coarse_scale=roi_scale,
+                                                   timeout=timeout)
+                if ocr_data is None:
+                    ocr_data = ocr_engine.image_to_data(image, language, timeout=timeout)
+                full_ms = round((time.perf_counter() - full_start) * 1000, 2)
+            
+            # Extract text (same layout as image_to_string, without a second tesseract run)
+            text = cls.text_from_ocr_data(ocr_data)
+            
+            # Calculate average confidence
+            avg_confidence = cls.average_confidence(ocr_data)
+            
+            # Processing time
+            processing_time = time.time() - start_time
+            
+            # Clean text
+            text = text.strip()
+            
+            return {
+                'success': True,
+                'text': text,
+                'confidence': round(avg_confidence, 2),
+                'language': language,
+                'processing_time': round(processing_time, 2),
+                'word_count': len(text.split()),
+                'char_count': len(text),
+                'image_size': preprocessing['original_size'],
+                'preprocessing': preprocessing,
+                'engine': ocr_engine.name,
+                'roi': roi_report,
+                'tier': tier,
+                'tiers': {
+                    'fast': fast_report,
+                    'full': {'ms': full_ms} if tier == 'full' else None
+                }
+            }
+            
+        except FileNotFoundError as e:
+            raise ValueError(
+                "Tesseract OCR not found. Please install Tesseract:\n"
+                "Windows: https://github.com/UB-Mannheim/tesseract/wiki\n"
+                "Linux: sudo apt-get install tesseract-ocr tesseract-ocr-vie\n"
+                "Mac: brew install tesseract tesseract-lang"
+            )
+        except Exception as e:
+            raise ValueError(f"OCR extraction failed: {str(e)}")
+    
+    @staticmethod
+    def text_from_ocr_data(ocr_data):
+        """
+        Dựng lại text từ output image_to_data theo cấu trúc block/paragraph/line
+        
+        Cùng bố cục với image_to_string: các từ trong một dòng cách nhau một dấu cách,
+        các dòng cách nhau '\n', các đoạn (paragraph/block) cách nhau một dòng trống.
+        
+        Args:
+            ocr_data (dict): Output của pytesseract.image_to_data(output_type=DICT)
+            
+        Returns:
+            str: Text (đã strip)
+        """
+        paragraphs = []
+        paragraph_key = line_key = None
+        for i, word in enumerate(ocr_data['text']):
+            # level 5 = word; các level 1-4 (page/block/par/line) không mang text
+            if ocr_data['level'][i] != 5 or not word or not str(word).strip():
+                continue
+            key = (ocr_data['page_num'][i], ocr_data['block_num'][i], ocr_data['par_num'][i])
+            if key != paragraph_key:
+                paragraphs.append([])
+                paragraph_key, line_key = key, None
+            if ocr_data['line_num'][i] != line_key:
+                paragraphs[-1].append([])
+                line_key = ocr_data['line_num'][i]
+            paragraphs[-1][-1].append(str(word))
+        
+        return '\n\n'.join(
+            '\n'.join(' '.join(words) for words in lines) for lines in paragraphs
+        ).strip()
+    
+    @staticmethod
+    def average_confidence(ocr_data):
+        """Confidence trung bình trên các dòng của image_to_data (như trước đây)"""
+        confidences = [int(conf) for conf in ocr_data['conf'] if conf != '-1']
+        return sum(confidences) / len(confidences) if confidences else 0
+    
+    @staticmethod
+    def word_confidence(ocr_data):
+        """
+        Confidence trung bình chỉ trên các từ có text (level 5, conf >= 0)
+        
+        average_confidence giữ nguyên cách tính cũ (tính cả các dòng page/block/line với conf -1,
+        vì pytesseract trả conf dạng int) nên thấp hơn thực tế; ngưỡng của tầng nhanh dùng hàm này.
+        """
+        confidences = [
+            float(conf) for level, conf, word in zip(ocr_data['level'], ocr_data['conf'], ocr_data['text'])
+            if level == 5 and str(word).strip() and float(conf) >= 0
+        ]
+        return sum(confidences) / len(confidences) if confidences else 0.0
+    
+    @classmethod
+    def extract_structured_data(cls, image_data, language='vie+eng'):
+        """
+        Extract structured data from image (words, bounding boxes, confidence)
+        
+        Args:
+            image_data (bytes): Image binary data
+            language (str): Language code for OCR
+            
+        Returns:
+            dict: Structured OCR data with word-level information
+        """
+        start_time = time.time()
+        
+        try:
+            cls._configure_tesseract()
+            
+            image = Image.open(io.BytesIO(image_data))
+            
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            
+            # Get detailed OCR data
+            ocr_data = cls.get_engine().image_to_data(image, language)
+            
+            # Parse structured data
+            words = []
+            for i in range(len(ocr_data['text'])):
+                if int(ocr_data['conf'][i]) > 0:  # Only include confident detections
+                    words.append({
+                        'text': ocr_data['text'][i],
+                        'confidence': int(ocr_data['conf'][i]),
+                        'bounding_box': {
+                            'x': ocr_data['left'][i],
+                            'y': ocr_data['top'][i],
+                            'width': ocr_data['width'][i],
+                            'height': ocr_data['height'][i]
+                        },
+                        'block_num': ocr_data['block_num'][i],
+                        'line_num': ocr_data['line_num'][i],
+                        'word_num': ocr_data['word_num'][i]
+                    })
+            
+            processing_time = time.time() - start_time
+            
+            # Full text
+            full_text = ' '.join([w['text'] for w in words])
+            
+            return {
+                'success': True,
+                'full_text': full_text,
+                'words': words,
+                'total_words': len(words),
+                'language': language,
+                'processing_time': round(processing_time, 2)
+            }
+            
+        except Exception as e:
+            raise ValueError(f"Structured OCR extraction failed: {str(e)}")
+
+
+# Tesseract discovery at startup (cached on the class)
+OCRService._configure_tesseract()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=OCRService._reset_engines_after_fork)
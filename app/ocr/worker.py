@@ -0,0 +1,14 @@
+"""
+Entry point của process con trong OCR pool
+
+Process spawn/forkserver import lại module chứa hàm được submit; module này chỉ phụ thuộc
+app.ocr.services nên process con không import blueprint preprocess, openai hay model.
+"""
+from typing import Dict
+
+from app.ocr.services import OCRService
+
+
+def ocr_task(image_data: bytes, language: str, options: Dict) -> Dict:
+    """Chạy trong process con (không có app context): các tùy chọn OCR truyền từ cha"""
+    return OCRService.extract_text_from_image(image_data, language, **options)
@@ -0,0 +1,3 @@
+"""
+Utilities dùng chung giữa các blueprint (không import blueprint nào)
+"""
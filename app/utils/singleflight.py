@@ -0,0 +1,64 @@
+"""
+Single-flight - Gộp các lời gọi giống hệt nhau đang chạy đồng thời thành MỘT lời gọi
+
+Cache chỉ có tác dụng sau khi lời gọi đầu tiên xong: trong một đợt burst, N request giống
+nhau cùng miss cache và cùng gọi LLM. Với SingleFlight, request đầu tiên theo key (leader)
+thực thi, các request khác cùng key chờ trên cùng Future và nhận chung kết quả hoặc lỗi.
+Key được giải phóng ngay khi leader xong, nên lỗi không bị "nhớ" cho lần gọi sau.
+"""
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, TypeVar
+import threading
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """Bảng {key → Future} của các lời gọi đang chạy (thread-safe)"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: float = None) -> T:
+        """
+        Chạy fn() một lần cho mỗi key đang in-flight
+
+        Returns:
+            Kết quả của fn() (chung cho mọi caller cùng key)
+
+        Raises:
+            Lỗi do fn() ném ra (cho mọi caller cùng key)
+            concurrent.futures.TimeoutError: follower chờ quá `timeout` giây
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(timeout)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {'in_flight': in_flight, 'executed': self.executed, 'coalesced': self.coalesced}
@@ -0,0 +1,355 @@
+"""
+BENCHMARK SCRIPT - So sánh hiệu năng các đường chấm điểm / OCR
+
+Usage:
+    python benchmark.py engines     → sklearn wrapper vs Booster.inplace_predict (1, 100, 10k dòng)
+    python benchmark.py ocr         → 1 lần image_to_data vs image_to_data + image_to_string
+                                      (parity text trên bộ biên lai tổng hợp; cần tesseract)
+    python benchmark.py ocr_engines → pytesseract (subprocess mỗi lần) vs tesserocr (in-process)
+                                      trên cùng bộ biên lai; OCR_BENCH_LANG=eng nếu thiếu vie
+    python benchmark.py roi_ocr     → OCR toàn ảnh vs ROI OCR (độ đúng số tiền / giờ / thứ, thời gian,
+                                      số pixel đã OCR); OCR_ENGINE=tesserocr để dùng engine in-process
+    python benchmark.py tiered_ocr  → chỉ pass đầy đủ vs pass nhanh + fallback theo confidence
+                                      (hit rate của tầng nhanh, thời gian từng tầng, độ đúng các trường)
+
+Chạy từ thư mục gốc project (cần models/*.pkl như khi chạy server).
+"""
+
+import sys
+import time
+import random
+import numpy as np
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _random_transactions(n: int, seed: int = 42):
+    from app.blueprints.model.fraud_detector import CATEGORY_VN_TO_EN, PROVINCE_POPULATION
+    rng = random.Random(seed)
+    categories = list(CATEGORY_VN_TO_EN.keys())
+    cities = list(PROVINCE_POPULATION.keys())
+    return [
+        {
+            'amt': rng.choice([rng.uniform(10000, 50000000), 500000]),
+            'gender': rng.choice(['Nam', 'Nữ']),
+            'category': rng.choice(categories),
+            'transaction_hour': rng.randint(0, 23),
+            'transaction_day': rng.randint(0, 6),
+            'age': rng.randint(18, 100),
+            'city': rng.choice(cities),
+            'transaction_month': rng.randint(1, 12)
+        }
+        for _ in range(n)
+    ]
+
+
+# Phông có dấu tiếng Việt thường gặp (dùng phông đầu tiên tồn tại)
+_RECEIPT_FONTS = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/Library/Fonts/Arial Unicode.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+)
+
+
+def _synthetic_receipts(n: int, seed: int = 7, scale: int = 1, with_fields: bool = False):
+    """
+    Ảnh biên lai chuyển khoản tổng hợp (PNG bytes) theo bố cục các app ngân hàng
+
+    scale: phóng to canvas + font (2-3 ~ ảnh chụp màn hình điện thoại)
+    with_fields: trả về (bytes, {amt, transaction_time, transaction_day}) thay vì bytes
+    """
+    import io
+    import os
+    from datetime import date
+    from PIL import Image, ImageDraw, ImageFont
+
+    font_path = next((p for p in _RECEIPT_FONTS if os.path.exists(p)), None)
+    font = ImageFont.truetype(font_path, 26 * scale) if font_path else ImageFont.load_default()
+    rng = random.Random(seed)
+    banks = ['Vietcombank', 'Techcombank', 'MB Bank', 'BIDV', 'MoMo', 'VPBank']
+    names = ['NGUYEN VAN AN', 'TRAN THI BINH', 'LE HOANG NAM', 'PHAM THU HA']
+    notes = ['Chuyển tiền ăn trưa', 'Thanh toán hóa đơn', 'Khách sạn Đà Nẵng', 'Mua xăng', 'Trả nợ']
+
+    images = []
+    for _ in range(n):
+        amount = rng.randint(1, 500) * 10000
+        clock = f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+        day = date(2024, rng.randint(1, 12), rng.randint(1, 28))
+        blocks = [
+            [rng.choice(banks), 'Giao dịch thành công'],
+            [f"Số tiền: {amount:,} VND".replace(',', '.'),
+             f"Thời gian: {clock} {day:%d/%m/%Y}"],
+            [f"Người nhận: {rng.choice(names)}", f"Nội dung: {rng.choice(notes)}"],
+        ]
+        image = Image.new('RGB', (720 * scale, (120 + 150 * len(blocks)) * scale), 'white')
+        draw = ImageDraw.Draw(image)
+        y = 40 * scale
+        for block in blocks:
+            for line in block:
+                draw.text((40 * scale, y), line, fill='black', font=font)
+                y += 40 * scale
+            y += 70 * scale
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        fields = {'amt': amount, 'transaction_time': clock, 'transaction_day': day.weekday()}
+        images.append((buffer.getvalue(), fields) if with_fields else buffer.getvalue())
+    return images
+
+
+def _timeit(fn, repeat: int):
+    """Trả về thời gian trung bình (giây) mỗi lần gọi, sau 1 lần warm-up"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def _print_header(title: str):
+    print("\n" + "=" * 70)
+    print(f" {title} ")
+    print("=" * 70)
+
+
+# ============================================================================
+# BENCHMARKS
+# ============================================================================
+
+def bench_engines(sizes=(1, 100, 10000)):
+    """So sánh engine 'sklearn' và 'booster' trên cùng ma trận đã preprocess"""
+    from app.blueprints.model.fraud_detector import fraud_detector
+
+    _print_header("SCORING ENGINES: sklearn wrapper vs Booster.inplace_predict")
+    original_engine = fraud_detector.engine
+
+    print(f"\n  {'rows':>7s} | {'engine':8s} | {'score only':>12s} | {'end-to-end':>12s} | {'per row':>10s}")
+    print("  " + "-" * 62)
+
+    for n in sizes:
+        transactions = _random_transactions(n)
+        columns, _, _ = fraud_detector.normalize_batch(transactions)
+        if fraud_detector._plan is not None:
+            features = fraud_detector._plan.transform(fraud_detector._batch_model_inputs(columns))
+        else:
+            _, features = fraud_detector.transform_features(fraud_detector._batch_dataframe(columns))
+
+        repeat = max(3, min(500, 20000 // n))
+        outputs = {}
+        for engine in fraud_detector.ENGINES:
+            fraud_detector.set_engine(engine)
+            score_time = _timeit(lambda: fraud_detector.score_features(features), repeat)
+            if n == 1:
+                total_time = _timeit(lambda: fraud_detector.predict(**transactions[0]), repeat)
+            else:
+                total_time = _timeit(lambda: fraud_detector.predict_batch(transactions), max(3, repeat // 10))
+            outputs[engine] = fraud_detector.score_features(features)['probabilities'][:, 1]
+            print(f"  {n:7d} | {engine:8s} | {score_time * 1e3:9.3f} ms | {total_time * 1e3:9.3f} ms | "
+                  f"{total_time / n * 1e6:7.1f} us")
+
+        max_diff = float(np.max(np.abs(outputs['sklearn'] - outputs['booster'])))
+        print(f"  {'':7s}   max |p_sklearn - p_booster| = {max_diff:.3g}")
+
+    fraud_detector.set_engine(original_engine)
+
+
+def bench_ocr(n_images: int = 20, language: str = 'vie+eng'):
+    """Parity + thời gian: một lần image_to_data so với image_to_data + image_to_string"""
+    import io
+    import shutil
+    import pytesseract
+    from PIL import Image
+    from app.ocr.services import OCRService
+
+    _print_header("OCR: single image_to_data vs image_to_data + image_to_string")
+    if not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+        print("  ⚠️  Tesseract not found - install tesseract-ocr (+ tesseract-ocr-vie) to run this benchmark")
+        return
+
+    images = [Image.open(io.BytesIO(data)).convert('RGB') for data in _synthetic_receipts(n_images)]
+
+    def two_calls(image):
+        ocr_data = pytesseract.image_to_data(image, lang=language, output_type=pytesseract.Output.DICT)
+        return pytesseract.image_to_string(image, lang=language).strip(), OCRService.average_confidence(ocr_data)
+
+    def one_call(image):
+        ocr_data = pytesseract.image_to_data(image, lang=language, output_type=pytesseract.Output.DICT)
+        return OCRService.text_from_ocr_data(ocr_data), OCRService.average_confidence(ocr_data)
+
+    exact = whitespace_only = 0
+    old_total = new_total = 0.0
+    for i, image in enumerate(images):
+        start = time.perf_counter()
+        old_text, old_conf = two_calls(image)
+        old_total += time.perf_counter() - start
+
+        start = time.perf_counter()
+        new_text, new_conf = one_call(image)
+        new_total += time.perf_counter() - start
+
+        if new_text == old_text:
+            exact += 1
+        elif new_text.split() == old_text.split():
+            whitespace_only += 1
+        else:
+            print(f"\n  ❌ Image {i}: text differs\n  --- image_to_string ---\n{old_text}\n  --- image_to_data ---\n{new_text}")
+        if old_conf != new_conf:
+            print(f"  ❌ Image {i}: confidence differs ({old_conf} vs {new_conf})")
+
+    print(f"\n  Images:                 {n_images}")
+    print(f"  Exact text parity:      {exact}/{n_images}")
+    print(f"  Whitespace-only diffs:  {whitespace_only}/{n_images}")
+    print(f"  image_to_data + string: {old_total / n_images * 1e3:8.1f} ms / image")
+    print(f"  image_to_data only:     {new_total / n_images * 1e3:8.1f} ms / image "
+          f"({old_total / max(new_total, 1e-9):.2f}x)")
+
+
+def bench_ocr_engines(n_images: int = 20, language: str = None):
+    """Thời gian / ảnh + parity text giữa các OCREngine (cùng ảnh đã tiền xử lý)"""
+    import io
+    import os
+    import shutil
+    import pytesseract
+    from app.ocr.services import OCRService, OCR_ENGINES, ImagePreprocessor
+
+    language = language or os.environ.get('OCR_BENCH_LANG', 'vie+eng')
+    _print_header(f"OCR ENGINES: {' vs '.join(OCR_ENGINES)} ({language})")
+
+    engines = {}
+    for name, engine_class in OCR_ENGINES.items():
+        if name == 'pytesseract' and not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+            print("  ⚠️  Tesseract not found - skipping pytesseract")
+            continue
+        try:
+            engines[name] = engine_class()
+        except ImportError as e:
+            print(f"  ⚠️  {name} unavailable ({e}) - skipping")
+    if not engines:
+        return
+
+    preprocessor = ImagePreprocessor()
+    images = [preprocessor.process(data)[0] for data in _synthetic_receipts(n_images)]
+
+    texts = {}
+    print(f"\n  {'engine':12s} | {'first call':>11s} | {'per image':>10s} | {'words':>6s}")
+    print("  " + "-" * 50)
+    for name, engine in engines.items():
+        start = time.perf_counter()
+        engine.image_to_data(images[0], language)
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        texts[name] = [OCRService.text_from_ocr_data(engine.image_to_data(image, language)) for image in images]
+        per_image = (time.perf_counter() - start) / n_images
+        words = sum(len(text.split()) for text in texts[name])
+        print(f"  {name:12s} | {first * 1e3:8.1f} ms | {per_image * 1e3:7.1f} ms | {words:6d}")
+
+    if len(texts) > 1:
+        baseline, *others = texts
+        for name in others:
+            same = sum(a == b for a, b in zip(texts[baseline], texts[name]))
+            print(f"\n  Text parity {baseline} vs {name}: {same}/{n_images}")
+
+
+def bench_roi_ocr(n_images: int = 20, language: str = None, scale: int = 2):
+    """OCR toàn ảnh vs ROI OCR: độ đúng số tiền / giờ / thứ sau receipt_parser, thời gian, số pixel"""
+    import os
+    import shutil
+    import pytesseract
+    from app.ocr.services import OCRService
+    from app.ocr.receipt_parser import parse_receipt
+
+    language = language or os.environ.get('OCR_BENCH_LANG', 'vie+eng')
+    engine = OCRService.get_engine(os.environ.get('OCR_ENGINE'))
+    _print_header(f"ROI OCR: full image vs coarse pass + value regions ({engine.name}, {language})")
+    if engine.name == 'pytesseract' and not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+        print("  ⚠️  Tesseract not found - install tesseract-ocr (+ tesseract-ocr-vie) to run this benchmark")
+        return
+
+    receipts = _synthetic_receipts(n_images, scale=scale, with_fields=True)
+    print(f"\n  {'mode':10s} | {'per image':>10s} | {'pixels':>7s} | {'amt':>6s} | {'time':>6s} | {'day':>6s} | fallback")
+    print("  " + "-" * 66)
+    for mode, roi_scale in (('full', 0), ('roi 0.5', 0.5), ('roi 0.35', 0.35)):
+        correct = {'amt': 0, 'transaction_time': 0, 'transaction_day': 0}
+        total_time = pixels = 0.0
+        fallbacks = 0
+        for data, fields in receipts:
+            start = time.perf_counter()
+            result = OCRService.extract_text_from_image(data, language, engine=engine.name, roi_scale=roi_scale)
+            total_time += time.perf_counter() - start
+            roi = result.get('roi') or {}
+            fallbacks += bool(roi.get('fallback'))
+            pixels += roi.get('pixels_ratio', 1.0) + (1.0 if roi.get('fallback') else 0.0)
+            parsed = parse_receipt(result['text'])['data']
+            for field in correct:
+                correct[field] += parsed[field] == fields[field]
+        print(f"  {mode:10s} | {total_time / n_images * 1e3:7.1f} ms | {pixels / n_images:6.2f}x | "
+              f"{correct['amt']:3d}/{n_images:<2d} | {correct['transaction_time']:3d}/{n_images:<2d} | "
+              f"{correct['transaction_day']:3d}/{n_images:<2d} | {fallbacks}")
+
+
+def bench_tiered_ocr(n_images: int = 20, language: str = None, scale: int = 2):
+    """Chỉ pass đầy đủ vs OCR nhiều tầng ở vài ngưỡng confidence: hit rate, thời gian, độ đúng trường"""
+    import os
+    import shutil
+    import pytesseract
+    from app.ocr.services import OCRService, FastOCRPass
+    from app.ocr.receipt_parser import parse_receipt
+
+    language = language or os.environ.get('OCR_BENCH_LANG', 'vie+eng')
+    fast_language = os.environ.get('OCR_BENCH_FAST_LANG', language.split('+')[0])
+    engine = OCRService.get_engine(os.environ.get('OCR_ENGINE'))
+    _print_header(f"Tiered OCR: full pass vs fast pass ({fast_language}) + fallback ({engine.name}, {language})")
+    if engine.name == 'pytesseract' and not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+        print("  ⚠️  Tesseract not found - install tesseract-ocr (+ tesseract-ocr-vie) to run this benchmark")
+        return
+
+    receipts = _synthetic_receipts(n_images, scale=scale, with_fields=True)
+    modes = [('full only', False)] + [
+        (f"tiered >={threshold:g}", FastOCRPass(language=fast_language, min_confidence=threshold))
+        for threshold in (70, 80, 90)
+    ]
+    print(f"\n  {'mode':12s} | {'per image':>10s} | {'fast hit':>8s} | {'fast avg':>9s} | {'full avg':>9s} | "
+          f"{'amt':>6s} | {'time':>6s} | {'day':>6s}")
+    print("  " + "-" * 86)
+    for mode, fast_pass in modes:
+        correct = {'amt': 0, 'transaction_time': 0, 'transaction_day': 0}
+        total_time = 0.0
+        tier_ms = {'fast': [], 'full': []}
+        hits = 0
+        for data, fields in receipts:
+            start = time.perf_counter()
+            result = OCRService.extract_text_from_image(data, language, engine=engine.name, roi_scale=0,
+                                                        fast_pass=fast_pass)
+            total_time += time.perf_counter() - start
+            hits += result['tier'] == 'fast'
+            for name, report in result['tiers'].items():
+                if report:
+                    tier_ms[name].append(report['ms'])
+            parsed = parse_receipt(result['text'])['data']
+            for field in correct:
+                correct[field] += parsed[field] == fields[field]
+        avg = {name: (f"{sum(ms) / len(ms):6.1f} ms" if ms else '      -  ') for name, ms in tier_ms.items()}
+        hit_rate = f"{hits / n_images:7.0%}" if fast_pass else '      -'
+        print(f"  {mode:12s} | {total_time / n_images * 1e3:7.1f} ms | {hit_rate:>8s} | {avg['fast']:>9s} | "
+              f"{avg['full']:>9s} | {correct['amt']:3d}/{n_images:<2d} | {correct['transaction_time']:3d}/{n_images:<2d} | "
+              f"{correct['transaction_day']:3d}/{n_images:<2d}")
+
+
+BENCHMARKS = {
+    'engines': bench_engines,
+    'ocr': bench_ocr,
+    'ocr_engines': bench_ocr_engines,
+    'roi_ocr': bench_roi_ocr,
+    'tiered_ocr': bench_tiered_ocr,
+}
+
+
+if __name__ == "__main__":
+    name = sys.argv[1].lower() if len(sys.argv) > 1 else 'engines'
+    if name not in BENCHMARKS:
+        print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+    BENCHMARKS[name]()
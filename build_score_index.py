@@ -0,0 +1,96 @@
+"""
+BUILD SCORE INDEX - Tạo bảng tra xác suất fraud chính xác (ScoreIndex) cho model hiện tại
+
+Usage:
+    python build_score_index.py [output.npz] [n_probes]
+
+- Liệt kê mọi tổ hợp lớp rời rạc (category, giới tính, giờ, ngày, tháng, tuổi, dân số tỉnh)
+  × bậc thang amt, chấm điểm bằng Booster và lưu dạng mảng NumPy liền (.npz)
+- In báo cáo bộ nhớ
+- Kiểm tra parity với Booster trên n_probes input ngẫu nhiên (phải khớp tuyệt đối)
+
+Server dùng index khi đặt FRAUD_SCORE_INDEX_PATH (xem .env.example).
+Chạy từ thư mục gốc project (cần models/*.pkl như khi chạy server).
+"""
+
+import sys
+import time
+import numpy as np
+
+
+def verify_parity(fraud_detector, index, n_probes: int, seed: int = 7):
+    """So sánh index với Booster.inplace_predict; trả về (hits, mismatches)"""
+    from app.blueprints.model.fraud_detector import CATEGORY_VN_TO_EN, PROVINCE_POPULATION
+
+    rng = np.random.default_rng(seed)
+    categories = list(CATEGORY_VN_TO_EN.keys()) + ['không rõ']
+    transactions = [
+        {
+            'amt': float(rng.choice([rng.uniform(1000, 5e8), rng.uniform(1000, 5e6), 500000])),
+            'gender': str(rng.choice(['Nam', 'Nữ'])),
+            'category': str(rng.choice(categories)),
+            'transaction_hour': int(rng.integers(0, 24)),
+            'transaction_day': int(rng.integers(0, 7)),
+            'age': int(rng.integers(18, 101)),
+            'city': str(rng.choice(list(PROVINCE_POPULATION.keys()) + ['khác'])),
+            'city_pop': int(rng.integers(1000, 10_000_000)) if rng.random() < 0.1 else None,
+            'transaction_month': int(rng.integers(1, 13)) if rng.random() < 0.7 else None
+        }
+        for _ in range(n_probes)
+    ]
+
+    columns, _, _ = fraud_detector.normalize_batch(transactions)
+    features = fraud_detector._plan.transform(fraud_detector._batch_model_inputs(columns))
+
+    expected = np.asarray(fraud_detector._booster.inplace_predict(
+        np.ascontiguousarray(features, dtype=np.float32),
+        iteration_range=fraud_detector._iteration_range,
+        validate_features=False
+    ), dtype=np.float32).reshape(-1)
+    actual, hit = index.lookup(features)
+
+    mismatches = int(np.count_nonzero(hit & (actual != expected)))
+    return int(np.count_nonzero(hit)), mismatches
+
+
+def main():
+    from app.blueprints.model.fraud_detector import fraud_detector
+
+    output = sys.argv[1] if len(sys.argv) > 1 else 'models/score_index.npz'
+    n_probes = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    if fraud_detector._plan is None:
+        print("❌ Inference plan unavailable - cannot build score index")
+        sys.exit(1)
+
+    print("\n" + "=" * 70)
+    print(" BUILD SCORE INDEX ")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    index = fraud_detector.build_score_index()
+    print(f"\n✅ Built in {time.perf_counter() - start:.1f}s")
+
+    report = index.memory_report()
+    print(f"\n📊 Memory report:")
+    print(f"  Combos:              {report['n_combos']:,}")
+    print(f"  Classes / dimension: {report['classes_per_dimension']}")
+    print(f"  Breakpoints:         {report['n_breakpoints']:,} "
+          f"(avg {report['avg_breakpoints_per_combo']} / combo)")
+    for name, nbytes in report['bytes_by_array'].items():
+        print(f"    {name:22s} {nbytes:>14,} bytes")
+    print(f"  Total:               {report['total_mb']} MB")
+
+    hits, mismatches = verify_parity(fraud_detector, index, n_probes)
+    print(f"\n🔍 Parity vs Booster on {n_probes:,} random inputs: "
+          f"{hits:,} index hits, {n_probes - hits:,} fallbacks, {mismatches} mismatches")
+    if mismatches:
+        print("❌ Index does not match the booster - not saved")
+        sys.exit(1)
+
+    index.save(output)
+    print(f"\n💾 Saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -67,13 +67,13 @@ class DateFeatureExtractor(BaseEstimator, TransformerMixin):
         return self
     
     def transform(self, X):
-        X = X.copy()
-        X['trans_date_trans_time'] = pd.to_datetime(X['trans_date_trans_time'])
-        X['dob'] = pd.to_datetime(X['dob'])
-        X['transaction_hour'] = X['trans_date_trans_time'].dt.hour
-        X['transaction_day'] = X['trans_date_trans_time'].dt.dayofweek
-        X['transaction_month'] = X['trans_date_trans_time'].dt.month
-        X['age'] = (X['trans_date_trans_time'] - X['dob']).dt.days // 365
+        X = X.copy(deep=False)
+        trans_time = pd.to_datetime(X['trans_date_trans_time'])
+        dob = pd.to_datetime(X['dob'])
+        X['transaction_hour'] = trans_time.dt.hour
+        X['transaction_day'] = trans_time.dt.dayofweek
+        X['transaction_month'] = trans_time.dt.month
+        X['age'] = (trans_time - dob).dt.days // 365
         X.drop(['trans_date_trans_time', 'dob', 'unix_time'], axis=1, inplace=True, errors='ignore')
         return X
 
@@ -95,14 +95,14 @@ class CategoricalEncoder(BaseEstimator, TransformerMixin):
         return self
     
     def transform(self, X):
-        X = X.copy()
+        X = X.copy(deep=False)
         for col, le in self.label_encoders.items():
             if col in X.columns:
-                X[col] = X[col].fillna(le.classes_[0])
-                X[col] = X[col].astype(str).apply(
-                    lambda x: x if x in le.classes_ else le.classes_[0]
-                )
-                X[col] = le.transform(X[col])
+                classes = np.asarray(le.classes_, dtype=object)
+                values = X[col].fillna(classes[0]).astype(str).to_numpy(dtype=object)
+                codes = np.searchsorted(classes, values)
+                known = classes[np.minimum(codes, len(classes) - 1)] == values
+                X[col] = np.where(known, codes, 0)
         return X
 
 
@@ -120,9 +120,9 @@ class MissingValueHandler(BaseEstimator, TransformerMixin):
         return self
     
     def transform(self, X):
-        X = X.copy()
+        X = X.copy(deep=False)
         for col, fill_val in self.fill_values.items():
-            if col in X.columns:
+            if col in X.columns and X[col].isna().any():
                 X[col] = X[col].fillna(fill_val)
         return X
 
@@ -145,8 +145,19 @@ class FeatureSelector(BaseEstimator, TransformerMixin):
         if isinstance(X, pd.DataFrame):
             return X[self.selected_features_]
         else:
-            df = pd.DataFrame(X, columns=self.feature_names_)
-            return df[self.selected_features_].values
+            return np.asarray(X)[:, self._selected_positions()]
+    
+    def _selected_positions(self):
+        cached = getattr(self, '_positions_cache', None)
+        if cached is None or cached[0] is not self.feature_names_ or cached[1] is not self.selected_features_:
+            if self.feature_names_ is None:
+                positions = list(self.selected_features_)
+            else:
+                position = {name: i for i, name in enumerate(self.feature_names_)}
+                positions = [position[name] for name in self.selected_features_]
+            cached = (self.feature_names_, self.selected_features_, np.asarray(positions, dtype=np.intp))
+            self._positions_cache = cached
+        return cached[2]
 
 
 # ============================================================================
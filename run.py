@@ -27,6 +27,8 @@ Model APIs:
   POST /api/model/predict
   POST /api/model/predict-from-amount  * Fraud detection from amount
   POST /api/model/batch-predict
+  GET  /api/model/explanations/<id>
+  GET  /api/model/stats
   GET  /api/model/model-info
   POST /api/model/reload
 
@@ -34,13 +36,16 @@ OpenAI APIs:
   POST /api/openai/parse-transaction
   POST /api/openai/analyze-transaction
   POST /api/openai/explain-prediction
+  POST /api/openai/explain-prediction/stream  * SSE
   POST /api/openai/chat
+  POST /api/openai/chat/stream              * SSE
   POST /api/openai/generate-report
 
 Preprocess APIs (OCR + AI):
   POST /api/preprocess/extract-and-parse
   POST /api/preprocess/extract-text
   POST /api/preprocess/extract-text-batch
+  GET  /api/preprocess/stats
 ------------------------------------------------------------
 """
 
@@ -0,0 +1,111 @@
+"""
+Fixtures dùng chung cho test
+
+Model thật (models/*.pkl) không nằm trong repo: conftest fit một pipeline nhỏ cùng cấu trúc
+(date_features → missing_handler → categorical_encoder → scaler → feature_selector → classifier)
+trên dữ liệu tổng hợp và load vào fraud_detector singleton trước khi test nào tạo app.
+
+fraud_detector load model ngay khi import, nên trước đó đặt một model "khởi động" (chỉ có
+classifier) vào thư mục tạm; sau khi import mới fit pipeline đầy đủ bằng các transformer của repo.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+MODEL_DIR = tempfile.mkdtemp(prefix='fraud-test-')
+MODEL_PATH = os.path.join(MODEL_DIR, 'models', 'fraud_detection_fa_smoteenn.pkl')
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+
+def _bootstrap_model():
+    """Model tối thiểu để import fraud_detector (load_model đọc models/ theo thư mục hiện tại)"""
+    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+    classifier = XGBClassifier(n_estimators=2, max_depth=1).fit(np.array([[0.0], [1.0]]), [0, 1])
+    joblib.dump(Pipeline([('classifier', classifier)]), MODEL_PATH)
+    # Thư mục làm việc của test: models/ + instance/ (cache SQLite) nằm ngoài repo
+    os.chdir(MODEL_DIR)
+
+
+def _fit_test_pipeline(fd, n: int = 1500, seed: int = 0) -> Pipeline:
+    """Pipeline cùng cấu trúc model thật, fit trên giao dịch tổng hợp (fraud: số tiền lớn ban đêm)"""
+    rng = np.random.default_rng(seed)
+    times = [datetime(2020, 1, 1) + timedelta(hours=int(h)) for h in rng.integers(0, 24 * 365, n)]
+    frame = pd.DataFrame({
+        'cc_num': rng.integers(10**15, 9 * 10**15, n),
+        'merchant': rng.choice(['fraud_Kirlin and Sons', 'fraud_A', 'fraud_B'], n),
+        'category': rng.choice(sorted(set(fd.CATEGORY_VN_TO_EN.values())), n),
+        'amt': rng.gamma(2, 60, n),
+        'first': rng.choice(['John', 'Ann'], n),
+        'last': rng.choice(['Doe', 'Smith'], n),
+        'gender': rng.choice(['M', 'F'], n),
+        'street': rng.choice(['Main St', 'Oak'], n),
+        'city': rng.choice(['Houston', 'Austin'], n),
+        'state': rng.choice(['TX', 'CA'], n),
+        'zip': rng.integers(10000, 99999, n),
+        'lat': rng.normal(30, 3, n),
+        'long': rng.normal(-95, 3, n),
+        'city_pop': rng.choice(sorted(set(fd.PROVINCE_POPULATION.values())), n),
+        'job': rng.choice(['Food service', 'Engineer'], n),
+        'merch_lat': rng.normal(30, 3, n),
+        'merch_long': rng.normal(-95, 3, n),
+        'trans_date_trans_time': times,
+        'dob': [datetime(int(y), 3, 15) for y in rng.integers(1930, 2002, n)]
+    })
+    hours = np.array([t.hour for t in times])
+    y = (((frame['amt'] > 200) & ((hours >= 22) | (hours < 4))) | (rng.random(n) < 0.03)).astype(int)
+
+    selector = fd.FeatureSelector(selected_features=[f'feature_{i}' for i in (0, 2, 3, 5, 6, 13, 14, 15, 17, 18, 20)])
+    pipeline = Pipeline([
+        ('date_features', fd.DateFeatureExtractor()),
+        ('missing_handler', fd.MissingValueHandler()),
+        ('categorical_encoder', fd.CategoricalEncoder()),
+        ('scaler', StandardScaler()),
+        ('feature_selector', selector),
+        ('classifier', XGBClassifier(n_estimators=30, max_depth=4))
+    ])
+    # Như lúc training: feature_selector nhận ndarray, tên cột là feature_0..feature_n
+    encoded = Pipeline(pipeline.steps[:3]).fit_transform(frame)
+    scaled = pipeline.named_steps['scaler'].fit_transform(encoded)
+    selector.feature_names_ = [f'feature_{i}' for i in range(scaled.shape[1])]
+    pipeline.named_steps['classifier'].fit(selector.transform(scaled), y)
+    return pipeline
+
+
+_bootstrap_model()
+
+import app.blueprints.model.fraud_detector as fraud_detector_module  # noqa: E402
+
+joblib.dump(_fit_test_pipeline(fraud_detector_module), MODEL_PATH)
+fraud_detector_module.fraud_detector.load_model()
+
+
+@pytest.fixture(scope='session')
+def fraud_detector():
+    return fraud_detector_module.fraud_detector
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
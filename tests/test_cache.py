@@ -0,0 +1,223 @@
+"""
+Cache backends: MemoryCache (LRU + TTL) và RedisCache với server RESP giả lập cục bộ
+"""
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import app.cache as cache_module
+from app.cache import MemoryCache, RedisCache, SQLiteCache, create_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_preprocess_result_cache_does_not_load_model():
+    # Process riêng: conftest đã import blueprint model trong process test
+    code = (
+        "import sys, app.blueprints.preprocess.result_cache; "
+        "print([m for m in sys.modules if m.startswith('app.blueprints.model')])"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == '[]'
+
+
+def test_memory_cache_overwrites_keep_one_expiry_record_per_key():
+    cache = MemoryCache('m', ttl_seconds=60, max_items=100_000)
+    start = time.time() - 30
+    for i in range(200_000):
+        cache._store(f'k{i % 10}', i, start + i * 1e-4)
+    assert len(cache._write_order) == len(cache._items) == 10
+    assert cache.get('k3') == 199_993
+
+
+def test_memory_cache_expires_incrementally_on_set():
+    cache = MemoryCache('m', ttl_seconds=10, max_items=100_000)
+    for i in range(1000):
+        cache._store(f'old{i}', i, 1000.0)
+
+    # Mỗi set chỉ bỏ tối đa EXPIRE_PER_CALL entry hết hạn: không quét toàn bộ dưới lock
+    cache._store('new0', 0, 1011.0)
+    assert cache.expirations == MemoryCache.EXPIRE_PER_CALL
+
+    for i in range(1, 1000 // MemoryCache.EXPIRE_PER_CALL):
+        cache._store(f'new{i}', i, 1011.0)
+    assert cache.expirations == 1000
+    assert all(key.startswith('new') for key in cache._write_order)
+    assert len(cache._write_order) == len(cache._items)
+
+
+def test_memory_cache_expires_on_reads_without_writes():
+    cache = MemoryCache('m', ttl_seconds=60, max_items=100_000)
+    for i in range(100):
+        cache._store(f'old{i}', i, time.time() - 120)
+    cache.set('live', 1)
+
+    # Cache chỉ đọc: mỗi get dọn tối đa EXPIRE_PER_CALL entry hết hạn
+    for _ in range(100 // MemoryCache.EXPIRE_PER_CALL):
+        assert cache.get('live') == 1
+    assert list(cache._items) == ['live']
+    assert cache.expirations == 100
+
+
+def test_sqlite_cache_ttl_and_prune(tmp_path):
+    cache = SQLiteCache('s', str(tmp_path / 'cache.sqlite3'), ttl_seconds=0.2, max_items=3, prune_every=1)
+    cache.set('a', {'v': 1})
+    assert cache.get('a') == {'v': 1}
+    time.sleep(0.3)
+    assert cache.get('a') is None
+
+    # prune (mỗi prune_every lần set): xóa dòng hết hạn + giữ max_items entry mới nhất
+    for key in 'bcde':
+        cache.set(key, key)
+    assert cache._size() == 3
+    assert [cache.get(key) for key in 'bcde'] == [None, 'c', 'd', 'e']
+
+
+def test_memory_cache_lru_eviction_and_lazy_expiry():
+    cache = MemoryCache('m', ttl_seconds=60, max_items=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # 'b' ít dùng nhất
+    assert cache.get('b') is None
+    assert set(cache._write_order) == {'a', 'c'}
+
+    cache._store('d', 4, time.time() - 120)
+    assert cache.get('d') is None
+    assert 'd' not in cache._write_order
+
+
+def test_warm_start_registers_one_exit_hook_per_snapshot(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(cache_module.atexit, 'register', registered.append)
+    monkeypatch.setattr(cache_module, '_SNAPSHOTS', {})
+    config = {'CACHE_WARM_START': True, 'CACHE_SNAPSHOT_DIR': str(tmp_path)}
+
+    # Như create_app() gọi nhiều lần: chỉ cache mới nhất được ghi ra file
+    caches = [create_cache('expl', config) for _ in range(3)]
+    caches[-1].set('k', 'latest')
+    assert len(registered) == 1
+    assert list(cache_module._SNAPSHOTS.values()) == [caches[-1]]
+
+    registered[0]()
+    warm = create_cache('expl', config)
+    assert warm.get('k') == 'latest'
+
+
+def test_sqlite_cache_counters_under_concurrency(tmp_path):
+    cache = SQLiteCache('s', str(tmp_path / 'cache.sqlite3'), ttl_seconds=60)
+    cache.set('hit', 1)
+
+    def reader():
+        for i in range(200):
+            cache.get('hit' if i % 2 else 'miss')
+
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (800, 800)
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Server RESP tối thiểu: PING / GET / SET key value [EX ttl]"""
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2])
+            command = args[0].upper()
+            if command == b'PING':
+                self.wfile.write(b'+PONG\r\n')
+            elif command == b'SET':
+                store[args[1]] = args[2]
+                self.wfile.write(b'+OK\r\n')
+            elif command == b'GET':
+                value = store.get(args[1])
+                self.wfile.write(b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value))
+            else:
+                self.wfile.write(b'-ERR unknown command\r\n')
+
+
+class _RespServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+@pytest.fixture
+def resp_server():
+    server = _RespServer(('127.0.0.1', 0), _RespHandler)
+    server.store = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def silent_server():
+    """Nhận kết nối (backlog) nhưng không bao giờ trả lời → mọi lệnh timeout"""
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(16)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def test_redis_cache_round_trip(resp_server):
+    port = resp_server.server_address[1]
+    cache = RedisCache('expl', f'redis://127.0.0.1:{port}/0', ttl_seconds=60)
+    assert cache.get('k') is None
+    cache.set('k', {'text': 'Giao dịch rủi ro'})
+    assert cache.get('k') == {'text': 'Giao dịch rủi ro'}
+    assert b'fraud:expl:k' in resp_server.store
+    assert cache.stats()['hits'] == 1
+
+
+def test_redis_outage_degrades_to_fast_misses(silent_server):
+    cache = RedisCache('expl', f'redis://127.0.0.1:{silent_server}/0', timeout=0.2, retry_seconds=30)
+
+    started = time.perf_counter()
+    assert cache.get('k') is None  # lần đầu: chờ timeout rồi bắt đầu tạm ngừng
+    first = time.perf_counter() - started
+    assert first >= 0.2
+
+    started = time.perf_counter()
+    for _ in range(50):
+        assert cache.get('k') is None
+        cache.set('k', 'v')
+    assert time.perf_counter() - started < 0.1
+    assert cache.errors == 1
+    assert cache.stats()['skipped'] == 100
+
+
+def test_redis_reconnects_after_retry_window(resp_server):
+    port = resp_server.server_address[1]
+    cache = RedisCache('expl', f'redis://127.0.0.1:{port}/0', retry_seconds=0.05)
+    cache.set('k', 1)
+
+    # Connection cũ hỏng: lệnh kế tiếp kết nối lại một lần và thành công, không tạm ngừng
+    cache.client._sock.shutdown(socket.SHUT_RDWR)
+    assert cache.get('k') == 1
+    assert cache.errors == 0
+
+    cache.client._down_until = time.monotonic() + 0.05
+    assert cache.get('k') is None
+    time.sleep(0.06)
+    assert cache.get('k') == 1
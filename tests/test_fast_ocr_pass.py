@@ -0,0 +1,81 @@
+"""
+FastOCRPass: nhận kết quả tầng nhanh khi đủ confidence + đủ trường (engine giả, không cần tesseract)
+"""
+import pytest
+from PIL import Image
+
+from app.ocr.services import FastOCRPass
+
+KEYS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'text', 'conf')
+
+RECEIPT_LINES = ['Vietcombank', 'Số tiền: 150.000 VND', 'Thời gian: 21:45:10 15/10/2024']
+
+
+def _ocr_data(lines, conf):
+    rows = [(1, 1, 0, 0, 0, '', -1)]
+    for n, line in enumerate(lines, start=1):
+        rows.append((4, 1, 1, 1, n, '', -1))
+        rows += [(5, 1, 1, 1, n, word, conf) for word in line.split()]
+    return {key: [row[i] for row in rows] for i, key in enumerate(KEYS)}
+
+
+class FakeEngine:
+    def __init__(self, ocr_data):
+        self.ocr_data = ocr_data
+        self.calls = []
+
+    def image_to_data(self, image, language, timeout=0, psm=None, variables=None):
+        self.calls.append({'size': image.size, 'language': language, 'psm': psm})
+        return self.ocr_data
+
+
+def _run(fast_pass, lines, conf):
+    engine = FakeEngine(_ocr_data(lines, conf))
+    ocr_data, accepted, report = fast_pass.run(engine, Image.new('L', (400, 200), 255))
+    return engine, accepted, report
+
+
+def test_confident_complete_receipt_is_accepted():
+    engine, accepted, report = _run(FastOCRPass(language='vie', scale=0.5, psm=6), RECEIPT_LINES, 93)
+
+    assert accepted is True
+    assert engine.calls == [{'size': (200, 100), 'language': 'vie', 'psm': 6}]
+    assert report['confidence'] == 93.0
+    assert report['missing'] == []
+
+
+def test_low_confidence_is_rejected():
+    # Dòng page/line conf -1 không kéo trung bình xuống; chỉ từ thật được tính
+    _, accepted, report = _run(FastOCRPass(min_confidence=80), RECEIPT_LINES, 79)
+    assert accepted is False
+    assert report['confidence'] == 79.0
+
+
+@pytest.mark.parametrize('drop, missing', [
+    (1, ['amt']),
+    (2, ['transaction_time', 'transaction_day']),
+])
+def test_missing_fields_are_rejected(drop, missing):
+    lines = [line for n, line in enumerate(RECEIPT_LINES) if n != drop]
+    _, accepted, report = _run(FastOCRPass(), lines, 95)
+    assert accepted is False
+    assert report['missing'] == missing
+
+
+def test_fields_not_required():
+    _, accepted, report = _run(FastOCRPass(require_fields=False), ['Vietcombank'], 95)
+    assert accepted is True
+    assert report['missing'] == []
+
+
+def test_empty_page_is_rejected():
+    _, accepted, report = _run(FastOCRPass(require_fields=False), [], 95)
+    assert accepted is False
+    assert report['confidence'] == 0.0
+
+
+def test_from_config():
+    assert FastOCRPass.from_config({}) is None
+    fast_pass = FastOCRPass.from_config({'OCR_TIERED_ENABLED': True, 'OCR_FAST_SCALE': 3, 'OCR_FAST_PSM': 4})
+    assert fast_pass.scale == 1.0
+    assert fast_pass.psm == 4
@@ -0,0 +1,142 @@
+"""
+Parity: InferencePlan (đường 1 dòng của /predict-fraud và đường batch) so với pipeline sklearn
+"""
+from datetime import datetime
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+
+import app.blueprints.model.fraud_detector as fd
+
+
+TRANSACTIONS = [
+    {'amt': 25000, 'gender': 'Nam', 'category': 'ăn uống', 'transaction_hour': 12,
+     'transaction_day': 2, 'age': 30, 'city': 'ha noi'},
+    {'amt': 48_000_000, 'gender': 'Nữ', 'category': 'du lịch', 'transaction_hour': 2,
+     'transaction_day': 6, 'age': 71, 'city': 'da nang', 'transaction_month': 11},
+    {'amt': 1_500_000, 'gender': 'nữ', 'category': 'không rõ', 'transaction_hour': 23,
+     'transaction_day': 0, 'age': 18, 'city': 'xyz', 'city_pop': 12345},
+    {'amt': 9_900_000, 'gender': 'Nam', 'category': 'mua sắm online', 'transaction_hour': 40,
+     'transaction_day': 9, 'age': 120, 'city': 'hcm', 'transaction_month': 0},
+]
+
+
+class _FixedDatetime(datetime):
+    """datetime.now() cố định (29/02: năm sinh không nhuận → ngày không tồn tại)"""
+    fixed = datetime(2024, 2, 29, 10, 30)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fixed
+
+
+def test_plan_compiles_and_verifies(fraud_detector):
+    assert fraud_detector._plan is not None
+    assert fraud_detector.verify_inference_plan(fraud_detector._plan, n_probes=128, n_single=64) == 0
+
+
+def test_single_row_path_matches_sklearn_pipeline(fraud_detector):
+    now = datetime.now()
+    for transaction in TRANSACTIONS:
+        args = fraud_detector._positional_args(transaction)
+        X, converted = fraud_detector.prepare_input_dataframe(*args, now=now)
+        raw_frame, expected = fraud_detector.transform_features(X)
+        inputs = fraud_detector.model_inputs(converted, now)
+
+        np.testing.assert_array_equal(
+            fraud_detector._plan.transform(inputs).astype(np.float32), expected.astype(np.float32)
+        )
+        assert fraud_detector._plan.raw_row(inputs) == pytest.approx(fraud_detector._raw_row(raw_frame, 0))
+
+
+def test_predict_same_with_and_without_plan(fraud_detector, monkeypatch):
+    with_plan = [fraud_detector.predict(**t) for t in TRANSACTIONS]
+    monkeypatch.setattr(fraud_detector, '_plan', None)
+    without_plan = [fraud_detector.predict(**t) for t in TRANSACTIONS]
+
+    for planned, sklearn in zip(with_plan, without_plan):
+        assert planned['fraud_probability'] == sklearn['fraud_probability']
+        assert planned['is_fraud'] == sklearn['is_fraud']
+        assert planned['input_converted'] == sklearn['input_converted']
+
+
+def test_single_row_and_batch_reject_invalid_dob_the_same_way(fraud_detector, monkeypatch):
+    monkeypatch.setattr(fd, 'datetime', _FixedDatetime)
+    transaction = dict(TRANSACTIONS[0], age=31)  # 2024 - 31 = 1993, không có 29/02
+
+    with pytest.raises(ValueError, match=fd.INVALID_DATE_ERROR):
+        fraud_detector.predict(**transaction)
+
+    results = fraud_detector.predict_batch([transaction, dict(transaction, age=32)])
+    assert results[0] == {'error': fd.INVALID_DATE_ERROR}
+    assert 'fraud_probability' in results[1]  # 1992 nhuận
+
+
+def test_booster_engine_matches_predict_proba(fraud_detector, monkeypatch):
+    monkeypatch.setattr(fraud_detector, '_score_index', None)
+    rng = np.random.default_rng(1)
+    features = rng.normal(0, 2, (2000, fraud_detector._booster.num_features()))
+    features[rng.random(features.shape) < 0.01] = np.nan
+
+    monkeypatch.setattr(fraud_detector, 'engine', 'sklearn')
+    expected = fraud_detector.score_features(features)
+    monkeypatch.setattr(fraud_detector, 'engine', 'booster')
+    actual = fraud_detector.score_features(features)
+
+    np.testing.assert_array_equal(actual['probabilities'], expected['probabilities'])
+    np.testing.assert_array_equal(actual['prediction'], expected['prediction'])
+
+
+def test_feature_selector_positions_are_computed_once():
+    selector = fd.FeatureSelector(selected_features=['c', 'a'])
+    selector.feature_names_ = ['a', 'b', 'c']
+    X = np.arange(6).reshape(2, 3)
+
+    np.testing.assert_array_equal(selector.transform(X), [[2, 0], [5, 3]])
+    assert selector._selected_positions() is selector._selected_positions()
+
+    # Gán lại danh sách cột → tính lại
+    selector.feature_names_ = ['c', 'b', 'a']
+    np.testing.assert_array_equal(selector.transform(X), [[0, 2], [3, 5]])
+
+
+def _label_encoder_transform(encoder, X):
+    """CategoricalEncoder.transform trước khi vector hóa (LabelEncoder + apply từng giá trị)"""
+    X = X.copy()
+    for col, le in encoder.label_encoders.items():
+        if col in X.columns:
+            X[col] = X[col].fillna(le.classes_[0])
+            X[col] = X[col].astype(str).apply(lambda x: x if x in le.classes_ else le.classes_[0])
+            X[col] = le.transform(X[col])
+    return X
+
+
+def test_categorical_encoder_matches_label_encoder(fraud_detector):
+    encoder = fraud_detector._model.named_steps['categorical_encoder']
+    template = fraud_detector._template_dataframe()
+    X = pd.concat([template] * 6, ignore_index=True)
+    X['category'] = ['shopping_net', 'travel', 'không rõ', None, np.nan, 'zzz']
+    X['gender'] = ['M', 'F', 'X', None, 'M', '']
+    X['city'] = ['Houston', 'Austin', 'Hà Nội', np.nan, 'Austin', 'Houston']
+    X['merchant'] = ['fraud_A', 'fraud_unknown', None, 'fraud_B', 'fraud_Kirlin and Sons', 'fraud_A']
+
+    expected = _label_encoder_transform(encoder, X)
+    actual = encoder.transform(X)
+
+    for col in encoder.label_encoders:
+        np.testing.assert_array_equal(actual[col].to_numpy(), expected[col].to_numpy(), err_msg=col)
+
+
+def test_model_pickled_before_vectorization_still_loads(fraud_detector):
+    # Model cũ: FeatureSelector chưa có cache vị trí cột
+    model = pickle.loads(pickle.dumps(fraud_detector._model))
+    model.named_steps['feature_selector'].__dict__.pop('_positions_cache', None)
+    legacy = pickle.loads(pickle.dumps(model))
+
+    X, _ = fraud_detector.prepare_input_dataframe(48_000_000, 'Nữ', 'du lịch', 2, 6, 71, 'da nang', 1135000)
+    np.testing.assert_array_equal(legacy.predict_proba(X), fraud_detector._model.predict_proba(X))
+    _, expected = fraud_detector.transform_features(X)
+    np.testing.assert_array_equal(Pipeline(legacy.steps[:-1]).transform(X), expected)
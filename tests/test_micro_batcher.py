@@ -0,0 +1,96 @@
+"""
+MicroBatcher: request đang chờ luôn nhận kết quả hoặc lỗi (không block mãi)
+"""
+import threading
+
+import pytest
+
+from app.blueprints.model.micro_batcher import MicroBatcher
+
+
+def _echo(transactions):
+    return [{'value': t['value']} for t in transactions]
+
+
+def test_submit_returns_result_and_row_error():
+    batcher = MicroBatcher(lambda ts: [{'error': 'bad'} if t['value'] < 0 else {'value': t['value']} for t in ts])
+    assert batcher.submit({'value': 1}, timeout=5) == {'value': 1}
+    with pytest.raises(ValueError, match='bad'):
+        batcher.submit({'value': -1}, timeout=5)
+
+
+def test_short_result_list_fails_pending_requests():
+    batcher = MicroBatcher(lambda transactions: [], max_wait_ms=0)
+    with pytest.raises(RuntimeError, match='no result'):
+        batcher.submit({'value': 1}, timeout=5)
+
+
+def test_dead_worker_thread_is_restarted():
+    batcher = MicroBatcher(_echo, max_wait_ms=0)
+    assert batcher.submit({'value': 1}, timeout=5) == {'value': 1}
+
+    # Giả lập thread nền đã chết (vd. lỗi ngoài _dispatch)
+    batcher._thread = threading.Thread(target=lambda: None)
+    batcher._thread.start()
+    batcher._thread.join()
+
+    assert batcher.submit({'value': 2}, timeout=5) == {'value': 2}
+    assert batcher._thread.is_alive()
+
+
+def test_submit_times_out():
+    release = threading.Event()
+
+    def slow(transactions):
+        release.wait(5)
+        return _echo(transactions)
+
+    batcher = MicroBatcher(slow, max_wait_ms=0)
+    try:
+        with pytest.raises(TimeoutError):
+            batcher.submit({'value': 1}, timeout=0.05)
+    finally:
+        release.set()
+
+
+def test_predict_batch_raw_features_match_single_row(fraud_detector):
+    transactions = [
+        {'amt': 25000 * (i + 1), 'gender': 'Nam' if i % 2 else 'Nữ', 'category': 'du lịch',
+         'transaction_hour': i % 24, 'transaction_day': i % 7, 'age': 20 + i, 'city': 'ha noi'}
+        for i in range(12)
+    ]
+    results = fraud_detector.predict_batch(transactions, return_features=True)
+    for transaction, result in zip(transactions, results):
+        single = fraud_detector.predict(**transaction, return_features=True)
+        assert result['raw_features'] == pytest.approx(single['raw_features'])
+        assert result['fraud_probability'] == single['fraud_probability']
+
+
+def test_shutdown_stops_worker_thread():
+    batcher = MicroBatcher(_echo, max_wait_ms=0)
+    assert batcher.submit({'value': 1}, timeout=5) == {'value': 1}
+    thread = batcher._thread
+
+    batcher.shutdown()
+    assert not thread.is_alive()
+    with pytest.raises(RuntimeError, match='shut down'):
+        batcher.submit({'value': 2}, timeout=5)
+
+
+def test_reconfigure_does_not_leak_batcher_threads(fraud_detector, monkeypatch):
+    monkeypatch.setattr(fraud_detector, 'batcher', None)
+    config = {'FRAUD_MICRO_BATCH_ENABLED': True, 'FRAUD_MICRO_BATCH_MAX_WAIT_MS': 0, 'FRAUD_CONTRIB_CACHE_SIZE': 0}
+    transaction = {'amt': 500000, 'gender': 'Nam', 'category': 'khác', 'transaction_hour': 12,
+                   'transaction_day': 1, 'age': 30, 'city': 'ha noi'}
+
+    def batcher_threads():
+        return [t for t in threading.enumerate() if t.name == 'fraud-micro-batcher']
+
+    before = len(batcher_threads())
+    for _ in range(5):
+        fraud_detector.configure(config)
+        fraud_detector.batcher.submit(transaction, timeout=5)
+    assert len(batcher_threads()) == before + 1
+
+    fraud_detector.batcher.shutdown()
+    assert len(batcher_threads()) == before
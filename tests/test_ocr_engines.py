@@ -0,0 +1,133 @@
+"""
+OCREngine: tham số psm / biến tesseract của từng lần gọi (tesserocr giả, không cần libtesseract)
+"""
+import shlex
+
+import pytest
+from PIL import Image
+
+from app.ocr import services
+from app.ocr.roi_ocr import FIELD_WHITELISTS
+from app.ocr.services import PytesseractEngine
+
+
+def test_pytesseract_config_keeps_whitelist_spaces(monkeypatch):
+    calls = []
+    monkeypatch.setattr(services.pytesseract, 'image_to_data', lambda image, **kwargs: calls.append(kwargs) or {})
+
+    PytesseractEngine().image_to_data(
+        Image.new('L', (8, 8)), 'eng', psm=7,
+        variables={'tessedit_char_whitelist': FIELD_WHITELISTS['datetime']}
+    )
+
+    # pytesseract tách config bằng shlex.split trước khi gọi tesseract
+    assert shlex.split(calls[0]['config']) == [
+        '--psm', '7', '-c', 'tessedit_char_whitelist=0123456789:/-. '
+    ]
+    assert calls[0]['lang'] == 'eng'
+
+
+def test_pytesseract_config_without_options(monkeypatch):
+    calls = []
+    monkeypatch.setattr(services.pytesseract, 'image_to_data', lambda image, **kwargs: calls.append(kwargs) or {})
+
+    PytesseractEngine().image_to_data(Image.new('L', (8, 8)), 'vie')
+    assert calls[0]['config'] == ''
+
+
+@pytest.mark.parametrize('field', sorted(FIELD_WHITELISTS))
+def test_whitelists_end_with_space(field):
+    # Thiếu dấu cách, LSTM dính các nhóm số ("04:25:41 03/01/2024")
+    assert FIELD_WHITELISTS[field].endswith(' ')
+
+
+class FakeTessAPI:
+    """PyTessBaseAPI giả: ghi lại psm / biến tại lúc Recognize"""
+
+    instances = []
+
+    def __init__(self, lang):
+        self.lang = lang
+        self.psm = 3
+        self.variables = {'tessedit_char_whitelist': ''}
+        self.recognized = []
+        self.timeout = False
+        FakeTessAPI.instances.append(self)
+
+    def GetPageSegMode(self):
+        return self.psm
+
+    def SetPageSegMode(self, psm):
+        self.psm = psm
+
+    def GetVariableAsString(self, name):
+        return self.variables.get(name)
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+
+    def SetImage(self, image):
+        pass
+
+    def Recognize(self, timeout_ms):
+        self.recognized.append((self.psm, dict(self.variables)))
+        return not self.timeout
+
+    def GetTSVText(self, page):
+        return '5\t1\t1\t1\t1\t1\t10\t10\t50\t12\t92\t150.000'
+
+    def Clear(self):
+        pass
+
+
+@pytest.fixture
+def tesserocr_engine(monkeypatch):
+    import types
+    import sys
+
+    FakeTessAPI.instances = []
+    monkeypatch.setitem(sys.modules, 'tesserocr', types.SimpleNamespace(PyTessBaseAPI=FakeTessAPI))
+    return services.TesserocrEngine()
+
+
+def test_tesserocr_restores_psm_and_variables(tesserocr_engine):
+    image = Image.new('L', (8, 8))
+    data = tesserocr_engine.image_to_data(
+        image, 'eng', psm=7, variables={'tessedit_char_whitelist': '0123456789', 'user_defined_dpi': 300}
+    )
+    assert data['text'] == ['150.000'] and data['conf'] == [92]
+
+    api, = FakeTessAPI.instances
+    assert api.recognized[-1] == (7, {'tessedit_char_whitelist': '0123456789', 'user_defined_dpi': '300'})
+    # Lần gọi sau không mang theo psm / whitelist của lần trước
+    assert api.psm == 3
+    assert api.variables == {'tessedit_char_whitelist': '', 'user_defined_dpi': ''}
+
+    tesserocr_engine.image_to_data(image, 'eng')
+    assert api.recognized[-1] == (3, {'tessedit_char_whitelist': '', 'user_defined_dpi': ''})
+
+
+def test_tesserocr_restores_after_timeout(tesserocr_engine):
+    image = Image.new('L', (8, 8))
+    tesserocr_engine.image_to_data(image, 'eng')
+    api, = FakeTessAPI.instances
+    api.timeout = True
+
+    with pytest.raises(RuntimeError, match='timeout'):
+        tesserocr_engine.image_to_data(image, 'eng', timeout=1, psm=7, variables={'tessedit_char_whitelist': '0'})
+    assert api.psm == 3
+    assert api.variables['tessedit_char_whitelist'] == ''
+
+
+def test_tesserocr_api_per_language_and_thread(tesserocr_engine):
+    import threading
+
+    image = Image.new('L', (8, 8))
+    tesserocr_engine.image_to_data(image, 'eng')
+    tesserocr_engine.image_to_data(image, 'eng')
+    tesserocr_engine.image_to_data(image, 'vie')
+    thread = threading.Thread(target=tesserocr_engine.image_to_data, args=(image, 'eng'))
+    thread.start()
+    thread.join()
+
+    assert [api.lang for api in FakeTessAPI.instances] == ['eng', 'vie', 'eng']
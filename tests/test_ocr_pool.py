@@ -0,0 +1,58 @@
+"""
+OCR pool: process con (spawn) chỉ import package app.ocr, không cần blueprint / model
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPAWN_POOL = """
+import io, json, sys
+from PIL import Image
+from app.blueprints.preprocess.ocr_pool import OCRPool
+
+buffer = io.BytesIO()
+Image.new('RGB', (64, 32), 'white').save(buffer, format='PNG')
+pool = OCRPool(max_workers=1, timeout_seconds=30, start_method='spawn')
+result = pool.extract_text_batch([buffer.getvalue()], 'eng')[0]
+pool.shutdown()
+print(json.dumps({'result': result, 'model_loaded': any(m.startswith('app.blueprints.model') for m in sys.modules)}))
+"""
+
+
+def _run(code, cwd):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run(
+        [sys.executable, '-c', code], cwd=cwd, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr
+    return completed.stdout.strip().splitlines()[-1]
+
+
+def test_worker_imports_only_ocr_package(tmp_path):
+    code = "import sys, app.ocr.worker; print(sorted(m for m in sys.modules if m.startswith('app.blueprints')))"
+    assert _run(code, tmp_path) == '[]'
+
+
+def test_spawn_pool_runs_without_model(tmp_path):
+    import json
+
+    # tmp_path không có models/*.pkl: process con import model sẽ chết → 'OCR worker ...'
+    output = json.loads(_run(SPAWN_POOL, tmp_path))
+    assert output['model_loaded'] is False
+    # Không có tesseract thì ảnh lỗi OCR, nhưng lỗi đến từ process con chứ không phải pool
+    assert output['result'].get('success') or output['result']['error'].startswith('OCR extraction failed')
+
+
+def test_failure_counter_under_concurrency():
+    import threading
+    from app.blueprints.preprocess.ocr_pool import OCRPool
+
+    pool = OCRPool(max_workers=1)
+    threads = [threading.Thread(target=lambda: [pool._failure('x') for _ in range(500)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.stats()['failed'] == 4000
@@ -0,0 +1,97 @@
+"""
+OCRService.text_from_ocr_data: dựng text từ image_to_data cùng bố cục với image_to_string
+"""
+import io
+import shutil
+
+import pytest
+
+from app.ocr.services import OCRService
+
+
+def _ocr_data(rows):
+    """
+    Dict cùng format pytesseract.Output.DICT từ các dòng
+    (level, page, block, par, line, text, conf)
+    """
+    keys = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'text', 'conf')
+    return {key: [row[i] for row in rows] for i, key in enumerate(keys)}
+
+
+RECEIPT = _ocr_data([
+    (1, 1, 0, 0, 0, '', '-1'),
+    (2, 1, 1, 0, 0, '', '-1'),
+    (3, 1, 1, 1, 0, '', '-1'),
+    (4, 1, 1, 1, 1, '', '-1'),
+    (5, 1, 1, 1, 1, 'Vietcombank', '96'),
+    (4, 1, 1, 1, 2, '', '-1'),
+    (5, 1, 1, 1, 2, 'Giao', '95'),
+    (5, 1, 1, 1, 2, 'dịch', '91'),
+    (5, 1, 1, 1, 2, 'thành', '92'),
+    (5, 1, 1, 1, 2, 'công', '94'),
+    (2, 1, 2, 0, 0, '', '-1'),
+    (3, 1, 2, 1, 0, '', '-1'),
+    (4, 1, 2, 1, 1, '', '-1'),
+    (5, 1, 2, 1, 1, 'Số', '90'),
+    (5, 1, 2, 1, 1, 'tiền:', '89'),
+    (5, 1, 2, 1, 1, '1.500.000', '93'),
+    (5, 1, 2, 1, 1, 'VND', '97'),
+    (3, 1, 2, 2, 0, '', '-1'),
+    (4, 1, 2, 2, 1, '', '-1'),
+    (5, 1, 2, 2, 1, 'Thời', '88'),
+    (5, 1, 2, 2, 1, 'gian:', '90'),
+    (5, 1, 2, 2, 1, '21:45:10', '92'),
+])
+
+
+def test_lines_and_paragraphs():
+    assert OCRService.text_from_ocr_data(RECEIPT) == (
+        'Vietcombank\n'
+        'Giao dịch thành công\n'
+        '\n'
+        'Số tiền: 1.500.000 VND\n'
+        '\n'
+        'Thời gian: 21:45:10'
+    )
+
+
+def test_blank_words_are_skipped():
+    data = _ocr_data([
+        (5, 1, 1, 1, 1, ' ', '95'),
+        (5, 1, 1, 1, 1, 'MoMo', '95'),
+        (5, 1, 1, 1, 1, '', '-1'),
+        (5, 1, 1, 1, 2, '   ', '95'),
+        (5, 1, 1, 1, 3, '50.000', '90'),
+    ])
+    # Dòng chỉ có từ rỗng không sinh dòng trống
+    assert OCRService.text_from_ocr_data(data) == 'MoMo\n50.000'
+
+
+def test_pages_split_paragraphs():
+    data = _ocr_data([
+        (5, 1, 1, 1, 1, 'trang', '90'),
+        (5, 1, 1, 1, 1, 'một', '90'),
+        (5, 2, 1, 1, 1, 'trang', '90'),
+        (5, 2, 1, 1, 1, 'hai', '90'),
+    ])
+    assert OCRService.text_from_ocr_data(data) == 'trang một\n\ntrang hai'
+
+
+def test_empty_page():
+    assert OCRService.text_from_ocr_data(_ocr_data([(1, 1, 0, 0, 0, '', '-1')])) == ''
+
+
+def test_parity_with_image_to_string():
+    pytesseract = pytest.importorskip('pytesseract')
+    if not shutil.which(pytesseract.pytesseract.tesseract_cmd):
+        pytest.skip('tesseract not installed')
+    from PIL import Image
+    from benchmark import _synthetic_receipts
+
+    for data in _synthetic_receipts(5):
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        ocr_data = pytesseract.image_to_data(image, lang='eng', output_type=pytesseract.Output.DICT)
+        expected = pytesseract.image_to_string(image, lang='eng').strip()
+        text = OCRService.text_from_ocr_data(ocr_data)
+        # Như benchmark ocr: chỉ cho phép khác nhau về khoảng trắng
+        assert text.split() == expected.split()
@@ -0,0 +1,135 @@
+"""
+SSE streaming (/api/openai/explain-prediction/stream, /chat/stream) với server
+OpenAI-compatible giả lập cục bộ
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+WORDS = ['Giao ', 'dịch ', 'rủi ', 'ro ', 'cao.']
+
+
+class _ChatCompletionsStub(BaseHTTPRequestHandler):
+    """POST /v1/chat/completions: stream=True → chunk SSE theo WORDS; model 'broken' → HTTP 500"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(body)
+        if body.get('model') == 'broken':
+            payload = json.dumps({'error': {'message': 'upstream exploded', 'type': 'server_error'}}).encode()
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for word in WORDS:
+            chunk = {
+                'id': 'chatcmpl-test', 'object': 'chat.completion.chunk', 'created': 0, 'model': body['model'],
+                'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+@pytest.fixture
+def openai_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ChatCompletionsStub)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub_client(app, openai_stub):
+    app.config['OPENAI_BASE_URL'] = f"http://127.0.0.1:{openai_stub.server_address[1]}/v1"
+    app.config['OPENAI_MAX_RETRIES'] = 0
+    return app.test_client()
+
+
+def _events(response):
+    """[(event, data)] từ body text/event-stream"""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if not block.strip():
+            continue
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+EXPLAIN_BODY = {
+    'prediction': {'is_fraud': True, 'fraud_probability': 0.93, 'risk_level': 'very_high'},
+    'input': {'amt_vnd': 30000000, 'category': 'mua sắm online (shopping_net)', 'transaction_hour': 23},
+    'model_top_factors': [{'feature': 'amt', 'contribution': 1.2}],
+    'explanation_detail': 'short'
+}
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/openai/explain-prediction/stream', EXPLAIN_BODY),
+    ('/api/openai/chat/stream', {'message': 'Làm sao nhận biết giao dịch lừa đảo?'}),
+])
+def test_stream_emits_tokens_then_done(stub_client, openai_stub, path, body):
+    response = stub_client.post(path, json=body)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    events = _events(response)
+    assert events[:-1] == [('token', {'text': word}) for word in WORDS]
+    assert events[-1] == ('done', {'text': ''.join(WORDS).strip()})
+    assert openai_stub.requests[-1]['stream'] is True
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/openai/explain-prediction/stream', EXPLAIN_BODY),
+    ('/api/openai/chat/stream', {'message': 'hi'}),
+])
+def test_stream_emits_error_event_on_upstream_failure(app, stub_client, path, body):
+    app.config['OPENAI_MODEL'] = 'broken'
+    events = _events(stub_client.post(path, json=body))
+
+    assert len(events) == 1
+    event, data = events[0]
+    assert event == 'error'
+    assert data['error'].startswith('AI service error')
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/api/openai/explain-prediction/stream', {'prediction': 1}),
+    ('/api/openai/chat/stream', {}),
+    ('/api/openai/chat/stream', {'message': '  '}),
+])
+def test_stream_rejects_invalid_body(stub_client, path, body):
+    response = stub_client.post(path, json=body)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_client_rebuilt_on_config_change_closes_previous_pool(app):
+    from app.blueprints.openai.services import OpenAIService
+
+    with app.app_context():
+        app.config['OPENAI_BASE_URL'] = 'http://127.0.0.1:9/v1'
+        first = OpenAIService._get_client()
+        assert OpenAIService._get_client() is first
+
+        app.config['OPENAI_MAX_CONNECTIONS'] = 7
+        second = OpenAIService._get_client()
+
+    assert second is not first
+    assert first._client.is_closed
+    assert not second._client.is_closed
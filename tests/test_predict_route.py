@@ -0,0 +1,70 @@
+"""
+/api/model/predict-fraud: lỗi ở bước giải thích không làm mất kết quả dự đoán
+"""
+import time
+
+FRAUD_TRANSACTION = {
+    'amt': 30_000_000, 'gender': 'Nam', 'category': 'mua sắm online', 'transaction_hour': 23,
+    'transaction_day': 5, 'age': 35, 'city': 'ha noi', 'explanation_engine': 'template'
+}
+
+
+def test_fraud_prediction_is_returned(client):
+    response = client.post('/api/model/predict-fraud', json=FRAUD_TRANSACTION)
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['prediction']['is_fraud'] is True
+    assert body['ai_explanation_success'] is True
+    assert body['model_top_factors']
+
+
+def test_contribution_failure_keeps_prediction(client, fraud_detector, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError('TreeSHAP failed')
+
+    monkeypatch.setattr(fraud_detector, 'explain_features', broken)
+    response = client.post('/api/model/predict-fraud', json=FRAUD_TRANSACTION)
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['success'] is True
+    assert body['prediction']['is_fraud'] is True
+    assert body['ai_explanation_success'] is False
+    assert body['ai_explanation_error'] == 'TreeSHAP failed'
+
+
+def test_async_fallback_is_reported_by_job(client, monkeypatch):
+    from app.blueprints.openai.services import OpenAIService
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError('LLM unavailable')
+
+    monkeypatch.setattr(OpenAIService, 'explain_prediction', unavailable)
+    response = client.post('/api/model/predict-fraud', json={
+        **FRAUD_TRANSACTION, 'explanation_engine': 'auto', 'explanation_mode': 'async'
+    })
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['explanation_engine'] is None
+    assert 'ai_explanation_fallback_reason' not in body
+
+    for _ in range(100):
+        poll = client.get(f"/api/model/explanations/{body['explanation_id']}")
+        if poll.status_code == 200:
+            break
+        time.sleep(0.05)
+    job = poll.get_json()
+    assert job['status'] == 'done'
+    assert job['explanation_engine'] == 'template'
+    assert job['ai_explanation_fallback_reason'] == 'LLM unavailable'
+    assert job['ai_explanation']
+
+
+def test_invalid_explanation_mode_or_engine_is_rejected(client):
+    for field, value in (('explanation_mode', 'asnyc'), ('explanation_engine', 'gpt')):
+        response = client.post('/api/model/predict-fraud', json={**FRAUD_TRANSACTION, field: value})
+        body = response.get_json()
+        assert response.status_code == 400
+        assert body['success'] is False
+        assert f"Invalid {field} '{value}'" in body['error']
@@ -0,0 +1,77 @@
+"""
+parse_receipt: số tiền không kéo chữ số của dòng sau, ngày / thứ / tỉnh thành theo luật
+"""
+import pytest
+
+from app.ocr.receipt_parser import line_fields, parse_receipt
+
+
+@pytest.mark.parametrize('text, amount, confidence', [
+    ('Số tiền: 150.000\n250 Nguyễn Huệ, Q1\n12:00 01/01/2024 Vietcombank', 150_000, 1.0),
+    ('Tong tien 500\n123 Nguyen Trai\n12:00 01/01/2024', 500, 0.9),
+    ('Thanh toán thành công\n1.500.000 VND\n250 Lê Lợi', 1_500_000, 0.4),
+])
+def test_amount_does_not_join_next_line(text, amount, confidence):
+    result = parse_receipt(text)
+    assert result['data']['amt'] == amount
+    assert result['confidence'] == confidence
+
+
+def test_amount_separators_on_one_line():
+    assert parse_receipt('Số tiền: 1 500 000 VND')['data']['amt'] == 1_500_000
+    assert parse_receipt('So tien: 1.500.000,50 VND')['data']['amt'] == 1_500_000
+    assert parse_receipt('Amount 12345')['data']['amt'] == 12_345
+
+
+def test_repeated_amount():
+    same = parse_receipt('Số tiền: 500.000 VND\nTổng tiền: 500.000 VND')
+    assert same['data']['amt'] == 500_000
+    assert same['confidence'] == 0.5
+
+    # Hai số tiền khác nhau: lấy số đầu nhưng kém tin cậy
+    different = parse_receipt('Số tiền: 500.000 VND\nTổng tiền: 550.000 VND')
+    assert different['data']['amt'] == 500_000
+    assert different['confidence'] == 0.3
+
+
+@pytest.mark.parametrize('text', [
+    'Thời gian: 13:05:02 15/10/2024',
+    'Thời gian: 13:05:02 15-10-2024',
+    'Thời gian: 13:05:02 2024-10-15',
+    'Ngày 15 tháng 10 năm 2024 lúc 13h05',
+])
+def test_date_formats_and_weekday(text):
+    data = parse_receipt(text)['data']
+    # 15/10/2024 là thứ Ba (0 = thứ Hai)
+    assert data['transaction_day'] == 1
+    assert data['transaction_time'] in ('13:05:02', '13:05:00')
+
+
+def test_invalid_date_is_skipped():
+    data = parse_receipt('31/02/2024 rồi 01/03/2024')['data']
+    # 01/03/2024 là thứ Sáu
+    assert data['transaction_day'] == 4
+
+
+@pytest.mark.parametrize('text, city', [
+    ('Chi nhánh Hà Nội', 'ha noi'),
+    ('Địa chỉ: Q1, TP.HCM', 'ho chi minh'),
+    ('Cửa hàng Sài Gòn', 'ho chi minh'),
+    ('Bà Rịa - Vũng Tàu', 'ba ria vung tau'),
+    ('DakLak', 'dak lak'),
+    ('Thừa Thiên Huế', 'thua thien hue'),
+])
+def test_province_aliases(text, city):
+    assert parse_receipt(text)['data']['city'] == city
+
+
+def test_missing_required_fields():
+    result = parse_receipt('Giao dịch thành công')
+    assert result['missing'] == ['amt', 'transaction_time', 'transaction_day']
+    assert result['confidence'] == 0.0
+
+
+def test_line_fields():
+    assert line_fields('Số tiền: 150.000 VND') == ['amount']
+    assert line_fields('Thời gian: 12:00 01/01/2024') == ['datetime']
+    assert line_fields('250 Nguyễn Huệ') == []
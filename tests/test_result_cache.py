@@ -0,0 +1,84 @@
+"""
+OCRResultCache: tra cứu theo sha256 (exact) và dHash (ảnh encode lại), giới hạn bucket dHash
+"""
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from app.cache import MemoryCache
+from app.blueprints.preprocess.result_cache import DHASH_BUCKET_SIZE, OCRResultCache, dhash
+
+ENTRY = {'text': 'Số tiền: 150.000 VND', 'confidence': 91.5, 'parsed': {'amt': 150000}}
+
+
+def _receipt(format='PNG', **kwargs):
+    image = Image.new('RGB', (320, 480), 'white')
+    draw = ImageDraw.Draw(image)
+    for n in range(8):
+        draw.rectangle((20, 30 + 55 * n, 60 + 30 * n, 50 + 55 * n), fill='black')
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **kwargs)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def cache():
+    return OCRResultCache(MemoryCache('ocr-test'), MemoryCache('ocr-dhash-test'), dhash_max_distance=2)
+
+
+def test_exact_hit_per_language(cache):
+    image = _receipt()
+    entry, context = cache.lookup(image, 'vie')
+    assert entry is None and context['tier'] is None
+    cache.store_result(context, ENTRY)
+
+    entry, context = cache.lookup(image, 'vie')
+    assert entry == ENTRY and context['tier'] == 'exact'
+    # Ngôn ngữ OCR khác → kết quả khác
+    assert cache.lookup(image, 'eng')[0] is None
+    assert cache.stats()['exact_hits'] == 1
+
+
+def test_reencoded_image_hits_dhash(cache):
+    png, jpeg = _receipt(), _receipt('JPEG', quality=70)
+    assert bin(dhash(png) ^ dhash(jpeg)).count('1') <= 2
+
+    cache.store_result(cache.lookup(png, 'vie')[1], ENTRY)
+    entry, context = cache.lookup(jpeg, 'vie')
+    assert entry == ENTRY and context['tier'] == 'dhash'
+
+    # Kết quả từ tầng dhash không được index lại dưới digest của bản JPEG
+    cache.store_result(context, ENTRY)
+    buckets = [cache.dhash_store.get(key) for key in cache._band_keys(dhash(png), 'vie')]
+    assert all(len(bucket) == 1 for bucket in buckets)
+
+
+def test_distant_dhash_is_a_miss(cache):
+    cache.store_result(cache.lookup(_receipt(), 'vie')[1], ENTRY)
+    other = io.BytesIO()
+    Image.new('RGB', (320, 480), 'white').transpose(Image.ROTATE_90).save(other, format='PNG')
+    assert cache.lookup(other.getvalue(), 'vie')[0] is None
+
+
+def test_dhash_disabled():
+    cache = OCRResultCache(MemoryCache('ocr-test'))
+    cache.store_result(cache.lookup(_receipt(), 'vie')[1], ENTRY)
+    assert cache.lookup(_receipt('JPEG', quality=70), 'vie')[0] is None
+    assert cache.stats()['dhash_enabled'] is False
+
+
+def test_bucket_is_trimmed_to_most_recent(cache):
+    # Cùng 16 bit thấp → cùng band 0; các band khác khác nhau
+    values = [(n + 1) << 16 | 0xabcd for n in range(DHASH_BUCKET_SIZE + 3)]
+    for n, value in enumerate(values):
+        cache.store_result({'digest': f'digest{n}', 'language': 'vie', 'dhash': value, 'tier': None}, ENTRY)
+    # Lưu lại digest đã có: chuyển xuống cuối, không nhân đôi
+    cache.store_result({'digest': 'digest5', 'language': 'vie', 'dhash': values[5], 'tier': None}, ENTRY)
+
+    band0 = next(cache._band_keys(values[0], 'vie'))
+    bucket = cache.dhash_store.get(band0)
+    assert len(bucket) == DHASH_BUCKET_SIZE
+    assert [digest for _, digest in bucket] == (
+        [f'digest{n}' for n in range(3, DHASH_BUCKET_SIZE + 3) if n != 5] + ['digest5']
+    )
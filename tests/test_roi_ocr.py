@@ -0,0 +1,76 @@
+"""
+roi_ocr: pass thô chọn dòng số tiền / ngày giờ, OCR lại vùng giá trị (engine giả, không cần tesseract)
+"""
+from PIL import Image
+
+from app.ocr.roi_ocr import FIELD_WHITELISTS, SINGLE_LINE_PSM, roi_ocr
+
+KEYS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'text', 'conf', 'left', 'top', 'width', 'height')
+
+
+def _ocr_data(lines):
+    """Dict format image_to_data; mỗi dòng là list (text, left, width) ở top = 20 * số dòng"""
+    rows = []
+    for n, words in enumerate(lines, start=1):
+        for text, left, width in words:
+            rows.append((5, 1, 1, 1, n, text, '90', left, 20 * n, width, 10))
+    return {key: [row[i] for row in rows] for i, key in enumerate(KEYS)}
+
+
+class FakeEngine:
+    """Pass thô đọc sai chữ số; OCR lại trả về giá trị đúng theo whitelist của trường"""
+
+    def __init__(self, coarse_lines):
+        self.coarse_lines = coarse_lines
+        self.calls = []
+
+    def image_to_data(self, image, language, timeout=0, psm=None, variables=None):
+        self.calls.append({'size': image.size, 'psm': psm, 'variables': variables})
+        if psm is None:
+            return self.coarse_lines
+        whitelist = (variables or {}).get('tessedit_char_whitelist')
+        text = {FIELD_WHITELISTS['amount']: '1.500.000', FIELD_WHITELISTS['datetime']: '21:45:10 15/10/2024'}
+        return _ocr_data([[(text[whitelist], 0, 50)]])
+
+
+RECEIPT = _ocr_data([
+    [('Vietcombank', 10, 60)],
+    [('Số', 10, 10), ('tiền:', 25, 20), ('1.5OO.0O0', 50, 40), ('VND', 95, 15)],
+    [('Thời', 10, 15), ('gian:', 30, 20), ('21:45:1O', 55, 35), ('15/1O/2024', 95, 45)],
+])
+
+
+def test_regions_are_reocred_with_field_whitelist():
+    engine = FakeEngine(RECEIPT)
+    image = Image.new('L', (400, 200), 255)
+
+    ocr_data, report = roi_ocr(engine, image, 'eng', coarse_scale=0.5)
+
+    coarse, *refined = engine.calls
+    assert coarse['size'] == (200, 100)
+    assert [call['psm'] for call in refined] == [SINGLE_LINE_PSM, SINGLE_LINE_PSM]
+    assert sorted(call['variables']['tessedit_char_whitelist'] for call in refined) == sorted(
+        FIELD_WHITELISTS.values()
+    )
+
+    # Text vùng giá trị được thay, nhãn của pass thô giữ nguyên
+    words = [word for word in ocr_data['text'] if word]
+    assert words == ['Vietcombank', 'Số', 'tiền:', '1.500.000', 'VND', 'Thời', 'gian:', '21:45:10 15/10/2024']
+    assert [region['field'] for region in report['regions']] == ['amount', 'datetime']
+    assert report['regions'][0]['coarse_text'] == '1.5OO.0O0'
+    assert report['fallback'] is None
+
+    # Vùng số tiền: box từ ảnh thô nhân đôi + lề, nằm trong ảnh gốc
+    left, top, right, bottom = report['regions'][0]['box']
+    assert left < 100 < 180 < right and top < 80 < 100 < bottom
+    assert 0 < report['pixels_ratio'] < 1
+
+
+def test_missing_datetime_line_falls_back_to_full_ocr():
+    engine = FakeEngine(_ocr_data([[('Số', 10, 10), ('tiền:', 25, 20), ('500.000', 50, 40)]]))
+
+    ocr_data, report = roi_ocr(engine, Image.new('L', (400, 200), 255), 'eng')
+
+    assert ocr_data is None
+    assert report['fallback'] == 'no datetime line in coarse pass'
+    assert len(engine.calls) == 1
@@ -0,0 +1,62 @@
+"""
+ScoreIndex: tra bảng phải khớp tuyệt đối với engine (hai phía của mọi điểm gãy amt)
+"""
+import numpy as np
+import pytest
+
+from app.blueprints.model.fraud_detector import CATEGORY_VN_TO_EN, PROVINCE_POPULATION
+
+
+@pytest.fixture(scope='module')
+def score_index(fraud_detector):
+    return fraud_detector.build_score_index()
+
+
+def _base_features(fraud_detector, n: int = 64, seed: int = 3):
+    """Ma trận đầu vào classifier của các giao dịch hợp lệ (ngẫu nhiên)"""
+    rng = np.random.default_rng(seed)
+    transactions = [
+        {
+            'amt': 500000,
+            'gender': str(rng.choice(['Nam', 'Nữ'])),
+            'category': str(rng.choice(list(CATEGORY_VN_TO_EN.keys()) + ['không rõ'])),
+            'transaction_hour': int(rng.integers(0, 24)),
+            'transaction_day': int(rng.integers(0, 7)),
+            'age': int(rng.integers(18, 101)),
+            'city': str(rng.choice(list(PROVINCE_POPULATION.keys()))),
+            'transaction_month': int(rng.integers(1, 13))
+        }
+        for _ in range(n)
+    ]
+    columns, _, _ = fraud_detector.normalize_batch(transactions)
+    return fraud_detector._plan.transform(fraud_detector._batch_model_inputs(columns))
+
+
+def test_index_matches_engine_around_every_breakpoint(fraud_detector, score_index, monkeypatch):
+    base = _base_features(fraud_detector).astype(np.float32)
+    thresholds = score_index.amt_thresholds
+    assert len(thresholds) > 0
+    amounts = np.concatenate([
+        thresholds,
+        np.nextafter(thresholds, np.float32(-np.inf)),
+        np.nextafter(thresholds, np.float32(np.inf)),
+        [thresholds[0] - 1, thresholds[-1] + 1]
+    ]).astype(np.float32)
+
+    features = np.repeat(base, len(amounts), axis=0)
+    features[:, score_index.amt_position] = np.tile(amounts, len(base))
+
+    for engine in fraud_detector.ENGINES:
+        monkeypatch.setattr(fraud_detector, 'engine', engine)
+        monkeypatch.setattr(fraud_detector, '_score_index', None)
+        expected = fraud_detector.score_features(features)
+        monkeypatch.setattr(fraud_detector, '_score_index', score_index)
+        actual = fraud_detector.score_features(features)
+
+        np.testing.assert_array_equal(actual['probabilities'], expected['probabilities'])
+        np.testing.assert_array_equal(actual['prediction'], expected['prediction'])
+
+    # Input của mobile app đều nằm trong index: không fallback
+    _, hit = score_index.lookup(features)
+    assert hit.all()
+
@@ -0,0 +1,103 @@
+"""
+SemanticExplanationCache: template dùng lại cho giao dịch khác không được lộ giá trị cũ
+"""
+import pytest
+
+from app.cache import MemoryCache
+from app.blueprints.model.semantic_cache import SemanticExplanationCache
+
+FACTORS = [
+    {'feature': 'amt', 'contribution': 2.1},
+    {'feature': 'transaction_hour', 'contribution': 1.3},
+    {'feature': 'age', 'contribution': -0.4},
+]
+
+
+def _transaction(city, month, safe_probability):
+    prediction = {
+        'is_fraud': True, 'risk_level': 'HIGH',
+        'fraud_probability': 1 - safe_probability, 'safe_probability': safe_probability
+    }
+    input_data = {
+        'amt_vnd': 30_000_000, 'amt_usd': 1200.0, 'gender': 'Nam (M)',
+        'category': 'mua sắm online (shopping_net)', 'transaction_hour': 23,
+        'transaction_day': 5, 'transaction_month': month, 'age': 35,
+        'city': city, 'city_pop': 8_054_000
+    }
+    return prediction, input_data
+
+
+@pytest.fixture
+def cache():
+    return SemanticExplanationCache(MemoryCache('semantic-test'))
+
+
+def _put(cache, text, transaction):
+    key = cache.signature(*transaction, FACTORS, 'short')
+    cache.put(key, text, *transaction)
+    return key
+
+
+def test_template_is_not_served_for_another_city(cache):
+    hanoi = _transaction('ha noi', 3, 0.0688)
+    _put(cache, 'Giao dịch 30.000.000 VND tại Hà Nội vào tháng 3 lúc 23:00 (an toàn 6.88%).', hanoi)
+
+    da_nang = _transaction('da nang', 11, 0.12)
+    key = cache.signature(*da_nang, FACTORS, 'short')
+    assert cache.get(key, *da_nang) is None
+
+
+def test_month_and_safe_probability_are_filled(cache):
+    _put(cache, 'Giao dịch 30.000.000 VND tại Hà Nội vào tháng 3 lúc 23:00 (an toàn 6.88%).',
+         _transaction('ha noi', 3, 0.0688))
+
+    later = _transaction('Hà Nội', 11, 0.12)
+    key = cache.signature(*later, FACTORS, 'short')
+    assert cache.get(key, *later) == (
+        'Giao dịch 30.000.000 VND tại Hà Nội vào tháng 11 lúc 23:00 (an toàn 12.00%).'
+    )
+
+
+def test_template_with_leftover_value_is_not_stored(cache):
+    transaction = _transaction('ha noi', 3, 0.0688)
+    key = _put(cache, 'Số tiền VND30.000.000 cao bất thường lúc 23:00.', transaction)
+
+    assert cache.rejected == 1
+    assert cache.stored == 0
+    assert cache.get(key, *transaction) is None
+
+
+def _factors(amt_contribution, hour_contribution, amt_usd):
+    return [
+        {'feature': 'amt', 'raw_value': amt_usd, 'contribution': amt_contribution},
+        {'feature': 'transaction_hour', 'raw_value': 23, 'contribution': hour_contribution},
+        {'feature': 'age', 'raw_value': 35, 'contribution': -0.4},
+    ]
+
+
+def test_contributions_of_another_transaction_are_not_leaked(cache):
+    first, first_factors = _transaction('ha noi', 3, 0.0688), _factors(2.103456, 1.3012, 1187.3456)
+    key = cache.signature(*first, first_factors, 'short')
+    cache.put(key, 'Số tiền 1187.35 USD đẩy rủi ro +2.1035, giờ 23:00 góp thêm 1.30.', *first, first_factors)
+    assert cache.stored == 1
+
+    # Cùng chữ ký (thứ tự + dấu của factor) nhưng số liệu TreeSHAP khác
+    second, second_factors = _transaction('ha noi', 3, 0.0688), _factors(0.874, 0.4519, 1201.0042)
+    assert cache.signature(*second, second_factors, 'short') == key
+    assert cache.get(key, *second, second_factors) == (
+        'Số tiền 1201.00 USD đẩy rủi ro +0.8740, giờ 23:00 góp thêm 0.45.'
+    )
+
+
+def test_same_rendering_for_two_contributions_is_not_stored(cache):
+    transaction = _transaction('ha noi', 3, 0.0688)
+    factors = [
+        {'feature': 'amt', 'contribution': 0.42},
+        {'feature': 'transaction_hour', 'contribution': 0.42},
+    ]
+    key = cache.signature(*transaction, factors, 'short')
+    # Không biết "0.42" là của factor nào → không tham số hóa được → không lưu
+    cache.put(key, 'Số tiền và giờ giao dịch cùng góp 0.42.', *transaction, factors)
+
+    assert cache.rejected == 1
+    assert cache.get(key, *transaction, factors) is None